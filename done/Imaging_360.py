@@ -22,6 +22,14 @@ imageWidth = 640
 imageHeight = 480
 imageBuffer360 = np.zeros((imageHeight + 40, 4*imageWidth + 120, 3), dtype=np.uint8) # 20 px padding between pieces  
 
+# Column ranges of each piece inside imageBuffer360, computed once
+pieceWidths = [imageWidth // 2, imageWidth, imageWidth, imageWidth, imageWidth // 2]
+placements = []
+x = 20
+for width in pieceWidths:
+    placements.append((x, x + width))
+    x += width + 20
+
 # -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- -- 
 ## Initialize the CSI cameras
 myCam1 = Camera2D(camera_id="0", frame_width=imageWidth, frame_height=imageHeight, frame_rate=sampleRate)
@@ -53,27 +61,14 @@ try:
         sleepTime = sampleTime - ( computationTime % sampleTime )
         
         # Stitch images together with black padding
-        horizontalBlank     = np.zeros((20, 4*imageWidth+120, 3), dtype=np.uint8)
-        verticalBlank       = np.zeros((imageHeight, 20, 3), dtype=np.uint8)
-
-        imageBuffer360 = np.concatenate(
-                                           (horizontalBlank, 
-                                            np.concatenate((    verticalBlank, 
-                                                                myCam2.image_data[:,320:640], 
-                                                                verticalBlank, 
-                                                                myCam3.image_data, 
-                                                                verticalBlank, 
-                                                                myCam4.image_data, 
-                                                                verticalBlank, 
-                                                                myCam1.image_data, 
-                                                                verticalBlank, 
-                                                                myCam2.image_data[:,0:320], 
-                                                                verticalBlank), 
-                                                                axis = 1), 
-                                            horizontalBlank
-                                            ), 
-                                            axis=0
-                                        )
+        # The padding never changes, so write each camera straight into the
+        # preallocated buffer instead of concatenating fresh blanks every frame
+        for (x0, x1), image in zip(placements, (myCam2.image_data[:,320:640],
+                                                 myCam3.image_data,
+                                                 myCam4.image_data,
+                                                 myCam1.image_data,
+                                                 myCam2.image_data[:,0:320])):
+            imageBuffer360[20:20 + imageHeight, x0:x1] = image
 
         # Display the stitched image at half the resolution
         cv2.imshow('Combined View', cv2.resize(imageBuffer360, (int(2*imageWidth), int(imageHeight/2))))
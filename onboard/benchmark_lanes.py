@@ -0,0 +1,80 @@
+import time
+import argparse
+import numpy as np
+from src.frame import as_frame
+from src.image_processing_utils import ImageProcessing, LaneDetector, LaneTracker
+from src.recording import open_recording
+
+# Compares the sliding-window LaneDetector, and the LaneTracker built on it, with
+# find_slope_intercept_from_binary on the camera frames of a recorded session. All get the
+# same thresholded band, so only the line finding is timed. Also reports where each puts
+# the lane on the band's bottom row.
+
+def band_masks(recording, crop=(0.7, 0.9), lower_bound=np.array([10, 50, 100]), upper_bound=np.array([45, 255, 255])):
+    for index in range(len(recording.timestamps("image"))):
+        frame = as_frame(np.asarray(recording.value("image", index)))
+        hsv_image = frame.hsv(frame.band(crop[0], crop[1]))
+        yield ImageProcessing.binary_thresholding(hsv_image, lower_bound, upper_bound)
+
+def run_benchmark(recording, crop=(0.7, 0.9), detector=None, min_confidence=0.5):
+    detector = LaneDetector() if detector is None else detector
+    tracker = LaneTracker(detector, min_confidence=min_confidence)
+    old_times, new_times, tracked_times = [], [], []
+    old_found, new_found, tracked_found = 0, 0, 0
+    offsets = []
+    for binary in band_masks(recording, crop):
+        height = binary.shape[0]
+        start = time.perf_counter()
+        slope, intercept = ImageProcessing.find_slope_intercept_from_binary(binary)
+        old_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        lines = detector.search(binary)
+        new_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        tracked = tracker.search(binary)
+        tracked_times.append(time.perf_counter() - start)
+        tracked_found += len(tracked) > 0
+
+        # The agent reads the lane's column on the band's bottom row
+        old_x = (height - intercept) / slope if slope != 0 else None
+        lines = [line for line in lines if line.confidence >= min_confidence]
+        new_x = lines[0].x_at(height - 1) if lines else None
+        old_found += old_x is not None
+        new_found += new_x is not None
+        if old_x is not None and new_x is not None:
+            offsets.append(abs(old_x - new_x))
+
+    def summary(times):
+        times = np.array(times) if times else np.zeros(1)
+        return {'mean_ms': 1000 * times.mean(), 'p95_ms': 1000 * np.percentile(times, 95), 'max_ms': 1000 * times.max()}
+
+    return {
+        'frames': len(new_times),
+        'old': summary(old_times),
+        'new': summary(new_times),
+        'tracked': summary(tracked_times),
+        'old_found': old_found,
+        'new_found': new_found,
+        'tracked_found': tracked_found,
+        'full_searches': tracker.full_searches,
+        'median_offset_px': float(np.median(offsets)) if offsets else float('nan'),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording", help="Path to a recording directory or a pickled sensor session.")
+    parser.add_argument("--crop", type=float, nargs=2, default=(0.7, 0.9), help="Band of the image to search, as fractions of its height.")
+    parser.add_argument("--row-step", type=int, default=2, help="Read every n-th row of the band.")
+    parser.add_argument("--degree", type=int, default=2, help="Degree of the lane line polynomial.")
+    args = parser.parse_args()
+
+    results = run_benchmark(open_recording(args.recording), crop=tuple(args.crop),
+                            detector=LaneDetector(row_step=args.row_step, degree=args.degree))
+    print(f"Frames: {results['frames']}")
+    for name, label in (('old', 'find_slope_intercept_from_binary'), ('new', 'LaneDetector.search'),
+                        ('tracked', 'LaneTracker.search')):
+        timing = results[name]
+        print(f"{label}: mean {timing['mean_ms']:.3f} ms, p95 {timing['p95_ms']:.3f} ms, max {timing['max_ms']:.3f} ms, "
+              f"lane found in {results[name + '_found']} frames")
+    print(f"LaneTracker fell back to a full search on {results['full_searches']} frames")
+    print(f"Median disagreement on the bottom row: {results['median_offset_px']:.1f} px")
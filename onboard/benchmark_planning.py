@@ -0,0 +1,91 @@
+import time
+import argparse
+import numpy as np
+from src.planning import AStar, DStarLite
+
+# Times AStar on large synthetic grids and compares each solve with the control
+# tick budget: open space, random clutter and a wall with a single gap.
+# The replanning benchmark moves the start along the path and flips a few cells
+# between calls, and compares DStarLite's repair with a fresh AStar search.
+
+def make_grids(size, seed=0):
+    rng = np.random.default_rng(seed)
+    grids = {'open': np.zeros((size, size), dtype=np.uint8)}
+    for density in (0.1, 0.25):
+        grids[f'random {int(density * 100)}%'] = (rng.random((size, size)) < density).astype(np.uint8)
+    wall = np.zeros((size, size), dtype=np.uint8)
+    wall[size // 2, :] = 1
+    wall[size // 2, size - size // 10] = 0
+    grids['wall with gap'] = wall
+    for grid in grids.values():
+        grid[0, 0] = 0
+        grid[-1, -1] = 0
+    return grids
+
+def run_benchmark(size=1000, connectivity=8, heuristic_weight=1.0, repeats=3):
+    results = []
+    for name, grid in make_grids(size).items():
+        planner = AStar(grid, connectivity=connectivity, heuristic_weight=heuristic_weight)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            path = planner.find_path((0, 0), (size - 1, size - 1))
+            times.append(time.perf_counter() - start)
+        results.append({
+            'grid': name,
+            'best_ms': 1000 * min(times),
+            'path_length': len(path) if path is not None else None,
+            'expanded': planner.expanded,
+        })
+    return results
+
+def run_replan_benchmark(size=1000, connectivity=8, steps=20, flips=10, seed=0):
+    rng = np.random.default_rng(seed)
+    grid = make_grids(size, seed)['random 10%']
+    goal = (size - 1, size - 1)
+    planner = DStarLite(grid, connectivity=connectivity)
+    start_time = time.perf_counter()
+    path = planner.find_path((0, 0), goal)
+    initial = time.perf_counter() - start_time
+
+    repair_times, astar_times = [], []
+    start = (0, 0)
+    for _ in range(steps):
+        if path is None:
+            break
+        start = path[min(3, len(path) - 1)]
+        for r, c in rng.integers(0, size, size=(flips, 2)):
+            if (r, c) != start and (r, c) != goal:
+                grid[r, c] ^= 1
+        start_time = time.perf_counter()
+        path = planner.find_path(start, goal)
+        repair_times.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        AStar(grid, connectivity=connectivity).find_path(start, goal)
+        astar_times.append(time.perf_counter() - start_time)
+    return {
+        'initial_ms': 1000 * initial,
+        'mean_repair_ms': 1000 * np.mean(repair_times) if repair_times else 0.0,
+        'mean_astar_ms': 1000 * np.mean(astar_times) if astar_times else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1000, help="Grid width and height in cells.")
+    parser.add_argument("--connectivity", type=int, default=8, choices=(4, 8), help="4- or 8-connected moves.")
+    parser.add_argument("--weight", type=float, default=1.0, help="Heuristic weight (1.0 gives optimal paths).")
+    parser.add_argument("--rate", type=int, default=10, help="Control rate in Hz whose tick is the time budget.")
+    parser.add_argument("--replan", action="store_true", help="Also time incremental replanning on a changing map.")
+    args = parser.parse_args()
+
+    budget_ms = 1000.0 / args.rate
+    print(f"{args.size}x{args.size} grid, {args.connectivity}-connected, heuristic weight {args.weight}, budget {budget_ms:.1f} ms")
+    for result in run_benchmark(args.size, args.connectivity, args.weight):
+        verdict = "within budget" if result['best_ms'] <= budget_ms else "over budget"
+        print(f"{result['grid']:>14}: {result['best_ms']:8.1f} ms, path {result['path_length']}, "
+              f"{result['expanded']} expanded, {verdict}")
+
+    if args.replan:
+        replan = run_replan_benchmark(args.size, args.connectivity)
+        print(f"Replanning on a changing 10% map: initial plan {replan['initial_ms']:.1f} ms, "
+              f"D* Lite repair {replan['mean_repair_ms']:.1f} ms, fresh A* {replan['mean_astar_ms']:.1f} ms")
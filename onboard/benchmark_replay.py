@@ -0,0 +1,51 @@
+import time
+import argparse
+import numpy as np
+from src.agent import Agent
+from src.replay_interface import ReplayHardwareInterface
+from src.recording import open_recording
+
+# Measures Agent throughput on a recorded session without the QCar hardware.
+# By default the replay is stepped, so every recorded camera frame is processed
+# as fast as the agent can go.
+
+def run_benchmark(recording, command, speed=None, target_location=(9, 9)):
+    hardware = ReplayHardwareInterface(recording, speed=speed)
+    camera_width, camera_height = hardware.camera_resolution()
+    grid = [[0 for _ in range(10)] for _ in range(10)]
+    agent = Agent(camera_width, camera_height, grid)
+
+    tick_times = []
+    start = time.perf_counter()
+    while True:
+        snapshot = hardware.read_snapshot()
+        if hardware.finished:
+            break
+        tick_start = time.perf_counter()
+        throttle, steering = agent.get_action_from_snapshot(command, snapshot, target_location=target_location)
+        hardware.send_command(throttle, steering)
+        tick_times.append(time.perf_counter() - tick_start)
+    total = time.perf_counter() - start
+
+    tick_times = np.array(tick_times)
+    return {
+        'ticks': len(tick_times),
+        'total_time': total,
+        'ticks_per_second': len(tick_times) / total if total > 0 else 0.0,
+        'mean_tick_ms': 1000 * tick_times.mean() if len(tick_times) else 0.0,
+        'p95_tick_ms': 1000 * np.percentile(tick_times, 95) if len(tick_times) else 0.0,
+        'max_tick_ms': 1000 * tick_times.max() if len(tick_times) else 0.0,
+        'commands': hardware.commands,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording", help="Path to a recording directory or a pickled sensor session.")
+    parser.add_argument("--command", default="explore", help="Agent command to replay with.")
+    parser.add_argument("--speed", type=float, default=None, help="Replay speed multiplier. Omit to process every frame as fast as possible.")
+    args = parser.parse_args()
+
+    results = run_benchmark(open_recording(args.recording), args.command, speed=args.speed)
+    print(f"Ticks: {results['ticks']}")
+    print(f"Throughput: {results['ticks_per_second']:.1f} ticks/s")
+    print(f"Tick time: mean {results['mean_tick_ms']:.2f} ms, p95 {results['p95_tick_ms']:.2f} ms, max {results['max_tick_ms']:.2f} ms")
@@ -1,26 +1,51 @@
 
 
 import time
-from src.hardware_interface import QCarHardwareInterface
 from src.agent import Agent
 from src.ai_services import AIServices
 from src.voice_control import VoiceControl
 from src.socket_client import SocketClient
 from src.demonstration import Demonstration
+from src.scheduler import RateScheduler
+from src.perception_executor import PerceptionExecutor
+from src.mapping import OccupancyGrid
 import cv2
 import threading
 import argparse
 import json
 import numpy as np
-import base64
 
 class MainApplication:
-    def __init__(self, demonstrate=False):
+    def __init__(self, demonstrate=False, async_sensors=False, control_rate=100, hardware=None, recorder=None, perception_workers=0,
+                 map_cells=500, map_resolution=0.05, map_depth=False, birds_eye=None):
         self.command = "stop"
-        self.hardware = QCarHardwareInterface()
-        # Create a simple grid for the A* algorithm
-        self.grid = [[0 for _ in range(10)] for _ in range(10)]
-        self.agent = Agent(self.hardware.cameras.csiFront.imageData.shape[1], self.hardware.cameras.csiFront.imageData.shape[0], self.grid)
+        self.control_rate = control_rate
+        self.recorder = recorder
+        if hardware is None:
+            # Imported here so a replay run does not need the QCar libraries
+            from src.hardware_interface import QCarHardwareInterface
+            hardware = QCarHardwareInterface(asynchronous=async_sensors)
+        self.hardware = hardware
+        # Occupancy map built from the Lidar (and optionally depth); A* plans on its thresholded view.
+        # The car starts in the middle of the map, at the pose below; the agent's odometry tracks it from there.
+        self.occupancy = OccupancyGrid(shape=(map_cells, map_cells), resolution=map_resolution,
+                                       origin=(-map_cells * map_resolution / 2, -map_cells * map_resolution / 2))
+        self.map_depth = map_depth
+        self.pose = (0.0, 0.0, 0.0)
+        self.last_map_timestamps = {}
+        self.grid = self.occupancy.occupied
+        # Navigation goal, 2 m ahead and 2 m to the side of the start
+        self.target_location = self.map_cell(2.0, 2.0)
+        camera_width, camera_height = self.hardware.camera_resolution()
+        self.perception = None
+        if perception_workers > 0:
+            # Depth goes into the agent's costmap and the face tracker needs every frame in
+            # order, so only the color and lane detectors run in the workers
+            self.perception = PerceptionExecutor(camera_width, camera_height, num_workers=perception_workers,
+                                                 detectors=("color", "lane"))
+        self.agent = Agent(camera_width, camera_height, self.grid, perception=self.perception,
+                           grid_version=lambda: self.occupancy.version, map_cell=self.map_cell, birds_eye=birds_eye)
+        self.agent.odometry.reset(self.pose)
         self.ai_services = AIServices()
         self.voice_control = VoiceControl()
         self.socket_client = SocketClient('http://localhost:5000') # Assuming offboard server runs on localhost:5000
@@ -49,7 +74,102 @@ class MainApplication:
         else:
             self.run_normal()
 
-    def run_normal():
+    def handle_key(self, key):
+        if key == ord('n'):
+            self.command = "navigate"
+            print("Command: navigate")
+        elif key == ord('e'):
+            self.command = "explore"
+            print("Command: explore")
+        elif key == ord('d'):
+            # Save the current image to a file
+            frame = self.hardware.read_image()
+            if frame is not None:
+                cv2.imwrite("current_view.png", frame.image)
+                description = self.ai_services.describe_image("current_view.png")
+                print(f"Description: {description}")
+                self.ai_services.text_to_speech(description)
+        elif key == ord('g'):
+            self.command = "teleop"
+            print("Command: teleop")
+        elif key == ord('s'):
+            self.command = "search"
+            print("Command: search")
+        elif key == ord('t'):
+            self.command = "track"
+            print("Command: track")
+        elif key == ord('f'):
+            self.command = "face_track"
+            print("Command: face_track")
+        elif key == ord('l'):
+            self.command = "lane_follow"
+            print("Command: lane_follow")
+        elif key == ord(' '):
+            self.command = "stop"
+            print("Command: stop")
+
+    def send_telemetry(self, snapshot):
+        # Send data to offboard server
+        if snapshot.frame is not None:
+            # The JPEG/base64 encode happens here, once, and only for the network
+            self.socket_client.send_video_frame(snapshot.frame.to_base64())
+        # The agent's preprocessed scan keeps its list form, so it is only built once per scan
+        if self.agent.scan is not None:
+            self.socket_client.send_lidar_data(self.agent.scan.to_telemetry())
+        self.socket_client.send_status_update({'state': self.agent.state})
+
+    def update_display(self, frame):
+        if frame is not None:
+            cv2.imshow("Camera Feed", frame.image)
+        # Non-blocking input
+        self.handle_key(cv2.waitKey(1) & 0xFF)
+
+    def map_cell(self, x, y):
+        i, j = self.occupancy.world_to_cell(x, y)
+        return int(i), int(j)
+
+    def update_map(self, snapshot):
+        # Only fuse readings that are new since the last tick
+        lidar_timestamp = snapshot.timestamps.get("lidar")
+        scan = self.agent.scan
+        if scan is not None and lidar_timestamp != self.last_map_timestamps.get("lidar"):
+            self.occupancy.insert_scan(scan.distances, scan.angles, self.pose)
+            self.last_map_timestamps["lidar"] = lidar_timestamp
+        depth_timestamp = snapshot.timestamps.get("depth")
+        if self.map_depth and snapshot.depth_data is not None and depth_timestamp != self.last_map_timestamps.get("depth"):
+            distances, angles = self.agent.depth_profile.scan(snapshot.depth_data)
+            self.occupancy.insert_scan(distances, angles, self.pose)
+            self.last_map_timestamps["depth"] = depth_timestamp
+
+    def control_step(self, scheduler):
+        # In asynchronous mode this returns the latest readings without blocking
+        snapshot = self.hardware.read_snapshot()
+        if self.hardware.finished:
+            return False
+        frame = snapshot.frame
+
+        # Actuation comes first; everything after it is only done if the tick has time left
+        throttle, steering = self.agent.get_action_from_snapshot(self.command, snapshot, target_location=self.target_location)
+        self.hardware.send_command(throttle, steering)
+        # The pose of the agent's latest scan, which is the one update_map inserts
+        self.pose = self.agent.odometry.pose
+        if self.recorder is not None:
+            self.recorder.record_snapshot(snapshot)
+            self.recorder.record_command(time.time(), throttle, steering)
+
+        scheduler.run_low_priority("mapping", self.update_map, snapshot, force_after=self.control_rate // 10)
+        scheduler.run_low_priority("telemetry", self.send_telemetry, snapshot)
+        scheduler.run_low_priority("display", self.update_display, frame, force_after=self.control_rate // 10)
+
+        # Handle description request from agent
+        if self.agent.request_description:
+            if frame is not None:
+                cv2.imwrite("current_view.png", frame.image)
+                description = self.ai_services.describe_image("current_view.png")
+                print(f"Description: {description}")
+                self.ai_services.text_to_speech(description)
+
+    def run_normal(self):
         voice_thread = threading.Thread(target=self.voice_command_thread)
         voice_thread.daemon = True
         voice_thread.start()
@@ -60,91 +180,55 @@ class MainApplication:
 
         print("QCar agent started. Open your web browser to http://<qcar-ip>:5000 to control the car.")
 
+        scheduler = RateScheduler(frequency=self.control_rate)
         try:
-            while True:
-                # Non-blocking input
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('n'):
-                    self.command = "navigate"
-                    print("Command: navigate")
-                elif key == ord('e'):
-                    self.command = "explore"
-                    print("Command: explore")
-                elif key == ord('d'):
-                    # Save the current image to a file
-                    image_data = self.hardware.read_image()
-                    if image_data:
-                        # Decode base64 for local display
-                        nparr = np.frombuffer(base64.b64decode(image_data), np.uint8)
-                        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                        cv2.imwrite("current_view.png", image)
-                        description = self.ai_services.describe_image("current_view.png")
-                        print(f"Description: {description}")
-                        self.ai_services.text_to_speech(description)
-                elif key == ord('g'):
-                    self.command = "teleop"
-                    print("Command: teleop")
-                elif key == ord('s'):
-                    self.command = "search"
-                    print("Command: search")
-                elif key == ord('t'):
-                    self.command = "track"
-                    print("Command: track")
-                elif key == ord('f'):
-                    self.command = "face_track"
-                    print("Command: face_track")
-                elif key == ord('l'):
-                    self.command = "lane_follow"
-                    print("Command: lane_follow")
-                elif key == ord(' '):
-                    self.command = "stop"
-                    print("Command: stop")
-
-                image_data = self.hardware.read_image()
-                depth_data = self.hardware.read_depth_data()
-                lidar_distances, lidar_angles = self.hardware.read_lidar_data()
-                gamepad_new_read, gamepad = self.hardware.read_gamepad()
-
-                # Send data to offboard server
-                if image_data:
-                    self.socket_client.send_video_frame(image_data)
-                if lidar_distances is not None and lidar_angles is not None:
-                    self.socket_client.send_lidar_data({'distances': lidar_distances.tolist(), 'angles': lidar_angles.tolist()})
-                self.socket_client.send_status_update({'state': self.agent.state})
-
-                # Decode image for local display
-                if image_data:
-                    nparr = np.frombuffer(base64.b64decode(image_data), np.uint8)
-                    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    cv2.imshow("Camera Feed", image)
-                
-                throttle, steering = self.agent.get_action(self.command, image, depth_data, lidar_distances, lidar_angles, gamepad_new_read, gamepad, target_location=(9, 9))
-                self.hardware.send_command(throttle, steering)
-
-                # Handle description request from agent
-                if self.agent.request_description:
-                    image_data_for_desc = self.hardware.read_image()
-                    if image_data_for_desc:
-                        nparr_desc = np.frombuffer(base64.b64decode(image_data_for_desc), np.uint8)
-                        image_desc = cv2.imdecode(nparr_desc, cv2.IMREAD_COLOR)
-                        cv2.imwrite("current_view.png", image_desc)
-                        description = self.ai_services.describe_image("current_view.png")
-                        print(f"Description: {description}")
-                        self.ai_services.text_to_speech(description)
-                
-                time.sleep(0.01)
+            scheduler.run(self.control_step)
 
         except KeyboardInterrupt:
             print("\nExiting agent. Stopping the car.")
         finally:
+            print(f"Control loop stats: {scheduler.stats()}")
+            print(f"Plan cache stats: {self.agent.planner.stats()}")
             cv2.destroyAllWindows()
             self.hardware.__exit__(None, None, None)
             self.socket_client.disconnect()
+            if self.recorder is not None:
+                self.recorder.close()
+            if self.perception is not None:
+                self.perception.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--demonstrate", action="store_true", help="Run the agent in demonstration mode.")
+    parser.add_argument("--async-sensors", action="store_true", help="Read each sensor on its own thread instead of in the control loop.")
+    parser.add_argument("--rate", type=int, default=100, help="Control loop rate in Hz.")
+    parser.add_argument("--replay", help="Replay a recorded sensor session instead of using the QCar hardware.")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Replay speed multiplier (1.0 is real time).")
+    parser.add_argument("--record", help="Directory to record sensor data and commands into.")
+    parser.add_argument("--perception-workers", type=int, default=0, help="Run the detectors in this many worker processes (0 runs them in the control loop).")
+    parser.add_argument("--map-cells", type=int, default=500, help="Width and height of the occupancy map in cells.")
+    parser.add_argument("--map-resolution", type=float, default=0.05, help="Occupancy map cell size in meters.")
+    parser.add_argument("--map-depth", action="store_true", help="Also fuse the depth camera into the occupancy map.")
+    parser.add_argument("--birds-eye", help="JSON camera calibration; lane following then works on a metric bird's-eye view of the floor.")
     args = parser.parse_args()
 
-    app = MainApplication(demonstrate=args.demonstrate)
+    birds_eye = None
+    if args.birds_eye:
+        from src.birds_eye import BirdsEyeView
+        with open(args.birds_eye) as f:
+            birds_eye = BirdsEyeView.from_config(json.load(f))
+
+    hardware = None
+    if args.replay:
+        from src.replay_interface import ReplayHardwareInterface
+        from src.recording import open_recording
+        hardware = ReplayHardwareInterface(open_recording(args.replay), speed=args.replay_speed)
+
+    recorder = None
+    if args.record:
+        from src.recording import SensorRecorder
+        recorder = SensorRecorder(args.record)
+
+    app = MainApplication(demonstrate=args.demonstrate, async_sensors=args.async_sensors, control_rate=args.rate, hardware=hardware, recorder=recorder, perception_workers=args.perception_workers,
+                          map_cells=args.map_cells, map_resolution=args.map_resolution, map_depth=args.map_depth, birds_eye=birds_eye)
     app.run()
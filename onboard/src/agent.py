@@ -1,35 +1,156 @@
-from src.camera_processing import ColorTracker, FaceDetector
-from src.obstacle_avoidance import VFH, DepthObstacleDetector
-from src.planning import AStar
+from src.camera_processing import ColorTracker, FaceDetector, FaceTracker
+from src.obstacle_avoidance import VFH, DepthProfile, TimeToCollision
+from src.costmap import PolarCostmap
+from src.lidar_scan import ScanPreprocessor
+from src.odometry import ScanOdometry
+from src.planning import DStarLite, PlanningService
+from src.controllers import PID, LowPassFilter, RateLimiter
+from src.image_processing_utils import ImageProcessing, LaneDetector, LaneTracker
+from src.frame import as_frame
 import time
 import numpy as np
 import cv2
 
 class Agent:
-    def __init__(self, camera_width, camera_height, grid):
+    def __init__(self, camera_width, camera_height, grid, perception=None, grid_version=None, map_cell=None, birds_eye=None):
         self.state = "stopped"
         self.tracker = ColorTracker(camera_width, camera_height)
         self.face_detector = FaceDetector()
+        self.face_tracker = FaceTracker(self.face_detector)
         self.avoider_lidar = VFH()
-        self.avoider_depth = DepthObstacleDetector(image_width=camera_width, image_height=camera_height)
-        self.planner = AStar(grid)
+        # Nearest obstacle per depth column, written into the costmap next to the Lidar
+        self.depth_profile = DepthProfile()
+        # Cleans each Lidar scan once per tick for every consumer below
+        self.scan_preprocessor = ScanPreprocessor()
+        self.scan = None
+        # Fused Lidar + depth costmap; obstacle checks and VFH steering read from it
+        self.costmap = PolarCostmap()
+        # Closing speed per Lidar sector; forward throttle is scaled down as time to collision drops
+        self.ttc = TimeToCollision()
+        # "navigate" is re-sent every tick; the incremental planner only repairs what the map
+        # updates and the car's movement changed since the last tick
+        self.planner = PlanningService(DStarLite(grid), grid_version=grid_version)
         self.path = None
         self.path_index = 0
+        # Pose (x, y, heading) from matching successive Lidar scans, updated at the Lidar rate
+        self.odometry = ScanOdometry()
+        # Grid cell the car is in; map_cell turns the odometry pose into one each tick
+        self.map_cell = map_cell
+        self.start_location = (0, 0)
         self.search_start_time = 0
+        # Colors search mode looks for, every color the tracker knows by default; the
+        # largest one found becomes the tracked color. None searches only for the
+        # tracker's current color.
+        self.search_colors = list(self.tracker.COLOR_RANGES)
         self.request_description = False
         self.image_processing = ImageProcessing()
+        # Sliding-window lane search, narrowed to the previous fit while the lane is tracked.
+        # The perception workers run the full search on every frame instead, since the
+        # frames they get are spread over several processes. Lines below
+        # min_lane_confidence count as no lane.
+        self.lane_detector = LaneDetector()
+        self.lane_tracker = LaneTracker(self.lane_detector)
+        self.min_lane_confidence = 0.5
+        # Optional BirdsEyeView: lanes are then found on the metric view of the floor and
+        # steered to with pure pursuit on the point lane_lookahead metres ahead
+        self.birds_eye = birds_eye
+        self.lane_lookahead = 0.8
+        self.wheelbase = 0.256
+        # Steering controllers of the camera modes (pixel errors in, steering out) and the
+        # low-pass and slew-rate limit every autonomous mode's steering goes through; see steer()
+        self.tracking_pid = PID(kp=0.01, output_limit=0.5)
+        self.lane_pid = PID(kp=0.005, output_limit=0.5)
+        self.steering_filter = LowPassFilter(cutoff=25.0)
+        self.steering_limiter = RateLimiter(rate=4.0)
+        # State the previous tick ended in
+        self.previous_state = self.state
+        # Error the last tick steered on (pixels, metres with birds_eye), None with no target
+        self.steering_error = None
+        # Optional PerceptionExecutor that runs the detectors in worker processes
+        self.perception = perception
+        self.perception_results = {}
+        self.frame_count = 0
 
-    def get_action(self, command, image, depth_data, lidar_distances, lidar_angles, gamepad_new_read, gamepad, target_location=None):
+    def detect(self, detector, function, data, default=None, fallback=False):
+        # With a perception executor the result comes from the workers, possibly from a
+        # frame or two back; without one the detector runs here on the current data.
+        # With fallback it also runs here while the workers have no result for it.
+        if self.perception is None:
+            return function(data)
+        if detector not in self.perception.detectors:
+            return function(data)
+        frame_result = self.perception_results.get(detector)
+        if frame_result is None and fallback:
+            return function(data)
+        if frame_result is None or frame_result[1] is None:
+            return default
+        return frame_result[1]
+
+    def find_lane_lines(self, image):
+        return self.image_processing.find_lane_lines(image, detector=self.lane_tracker, birds_eye=self.birds_eye)
+
+    def steer(self, controller, error, timestamp):
+        # Steering from a mode's controller (None passes error through), smoothed and slew-rate
+        # limited. The controllers start over whenever the agent comes into a mode from another
+        # one, even one that lasted a single tick; the filter and the limiter carry on, so the
+        # switch itself does not jump.
+        if self.state != self.previous_state:
+            self.tracking_pid.reset()
+            self.lane_pid.reset()
+        steering = error if controller is None else controller.update(error, timestamp)
+        steering = self.steering_filter.update(steering, timestamp)
+        return float(self.steering_limiter.update(steering, timestamp))
+
+    def get_action_from_snapshot(self, command, snapshot, target_location=None):
+        return self.get_action(command, snapshot.frame, snapshot.depth_data, snapshot.lidar_distances, snapshot.lidar_angles,
+                               snapshot.gamepad_new_read, snapshot.gamepad, target_location=target_location,
+                               timestamps=snapshot.timestamps)
+
+    def update_costmap(self, depth_data, scan, timestamps=None):
+        # Each sensor is written in only when its timestamp shows a new reading
+        timestamps = timestamps or {}
+        now = time.time()
+        if scan is not None and self.costmap.last_update.get("lidar") != timestamps.get("lidar", now):
+            heading = self.odometry.pose[2]
+            self.odometry.update(scan.points, timestamps.get("lidar", now))
+            # Turn what the costmap remembers with the car before the new scan goes in
+            self.costmap.rotate(np.angle(np.exp(1j * (self.odometry.pose[2] - heading))))
+            self.costmap.update("lidar", scan.distances, scan.angles, timestamps.get("lidar", now))
+            self.ttc.update_ranges(scan.sector_ranges(self.ttc.num_sectors), timestamps.get("lidar", now))
+        if depth_data is not None and self.costmap.last_update.get("depth") != timestamps.get("depth", now):
+            depth_distances, depth_angles = self.depth_profile.scan(depth_data)
+            self.costmap.update("depth", depth_distances, depth_angles, timestamps.get("depth", now))
+
+    def get_action(self, command, image, depth_data, lidar_distances, lidar_angles, gamepad_new_read, gamepad, target_location=None,
+                   timestamps=None):
         throttle = 0.0
         steering = 0.0
         self.request_description = False # Reset request
+        self.steering_error = None
+        self.previous_state = self.state
+        self.frame_count += 1
+        frame_id = getattr(image, 'frame_id', self.frame_count)
+        # Keep the Frame so the detectors share its HSV/gray/crop cache for this tick
+        image = as_frame(image)
+        timestamp = image.timestamp if image is not None else time.time()
+
+        if self.perception is not None:
+            self.perception.submit(frame_id, image.image if image is not None else None, depth_data,
+                                   color=self.tracker.current_color_to_track)
+            self.perception_results = self.perception.results(frame_id)
+        self.scan = self.scan_preprocessor.process(lidar_distances, lidar_angles, (timestamps or {}).get("lidar"))
+        self.update_costmap(depth_data, self.scan, timestamps)
+        if self.map_cell is not None:
+            self.start_location = self.map_cell(self.odometry.pose[0], self.odometry.pose[1])
 
         if command == "navigate":
             self.state = "navigating"
-            # For demonstration, we'll assume the QCar starts at (0,0)
-            start_node = (0, 0)
-            self.path = self.planner.find_path(start_node, target_location)
-            self.path_index = 0
+            start_node = self.start_location
+            path = self.planner.find_path(start_node, target_location)
+            # The same plan comes back from the cache until the car or the map moves on
+            if path is not self.path:
+                self.path = path
+                self.path_index = 0
         elif command == "explore":
             self.state = "exploring"
         elif command == "teleop":
@@ -52,67 +173,75 @@ class Agent:
                 steering = gamepad.rightJoystickX
             return throttle, steering
 
-        # Prioritize obstacle avoidance using Lidar and Depth
-        if self.avoider_lidar.is_obstacle_present(lidar_distances, lidar_angles) or \
-           self.avoider_depth.is_obstacle_present(depth_data):
+        # Prioritize obstacle avoidance using the fused Lidar and depth costmap, looking only
+        # ahead: a wall the car is passing or has just passed is no reason to reverse
+        if self.costmap.is_obstacle_present(self.avoider_lidar.min_distance, center=self.avoider_lidar.forward_angle,
+                                            half_angle=self.avoider_lidar.obstacle_fov / 2):
             throttle = -0.2 # Reverse
             steering = 0.5 # Turn right
             return throttle, steering
 
         # VFH-based local steering for autonomous modes
-        vfh_steering = self.avoider_lidar.get_steering_direction(lidar_distances, lidar_angles)
+        vfh_steering = self.avoider_lidar.get_steering_direction(*self.costmap.as_scan())
 
         if self.state == "navigating":
             if self.path and self.path_index < len(self.path):
                 throttle = 0.2
+                # Move on to the next path node once the car is within a cell of this one
+                current_node = self.start_location
+                while self.path_index < len(self.path) - 1 and \
+                        max(abs(self.path[self.path_index][0] - current_node[0]), abs(self.path[self.path_index][1] - current_node[1])) <= 1:
+                    self.path_index += 1
                 # Combine VFH with path following
                 # If VFH suggests a significant turn, prioritize it
                 if np.abs(vfh_steering) > 0.1:
-                    steering = vfh_steering
+                    steering = self.steer(None, vfh_steering, timestamp)
                 else:
-                    # Otherwise, try to steer towards the next path node
-                    # This is a very simplified approach and would need a proper path follower
-                    current_node = (0,0) # Assuming current position is (0,0) for simplicity
+                    # Otherwise steer towards the next path node from the odometry pose; cell
+                    # rows run along x and columns along y, and positive steering turns left
                     next_node = self.path[self.path_index]
-                    
-                    # Calculate desired steering towards next_node
-                    # This is a placeholder, a real implementation would use PID or similar
-                    desired_steering = 0.0
-                    if next_node[1] > current_node[1]: # If next node is to the right
-                        desired_steering = 0.1
-                    elif next_node[1] < current_node[1]: # If next node is to the left
-                        desired_steering = -0.1
-
-                    steering = desired_steering
-
-                # Advance to next path node if close enough (simplified)
-                # In a real system, this would be based on actual position and distance
-                if self.path_index < len(self.path) - 1 and np.linalg.norm(np.array(current_node) - np.array(self.path[self.path_index])) < 0.5:
-                    self.path_index += 1
+                    bearing = np.arctan2(next_node[1] - current_node[1], next_node[0] - current_node[0])
+                    error = np.angle(np.exp(1j * (bearing - self.odometry.pose[2])))
+                    steering = self.steer(None, np.clip(error, -self.avoider_lidar.max_steering, self.avoider_lidar.max_steering), timestamp)
 
             else:
                 self.state = "stopped"
 
-        object_center, object_area = self.tracker.find_object(image)
-        face_bbox = self.face_detector.find_face(image)
+        # Only run the detectors the current mode actually uses
+        object_center, object_area = None, 0
+        if self.state in ("exploring", "searching", "tracking"):
+            # The workers drop their results when the tracked color changes, so the first
+            # frames after a switch are looked at here
+            object_center, object_area = self.detect("color", self.tracker.find_object, image, default=(None, 0), fallback=True)
+        face_bbox = None
+        if self.state == "face_tracking":
+            face_bbox = self.detect("face", self.face_tracker.find_face, image)
 
         if self.state == "exploring":
             throttle = 0.2
-            steering = vfh_steering
+            steering = self.steer(None, vfh_steering, timestamp)
             if object_center is not None:
                 self.state = "stopped"
                 self.request_description = True # Request description from main loop
 
         if self.state == "searching":
             throttle = 0.2
-            steering = vfh_steering
+            if object_center is None and self.search_colors:
+                # One classification pass covers every color being searched for
+                color, center, area = self.tracker.find_largest_object(image, self.search_colors)
+                if color is not None:
+                    self.tracker.set_color_to_track(color)
+                    object_center, object_area = center, area
             if object_center is not None:
                 self.state = "tracking"
+            else:
+                steering = self.steer(None, vfh_steering, timestamp)
 
         if self.state == "tracking":
             if object_center is not None:
                 error = self.tracker.camera_width / 2 - object_center[0]
-                steering = np.clip(error / 100.0, -0.5, 0.5)
+                self.steering_error = error
+                steering = self.steer(self.tracking_pid, error, timestamp)
                 throttle = 0.2
             else:
                 self.state = "searching"
@@ -122,40 +251,46 @@ class Agent:
                 x, y, w, h = face_bbox
                 face_center_x = x + w // 2
                 error = self.tracker.camera_width / 2 - face_center_x
-                steering = np.clip(error / 100.0, -0.5, 0.5)
+                self.steering_error = error
+                steering = self.steer(self.tracking_pid, error, timestamp)
                 throttle = 0.1 # Move slowly towards the face
             else:
                 throttle = 0.0
                 steering = 0.0 # Stop if face is lost
 
         if self.state == "lane_following":
-            # Decode base64 image if it's a string
-            if isinstance(image, str):
-                nparr = np.frombuffer(base64.b64decode(image), np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            # Crop image for lane detection (adjust these values based on your camera and lane position)
-            cropped_image = image[int(image.shape[0]*0.7):int(image.shape[0]*0.9), 0:image.shape[1]]
-            hsv_image = cv2.cvtColor(cropped_image, cv2.COLOR_BGR2HSV)
-
-            # Yellow lane detection (from lanefollower.py)
-            lower_yellow = np.array([10, 50, 100])
-            upper_yellow = np.array([45, 255, 255])
-            binary_image = self.image_processing.binary_thresholding(hsv_image, lower_yellow, upper_yellow)
-
-            slope, intercept = self.image_processing.find_slope_intercept_from_binary(binary_image)
+            if self.birds_eye is not None:
+                # The perception workers only know the camera band, so the warp runs here
+                lane = self.find_lane_lines(image)
+            else:
+                lane = self.detect("lane", self.find_lane_lines, image)
+            lines, (band_height, band_width) = lane if lane is not None else ([], (0, 0))
+            lines = [line for line in lines if line.confidence >= self.min_lane_confidence]
 
-            if not np.isnan(slope) and not np.isnan(intercept):
+            if lines and self.birds_eye is not None:
+                # Pure pursuit: the arc through the lane point ahead gives the steering angle
+                lookahead = np.clip(self.lane_lookahead, *self.birds_eye.forward_range)
+                lateral = np.mean([self.birds_eye.lateral_at(line, lookahead) for line in lines])
+                self.steering_error = lateral
+                steering = self.steer(None, np.clip(np.arctan(2 * self.wheelbase * lateral / lookahead ** 2), -0.5, 0.5), timestamp)
+                throttle = 0.1
+            elif lines:
                 # Simple P-controller for steering based on lane position
                 # Adjust these constants as needed for your QCar
-                center_x = binary_image.shape[1] / 2
-                lane_center_x = (binary_image.shape[0] - intercept) / slope if slope != 0 else center_x
+                center_x = band_width / 2
+                # Where the lane lines cross the bottom row of the band
+                lane_center_x = np.mean([line.x_at(band_height - 1) for line in lines])
                 
                 error = center_x - lane_center_x
-                steering = np.clip(error * 0.005, -0.5, 0.5) # Proportional control
+                self.steering_error = error
+                steering = self.steer(self.lane_pid, error, timestamp) # Proportional control
                 throttle = 0.1 # Constant throttle for lane following
             else:
                 throttle = 0.0
                 steering = 0.0 # Stop if lane is lost
 
+        # Ease off as anything ahead closes in, rather than waiting for the reverse threshold
+        if throttle > 0:
+            throttle *= self.ttc.throttle_scale()
+
         return throttle, steering
\ No newline at end of file
@@ -0,0 +1,121 @@
+import numpy as np
+import cv2
+
+class BirdsEyeView:
+    # Inverse perspective mapping of the floor in front of a camera onto a metric grid.
+    # Output row 0 is forward_range[1] ahead and column 0 is lateral_range[1] to the left,
+    # one pixel per `resolution` metres. project maps (N, 2) ground points (forward, left)
+    # in metres to (N, 2) pixels of the camera image; source_offset is (row, column) of
+    # that camera image inside the frames warp() is given (e.g. the front camera in the
+    # stitched panorama). The remap table is built once per frame shape and only covers
+    # the source rows the ground region projects to, so warp() reads just that band and
+    # writes into a reused buffer (valid until the next warp).
+    def __init__(self, project, forward_range=(0.3, 1.5), lateral_range=(-0.5, 0.5), resolution=0.005,
+                 source_offset=(0, 0)):
+        self.project = project
+        self.forward_range = forward_range
+        self.lateral_range = lateral_range
+        self.resolution = resolution
+        self.source_offset = source_offset
+        self.shape = (int(round((forward_range[1] - forward_range[0]) / resolution)),
+                      int(round((lateral_range[1] - lateral_range[0]) / resolution)))
+        self.input_shape = None
+        self.maps = None
+        self.rows = None
+        self.buffer = None
+
+    @classmethod
+    def from_points(cls, image_points, ground_points, **kwargs):
+        # Calibrate from four floor marks: their pixels and their (forward, left) in metres
+        homography = cv2.getPerspectiveTransform(np.float32(ground_points), np.float32(image_points))
+
+        def project(points):
+            return cv2.perspectiveTransform(points.reshape(-1, 1, 2).astype(np.float64), homography).reshape(-1, 2)
+        return cls(project, **kwargs)
+
+    @classmethod
+    def from_camera(cls, image_size, horizontal_fov, height, pitch, camera_matrix=None, distortion=None, **kwargs):
+        # Pinhole camera `height` metres above the floor, tilted down by pitch (radians).
+        # image_size is (width, height); camera_matrix defaults to a centred one with the
+        # focal length that gives horizontal_fov. distortion is passed to cv2.projectPoints,
+        # so lens undistortion goes into the same remap table.
+        width, image_height = image_size
+        if camera_matrix is None:
+            focal = width / 2 / np.tan(horizontal_fov / 2)
+            camera_matrix = np.array([[focal, 0, width / 2], [0, focal, image_height / 2], [0, 0, 1]])
+        camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        distortion = np.zeros(5) if distortion is None else np.asarray(distortion, dtype=np.float64)
+        # Rows are the camera's x (right), y (down) and z (optical axis) in the ground frame
+        c, s = np.cos(pitch), np.sin(pitch)
+        rotation = np.array([[0.0, -1.0, 0.0], [-s, 0.0, -c], [c, 0.0, -s]])
+        rvec, _ = cv2.Rodrigues(rotation)
+        tvec = -rotation @ np.array([0.0, 0.0, height])
+
+        def project(points):
+            ground = np.column_stack((points, np.zeros(len(points))))
+            pixels, _ = cv2.projectPoints(ground, rvec, tvec, camera_matrix, distortion)
+            return pixels.reshape(-1, 2)
+        return cls(project, **kwargs)
+
+    @classmethod
+    def from_config(cls, config):
+        # Settings from a calibration file: either image_points/ground_points or the camera
+        # geometry (image_size, horizontal_fov and pitch in degrees, height in metres)
+        config = dict(config)
+        kwargs = {key: tuple(config.pop(key)) for key in ('forward_range', 'lateral_range', 'source_offset') if key in config}
+        if 'resolution' in config:
+            kwargs['resolution'] = config.pop('resolution')
+        if 'image_points' in config:
+            return cls.from_points(config['image_points'], config['ground_points'], **kwargs)
+        return cls.from_camera(tuple(config['image_size']), np.radians(config['horizontal_fov']), config['height'],
+                               np.radians(config['pitch']), camera_matrix=config.get('camera_matrix'),
+                               distortion=config.get('distortion'), **kwargs)
+
+    def to_ground(self, rows, columns):
+        # (forward, left) in metres of output pixels
+        forward = self.forward_range[1] - (np.asarray(rows) + 0.5) * self.resolution
+        left = self.lateral_range[1] - (np.asarray(columns) + 0.5) * self.resolution
+        return forward, left
+
+    def to_pixels(self, forward, left):
+        rows = (self.forward_range[1] - np.asarray(forward)) / self.resolution - 0.5
+        columns = (self.lateral_range[1] - np.asarray(left)) / self.resolution - 0.5
+        return rows, columns
+
+    def configure(self, input_shape):
+        self.input_shape = tuple(input_shape)
+        rows, columns = np.indices(self.shape)
+        forward, left = self.to_ground(rows.ravel(), columns.ravel())
+        pixels = self.project(np.column_stack((forward, left))) + (self.source_offset[1], self.source_offset[0])
+        map_x = pixels[:, 0].reshape(self.shape).astype(np.float32)
+        map_y = pixels[:, 1].reshape(self.shape).astype(np.float32)
+        # Only the source rows the table reads are handed to remap
+        inside = (map_y > -1) & (map_y < input_shape[0]) & (map_x > -1) & (map_x < input_shape[1])
+        if inside.any():
+            top = max(0, int(np.floor(map_y[inside].min())))
+            bottom = min(input_shape[0], int(np.ceil(map_y[inside].max())) + 2)
+        else:
+            top, bottom = 0, input_shape[0]
+        self.rows = (top, bottom)
+        # Pixels outside the camera image come out black instead of smeared
+        map_x[~inside] = -10.0
+        map_y[~inside] = -10.0
+        self.maps = cv2.convertMaps(map_x, map_y - top, cv2.CV_16SC2)
+        channels = input_shape[2:] if len(input_shape) > 2 else ()
+        self.buffer = np.zeros(self.shape + tuple(channels), dtype=np.uint8)
+
+    def warp(self, image):
+        if image is None:
+            return None
+        if image.shape != self.input_shape:
+            self.configure(image.shape)
+        top, bottom = self.rows
+        cv2.remap(image[top:bottom], self.maps[0], self.maps[1], cv2.INTER_LINEAR, dst=self.buffer,
+                  borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        return self.buffer
+
+    def lateral_at(self, line, forward):
+        # Left offset in metres of a LaneLine fitted in the warped image, `forward` metres ahead
+        row, _ = self.to_pixels(forward, 0.0)
+        _, left = self.to_ground(row, line.x_at(row))
+        return float(left)
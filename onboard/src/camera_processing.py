@@ -1,7 +1,7 @@
 
 import cv2
 import numpy as np
-import base64
+from src.frame import as_frame
 
 class ColorTracker:
     def __init__(self, camera_width, camera_height):
@@ -17,6 +17,87 @@ class ColorTracker:
             "yellow": [(np.array([20, 100, 100]), np.array([30, 255, 255]))]
         }
         self.current_color_to_track = "yellow" # Default color
+        self.min_area = 300
+        self.build_color_lut()
+
+    def build_color_lut(self):
+        # Classify pixels against every range in one pass. Each (lower, upper) range gets
+        # a bit; per-channel lookup tables mark which ranges each H, S and V value falls
+        # in, and ANDing the three looked-up channels leaves the bits of the ranges a
+        # pixel is inside. Call this again after changing COLOR_RANGES.
+        num_ranges = sum(len(ranges) for ranges in self.COLOR_RANGES.values())
+        self.label_dtype = np.uint8 if num_ranges <= 8 else np.uint32
+        lut = np.zeros((256, 3), dtype=self.label_dtype)
+        self.color_bits = {}
+        bit = 0
+        for color, ranges in self.COLOR_RANGES.items():
+            color_bits = 0
+            for lower, upper in ranges:
+                for channel in range(3):
+                    lut[int(lower[channel]):int(upper[channel]) + 1, channel] |= self.label_dtype(1 << bit)
+                color_bits |= 1 << bit
+                bit += 1
+            self.color_bits[color] = color_bits
+        self.color_lut = lut
+
+    def classify_colors(self, image):
+        # Per-pixel bitmask of the color ranges each pixel falls in, cached on the frame
+        frame = as_frame(image)
+        return frame.product(("color_labels", id(self.color_lut)), lambda: self._classify(frame.hsv()))
+
+    def _classify(self, hsv):
+        if self.label_dtype == np.uint8:
+            bits = cv2.LUT(hsv, self.color_lut.reshape(256, 1, 3))
+        else:
+            bits = np.stack([self.color_lut[hsv[:, :, c], c] for c in range(3)], axis=2)
+        labels = cv2.bitwise_and(bits[:, :, 0], bits[:, :, 1])
+        return cv2.bitwise_and(labels, bits[:, :, 2], dst=labels)
+
+    def color_mask(self, image, color_name):
+        labels = self.classify_colors(image)
+        # Non-zero wherever the pixel is in one of the color's ranges
+        mask = np.bitwise_and(labels, self.label_dtype(self.color_bits[color_name]))
+        if mask.dtype != np.uint8:
+            mask = (mask != 0).astype(np.uint8)
+        return mask
+
+    def find_objects(self, image, colors=None):
+        # Largest blob of every requested color (default: all of COLOR_RANGES) from a
+        # single classification pass. Returns {color: ((cx, cy), area)} or (None, 0).
+        frame = as_frame(image)
+        colors = list(self.COLOR_RANGES) if colors is None else colors
+        if frame is None:
+            return {color: (None, 0) for color in colors}
+
+        results = {}
+        for color in colors:
+            if color not in self.color_bits:
+                results[color] = (None, 0)
+                continue
+            mask = self.color_mask(frame, color)
+            if cv2.countNonZero(mask) <= self.min_area:
+                results[color] = (None, 0)
+                continue
+            num_labels, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+            if num_labels <= 1:
+                results[color] = (None, 0)
+                continue
+            largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+            area = float(stats[largest, cv2.CC_STAT_AREA])
+            if area > self.min_area:
+                cx, cy = centroids[largest]
+                results[color] = ((int(cx), int(cy)), area)
+            else:
+                results[color] = (None, 0)
+        return results
+
+    def find_largest_object(self, image, colors=None):
+        # The biggest object over several colors: (color, center, area), or (None, None, 0)
+        best = (None, None, 0)
+        for color, (center, area) in self.find_objects(image, colors).items():
+            if center is not None and area > best[2]:
+                best = (color, center, area)
+        return best
 
     def set_color_to_track(self, color_name):
         if color_name in self.COLOR_RANGES:
@@ -25,21 +106,17 @@ class ColorTracker:
             print(f"Warning: Color '{color_name}' not recognized. Keeping '{self.current_color_to_track}'.")
 
     def find_object(self, image):
-        # Decode base64 image if it's a string
-        if isinstance(image, str):
-            nparr = np.frombuffer(base64.b64decode(image), np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        mask = np.zeros((self.camera_height, self.camera_width), dtype=np.uint8)
+        frame = as_frame(image)
+        if frame is None:
+            return None, 0
 
-        if self.current_color_to_track in self.COLOR_RANGES:
-            for lower, upper in self.COLOR_RANGES[self.current_color_to_track]:
-                mask |= cv2.inRange(hsv, lower, upper)
+        if self.current_color_to_track in self.color_bits:
+            mask = self.color_mask(frame, self.current_color_to_track)
         else:
             return None, 0 # No valid color to track
-        
-        contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+
+        # The largest contour is always an outer one, so the hierarchy is not needed
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         if len(contours) > 0:
             # Find the largest contour
@@ -47,7 +124,7 @@ class ColorTracker:
             area = cv2.contourArea(largest_contour)
 
             # Only consider contours above a certain size to filter noise
-            if area > 300:
+            if area > self.min_area:
                 # Get the center of the contour
                 M = cv2.moments(largest_contour)
                 if M["m00"] > 0:
@@ -62,16 +139,118 @@ class FaceDetector:
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
 
     def find_face(self, image):
-        # Decode base64 image if it's a string
-        if isinstance(image, str):
-            nparr = np.frombuffer(base64.b64decode(image), np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame = as_frame(image)
+        if frame is None:
+            return None
+
+        return self.detect(frame.gray())
 
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(60, 60))
+    def detect(self, gray, min_size=(60, 60)):
+        faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=min_size)
 
         if len(faces) > 0:
             # Return the largest face
             x, y, w, h = sorted(faces, key=lambda b: b[2] * b[3], reverse=True)[0]
             return (x, y, w, h)
         return None
+
+class FaceTracker:
+    # Detect-then-track: the Haar cascade runs over the search region every
+    # detect_every frames or when the track is lost. In between, the face is followed
+    # by template matching inside a window around its predicted position.
+    # last_source reports which path produced the latest result: "detect", "track" or None.
+    def __init__(self, detector=None, detect_every=15, search_margin=0.5, match_threshold=0.6,
+                 detection_level=1, region=None):
+        self.detector = detector or FaceDetector()
+        self.detect_every = detect_every
+        self.search_margin = search_margin
+        self.match_threshold = match_threshold
+        # Run the cascade on a downscaled pyramid level; faces are still at least 60 px at full size
+        self.detection_level = detection_level
+        # (y0, y1, x0, x1) of the panorama to run full detection in, e.g. the front camera
+        self.region = region
+        self.reset()
+
+    def reset(self):
+        self.bbox = None
+        self.template = None
+        self.velocity = (0.0, 0.0)
+        self.frames_since_detection = 0
+        self.last_source = None
+        self.last_score = 0.0
+
+    def find_face(self, image):
+        bbox, _ = self.update(image)
+        return bbox
+
+    def update(self, image):
+        frame = as_frame(image)
+        if frame is None:
+            self.reset()
+            return None, None
+
+        gray = frame.gray()
+        self.frames_since_detection += 1
+        bbox, source = None, None
+        if self.bbox is not None and self.frames_since_detection < self.detect_every:
+            bbox = self._track(gray)
+            source = "track" if bbox is not None else None
+
+        if bbox is None:
+            bbox = self._detect(frame)
+            source = "detect" if bbox is not None else None
+            self.frames_since_detection = 0
+            if bbox is not None:
+                x, y, w, h = bbox
+                self.template = gray[y:y + h, x:x + w].copy()
+
+        if bbox is not None and self.bbox is not None:
+            self.velocity = (bbox[0] - self.bbox[0], bbox[1] - self.bbox[1])
+        else:
+            self.velocity = (0.0, 0.0)
+        self.bbox = bbox
+        self.last_source = source
+        return bbox, source
+
+    def _detect(self, frame):
+        scale = 2 ** self.detection_level
+        gray = frame.product(("gray_pyramid", self.detection_level), lambda: self._gray_level(frame, self.detection_level))
+        y0, x0 = 0, 0
+        if self.region is not None:
+            y0, y1, x0, x1 = (v // scale for v in self.region)
+            gray = gray[y0:y1, x0:x1]
+        min_size = (max(1, 60 // scale), max(1, 60 // scale))
+        face = self.detector.detect(gray, min_size=min_size)
+        if face is None:
+            return None
+        x, y, w, h = face
+        return (int((x + x0) * scale), int((y + y0) * scale), int(w * scale), int(h * scale))
+
+    def _gray_level(self, frame, level):
+        gray = frame.gray()
+        for _ in range(level):
+            gray = cv2.pyrDown(gray)
+        return gray
+
+    def _track(self, gray):
+        x, y, w, h = self.bbox
+        # Constant-velocity prediction, then search a window around it
+        px = int(round(x + self.velocity[0]))
+        py = int(round(y + self.velocity[1]))
+        margin_x = int(w * self.search_margin)
+        margin_y = int(h * self.search_margin)
+        wx0 = max(0, px - margin_x)
+        wy0 = max(0, py - margin_y)
+        wx1 = min(gray.shape[1], px + w + margin_x)
+        wy1 = min(gray.shape[0], py + h + margin_y)
+        window = gray[wy0:wy1, wx0:wx1]
+        th, tw = self.template.shape
+        if window.shape[0] < th or window.shape[1] < tw:
+            return None
+
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        self.last_score = score
+        if score < self.match_threshold:
+            return None
+        return (wx0 + location[0], wy0 + location[1], tw, th)
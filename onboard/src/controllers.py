@@ -0,0 +1,164 @@
+import numpy as np
+
+# Stateful controllers for the control loop, each with a run() that replays a whole trace
+# offline. run() starts from the reset state, leaves the controller's state alone and
+# gives the same outputs as calling update() on every sample. Traces are (..., T) arrays
+# and gains may be arrays that broadcast against them, so many candidate settings can be
+# evaluated on one trace at once (e.g. kp of shape (N, 1) against errors of shape (T,)).
+
+def _interval(previous, timestamp, sample_time):
+    # Time since the previous update, sample_time without usable timestamps
+    if timestamp is None or previous is None or timestamp <= previous:
+        return sample_time
+    return timestamp - previous
+
+def _intervals(timestamps, count, sample_time):
+    # Time since the previous sample; the first sample gets sample_time
+    if timestamps is None:
+        return np.full(count, sample_time)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    dt = np.diff(timestamps, prepend=timestamps[0] - sample_time)
+    return np.where(dt > 0, dt, sample_time)
+
+def _affine_scan(scale, offset, initial):
+    # y_t = scale_t * y_{t-1} + offset_t along the last axis, as a log-depth prefix scan:
+    # affine maps compose into affine maps, so step k combines runs of 2^k samples
+    scale, offset = np.broadcast_arrays(np.asarray(scale, dtype=np.float64), np.asarray(offset, dtype=np.float64))
+    scale, offset = scale.copy(), offset.copy()
+    shift = 1
+    while shift < scale.shape[-1]:
+        offset[..., shift:] = scale[..., shift:] * offset[..., :-shift] + offset[..., shift:]
+        scale[..., shift:] = scale[..., shift:] * scale[..., :-shift]
+        shift *= 2
+    return scale * initial + offset
+
+def _clamped_cumsum(steps, low, high, initial=0.0):
+    # s_t = clip(s_{t-1} + steps_t, low, high) along the last axis. Each step is the map
+    # s -> clip(s + a, l, h) and those compose into maps of the same form, so this is a
+    # log-depth prefix scan too
+    shift_total, low, high = np.broadcast_arrays(np.asarray(steps, dtype=np.float64), low, high)
+    shift_total, low, high = shift_total.astype(np.float64), low.astype(np.float64), high.astype(np.float64)
+    shift = 1
+    while shift < shift_total.shape[-1]:
+        # Earlier run (index t - shift) followed by the later run (index t)
+        low[..., shift:], high[..., shift:] = (
+            np.clip(low[..., :-shift] + shift_total[..., shift:], low[..., shift:], high[..., shift:]),
+            np.clip(high[..., :-shift] + shift_total[..., shift:], low[..., shift:], high[..., shift:]))
+        shift_total[..., shift:] = shift_total[..., :-shift] + shift_total[..., shift:]
+        shift *= 2
+    return np.clip(initial + shift_total, low, high)
+
+class PID:
+    # output = kp * e + ki * integral(e) + kd * de/dt, clipped to +-output_limit.
+    # The integral is clamped to +-integral_limit as it accumulates (anti-windup); the
+    # derivative is 0 on the first sample after a reset.
+    def __init__(self, kp=1.0, ki=0.0, kd=0.0, output_limit=None, integral_limit=None, sample_time=0.01):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limit = output_limit
+        self.integral_limit = integral_limit
+        self.sample_time = sample_time
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.previous_error = None
+        self.timestamp = None
+
+    def _limit(self, value, limit):
+        return value if limit is None else np.clip(value, -limit, limit)
+
+    def update(self, error, timestamp=None):
+        dt = _interval(self.timestamp, timestamp, self.sample_time)
+        self.integral = self._limit(self.integral + error * dt, self.integral_limit)
+        derivative = 0.0 if self.previous_error is None else (error - self.previous_error) / dt
+        self.previous_error = error
+        self.timestamp = timestamp
+        return self._limit(self.kp * error + self.ki * self.integral + self.kd * derivative, self.output_limit)
+
+    def run(self, errors, timestamps=None):
+        errors = np.asarray(errors, dtype=np.float64)
+        dt = _intervals(timestamps, errors.shape[-1], self.sample_time)
+        if self.integral_limit is None:
+            integral = np.cumsum(errors * dt, axis=-1)
+        else:
+            integral = _clamped_cumsum(errors * dt, -self.integral_limit, self.integral_limit)
+        derivative = np.zeros_like(errors)
+        derivative[..., 1:] = np.diff(errors, axis=-1) / dt[1:]
+        return self._limit(self.kp * errors + self.ki * integral + self.kd * derivative, self.output_limit)
+
+class LowPassFilter:
+    # First-order low-pass with cutoff in rad/s: y += a * (x - y), a = w dt / (1 + w dt),
+    # so a late sample is followed more closely. The first sample after a reset passes through.
+    def __init__(self, cutoff=25.0, sample_time=0.01):
+        self.cutoff = cutoff
+        self.sample_time = sample_time
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.timestamp = None
+
+    def update(self, value, timestamp=None):
+        if self.value is None:
+            self.value = value
+        else:
+            dt = _interval(self.timestamp, timestamp, self.sample_time)
+            alpha = self.cutoff * dt / (1.0 + self.cutoff * dt)
+            self.value = self.value + alpha * (value - self.value)
+        self.timestamp = timestamp
+        return self.value
+
+    def run(self, values, timestamps=None):
+        values = np.asarray(values, dtype=np.float64)
+        dt = _intervals(timestamps, values.shape[-1], self.sample_time)
+        cutoff = np.asarray(self.cutoff, dtype=np.float64)
+        alpha = cutoff * dt / (1.0 + cutoff * dt)
+        # The first sample passes through
+        alpha = np.broadcast_to(alpha, np.broadcast_shapes(alpha.shape, values.shape)).copy()
+        alpha[..., 0] = 1.0
+        return _affine_scan(1.0 - alpha, alpha * values, 0.0)
+
+class RateLimiter:
+    # Slew-rate limit: the output moves towards the input by at most rate * dt per sample.
+    # The first sample after a reset passes through. Limited steps do not compose into a
+    # closed form the way the PID's and the filter's do, so run() steps through time: on
+    # plain floats for a single trace, otherwise once per sample across every trace and
+    # candidate rate in the batch.
+    def __init__(self, rate=4.0, sample_time=0.01):
+        self.rate = rate
+        self.sample_time = sample_time
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.timestamp = None
+
+    def update(self, value, timestamp=None):
+        if self.value is None:
+            self.value = value
+        else:
+            step = self.rate * _interval(self.timestamp, timestamp, self.sample_time)
+            self.value = self.value + np.clip(value - self.value, -step, step)
+        self.timestamp = timestamp
+        return self.value
+
+    def run(self, values, timestamps=None):
+        values = np.asarray(values, dtype=np.float64)
+        steps = np.asarray(self.rate, dtype=np.float64) * _intervals(timestamps, values.shape[-1], self.sample_time)
+        shape = np.broadcast_shapes(values.shape, steps.shape)
+        if len(shape) == 1:
+            output = []
+            previous = None
+            for value, step in zip(values.tolist(), np.broadcast_to(steps, shape).tolist()):
+                previous = value if previous is None else previous + min(max(value - previous, -step), step)
+                output.append(previous)
+            return np.array(output)
+        values, steps = np.broadcast_to(values, shape), np.broadcast_to(steps, shape)
+        output = np.empty(shape)
+        output[..., 0] = values[..., 0]
+        for t in range(1, shape[-1]):
+            previous = output[..., t - 1]
+            output[..., t] = previous + np.clip(values[..., t] - previous, -steps[..., t], steps[..., t])
+        return output
@@ -0,0 +1,119 @@
+import time
+import numpy as np
+
+class PolarCostmap:
+    # Egocentric polar costmap that the Lidar and the depth pseudo-scan both write into.
+    # Each source keeps the nearest range per bearing bin and when it was seen. A scan
+    # replaces the bins its sensor covers (an empty covered bin is seen as free) and
+    # leaves the others to age, so each sensor updates at its own rate. Readings older
+    # than max_age are dropped and the rest fade with decay_time: an obstacle seen age
+    # seconds ago counts as exp(age / decay_time) times farther away, so the obstacle
+    # check and the VFH trust it less the older it gets. Ages are measured against the
+    # newest sensor timestamp so that replayed recordings age the same way.
+    # Bin k is centred on k * bin_width, with angle 0 straight ahead as in the VFH.
+    def __init__(self, num_bins=180, max_range=5.0, decay_time=0.3, max_age=1.0):
+        self.num_bins = num_bins
+        self.max_range = max_range
+        self.decay_time = decay_time
+        self.max_age = max_age
+        self.bin_width = 2 * np.pi / num_bins
+        self.angles = np.arange(num_bins) * self.bin_width
+        self.ranges = {}
+        self.stamps = {}
+        self.last_update = {}
+        self.now = 0.0
+        self._layouts = {}
+        self._cones = {}
+        # Turn not yet applied because it is less than a bin
+        self._residual = 0.0
+
+    def _layout(self, source, angles):
+        # Bin of every return and the bins the sensor covers, cached per angle array
+        angles = np.asarray(angles, dtype=np.float64)
+        layout = self._layouts.get(source)
+        if layout is None or layout[0].shape != angles.shape or not np.array_equal(layout[0], angles):
+            bins = np.floor(np.mod(angles + self.bin_width / 2, 2 * np.pi) / self.bin_width).astype(np.int64) % self.num_bins
+            covered = np.zeros(self.num_bins, dtype=bool)
+            covered[bins] = True
+            layout = (angles.copy(), bins, covered)
+            self._layouts[source] = layout
+        return layout[1], layout[2]
+
+    def update(self, source, distances, angles, timestamp=None):
+        # Returns False if this reading was already applied
+        if distances is None or angles is None:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.last_update.get(source) == timestamp:
+            return False
+        if source not in self.ranges:
+            self.ranges[source] = np.full(self.num_bins, np.inf)
+            self.stamps[source] = np.full(self.num_bins, -np.inf)
+
+        bins, covered = self._layout(source, angles)
+        distances = np.asarray(distances, dtype=np.float64)
+        # Zero distances are invalid returns
+        valid = np.isfinite(distances) & (distances > 0) & (distances < self.max_range)
+        scan = np.full(self.num_bins, np.inf)
+        np.minimum.at(scan, bins[valid], distances[valid])
+        self.ranges[source][covered] = scan[covered]
+        self.stamps[source][covered] = timestamp
+        self.last_update[source] = timestamp
+        # A clock that jumps back (a replay starting over) restarts the costmap's clock too
+        self.now = timestamp if timestamp < self.now - self.max_age else max(self.now, timestamp)
+        return True
+
+    def rotate(self, delta_heading):
+        # Keep the map egocentric when the car turns by delta_heading (positive to the left).
+        # The map shifts by whole bins; the fraction left over is carried to the next call
+        # so that small turns on every tick still add up.
+        self._residual += delta_heading
+        shift = int(round(self._residual / self.bin_width))
+        self._residual -= shift * self.bin_width
+        if shift:
+            for source in self.ranges:
+                self.ranges[source] = np.roll(self.ranges[source], -shift)
+                self.stamps[source] = np.roll(self.stamps[source], -shift)
+
+    def _weight(self, source, now):
+        # How much each bin's reading still counts, 1 when fresh and 0 past max_age
+        age = now - self.stamps[source]
+        return np.where(age <= self.max_age, np.exp(-np.maximum(age, 0.0) / self.decay_time), 0.0)
+
+    def nearest(self, now=None):
+        # Fused decay-weighted range per bin over all sources (range / weight), inf where
+        # nothing recent was seen
+        now = self.now if now is None else now
+        fused = np.full(self.num_bins, np.inf)
+        for source, ranges in self.ranges.items():
+            weight = self._weight(source, now)
+            with np.errstate(divide='ignore'):
+                np.minimum(fused, np.where(weight > 0, ranges / weight, np.inf), out=fused)
+        return fused
+
+    def cost(self, now=None):
+        # Obstacle cost per bin in [0, 1]: closer is higher, older readings count for less
+        now = self.now if now is None else now
+        cost = np.zeros(self.num_bins)
+        for source, ranges in self.ranges.items():
+            closeness = np.clip((self.max_range - ranges) / self.max_range, 0.0, 1.0)
+            np.maximum(cost, closeness * self._weight(source, now), out=cost)
+        return cost
+
+    def _cone(self, center, half_angle):
+        key = (center, half_angle)
+        cone = self._cones.get(key)
+        if cone is None:
+            offset = np.abs(np.angle(np.exp(1j * (self.angles - center))))
+            cone = offset <= half_angle + 1e-9
+            self._cones[key] = cone
+        return cone
+
+    def is_obstacle_present(self, min_distance, center=0.0, half_angle=np.pi, now=None):
+        # Anything closer than min_distance within half_angle of the center bearing
+        return bool(np.any(self.nearest(now)[self._cone(center, half_angle)] < min_distance))
+
+    def as_scan(self, now=None):
+        # The fused map as a fixed-layout scan for the VFH (0 marks an empty bin)
+        nearest = self.nearest(now)
+        return np.where(np.isfinite(nearest), nearest, 0.0), self.angles
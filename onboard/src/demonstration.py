@@ -1,6 +1,5 @@
 import time
 import cv2
-import numpy as np
 
 class Demonstration:
     def __init__(self, main_app):
@@ -36,12 +35,9 @@ class Demonstration:
         time.sleep(3) # Give time for speech to play
         
         # Capture image and request description
-        image_data = self.main_app.hardware.read_image()
-        if image_data:
-            # Decode base64 for local display and saving
-            nparr = np.frombuffer(base64.b64decode(image_data), np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            cv2.imwrite("current_view.png", image)
+        frame = self.main_app.hardware.read_image()
+        if frame is not None:
+            cv2.imwrite("current_view.png", frame.image)
             description = self.main_app.ai_services.describe_image("current_view.png")
             print(f"Description: {description}")
             self.main_app.ai_services.text_to_speech(description)
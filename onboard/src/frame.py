@@ -0,0 +1,100 @@
+import time
+import base64
+import threading
+import numpy as np
+import cv2
+
+class Frame:
+    # A captured BGR image plus its capture time. The control loop works on
+    # the raw ndarray; the JPEG/base64 forms are only built when a network
+    # consumer asks for them, and then only once per frame.
+    # Derived products (HSV, grayscale, crops, pyramid levels) are also computed on
+    # first request and shared by every detector in the tick. They live as long as
+    # the Frame, so they go away with it when the next frame arrives.
+    def __init__(self, image, timestamp=None, frame_id=0, jpeg_quality=80):
+        self.image = image
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.frame_id = frame_id
+        self.jpeg_quality = jpeg_quality
+        self._jpeg = None
+        self._base64 = None
+        self._lock = threading.Lock()
+        self._products = {}
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def product(self, key, compute):
+        value = self._products.get(key)
+        if value is None:
+            value = compute()
+            self._products[key] = value
+        return value
+
+    def crop(self, roi=None):
+        # roi is (y0, y1, x0, x1) in pixels; crops are views, so they are not cached
+        if roi is None:
+            return self.image
+        y0, y1, x0, x1 = roi
+        return self.image[y0:y1, x0:x1]
+
+    def band(self, top, bottom):
+        # Pixel roi of a horizontal band given as fractions of the image height
+        height = self.image.shape[0]
+        return (int(height * top), int(height * bottom), 0, self.image.shape[1])
+
+    def hsv(self, roi=None):
+        return self._converted("hsv", cv2.COLOR_BGR2HSV, roi)
+
+    def gray(self, roi=None):
+        return self._converted("gray", cv2.COLOR_BGR2GRAY, roi)
+
+    def _converted(self, name, code, roi):
+        # A crop of an already converted full frame is just a view of it
+        full = self._products.get((name, None))
+        if full is not None and roi is not None:
+            y0, y1, x0, x1 = roi
+            return full[y0:y1, x0:x1]
+        return self.product((name, roi), lambda: cv2.cvtColor(self.crop(roi), code))
+
+    def pyramid(self, level):
+        # Level 0 is the frame itself, each further level halves the resolution
+        if level == 0:
+            return self.image
+        return self.product(("pyramid", level), lambda: cv2.pyrDown(self.pyramid(level - 1)))
+
+    def to_jpeg(self):
+        if self._jpeg is None:
+            with self._lock:
+                if self._jpeg is None:
+                    ok, buffer = cv2.imencode('.jpg', self.image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    if not ok:
+                        return None
+                    self._jpeg = buffer.tobytes()
+        return self._jpeg
+
+    def to_base64(self):
+        if self._base64 is None:
+            jpeg = self.to_jpeg()
+            if jpeg is None:
+                return None
+            self._base64 = base64.b64encode(jpeg).decode('utf-8')
+        return self._base64
+
+def as_frame(image):
+    # Wrap a raw ndarray or a legacy base64 JPEG string so detectors can share its cache
+    if image is None or isinstance(image, Frame):
+        return image
+    return Frame(as_ndarray(image))
+
+def as_ndarray(image):
+    # Accept a Frame, a raw ndarray or a legacy base64 JPEG string
+    if image is None:
+        return None
+    if isinstance(image, Frame):
+        return image.image
+    if isinstance(image, str):
+        nparr = np.frombuffer(base64.b64decode(image), np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return image
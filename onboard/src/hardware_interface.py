@@ -4,15 +4,16 @@ import numpy as np
 from pal.products.qcar import QCar, IS_PHYSICAL_QCAR, QCarCameras, QCarRealSense
 from pal.utilities.lidar import Lidar
 from pal.utilities.gamepad import LogitechF710
-import cv2
-import base64
+from src.frame import Frame
+from src.stitching import PanoramaStitcher
+from src.sensor_threads import LatestValue, RepeatFilter, ReadCursor, SensorThread, SensorSnapshot
 
 if not IS_PHYSICAL_QCAR:
     import qlabs_setup
     qlabs_setup.setup()
 
 class QCarHardwareInterface:
-    def __init__(self, frequency=200):
+    def __init__(self, frequency=200, seam_blend_width=0, asynchronous=False):
         self.qcar = QCar(frequency=frequency)
         # Initialize all four CSI cameras for 360-degree view
         self.cameras = QCarCameras(
@@ -24,19 +25,49 @@ class QCarHardwareInterface:
         self.realsense = QCarRealSense(mode='Depth')
         self.lidar = Lidar(type='RPLidar')
         self.gamepad = LogitechF710(1)
+        self.frame_count = 0
+        # Live hardware never runs out of data; the replay backend sets this at the end of a recording
+        self.finished = False
+        # Every sensor reading goes into a latest-value slot stamped with the time it was
+        # acquired. In asynchronous mode every sensor runs its own producer thread that
+        # publishes into its slot, so a slow sensor never stalls the control tick; otherwise
+        # the reads happen on the caller's thread. Either way a reading the driver simply
+        # handed back again is not published, so its slot keeps the time it was first seen.
+        self.asynchronous = asynchronous
+        self.slots = {name: LatestValue() for name in ("image", "depth", "lidar", "gamepad")}
+        self.readers = {
+            "image": self._acquire_image,
+            "depth": self._acquire_depth,
+            "lidar": self._acquire_lidar,
+            "gamepad": self._acquire_gamepad,
+        }
+        self.repeats = {name: RepeatFilter() for name in ("image", "depth", "lidar")}
+        self.sensor_threads = []
+        # Reports each gamepad reading as new once, whether it is read by snapshot or read_gamepad
+        self.gamepad_reads = ReadCursor()
+        # The camera thread can run ahead of the consumers, so give it a deeper buffer ring
+        self.stitcher = PanoramaStitcher(camera_order=("left", "front", "right", "back"), blend_width=seam_blend_width,
+                                         num_buffers=4 if asynchronous else 2)
 
     def __enter__(self):
         self.cameras.__enter__()
         self.realsense.__enter__()
+        if self.asynchronous:
+            self.start_acquisition()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop_acquisition()
         self.qcar.write(0.0, 0.0, np.array([0,0,0,0,0,0,0,0]))
         self.cameras.__exit__(exc_type, exc_val, exc_tb)
         self.realsense.__exit__(exc_type, exc_val, exc_tb)
         self.lidar.terminate()
         self.gamepad.terminate()
 
+    def camera_resolution(self):
+        image = self.cameras.csiFront.imageData
+        return image.shape[1], image.shape[0]
+
     def send_command(self, throttle, steering):
         LEDs = np.array([0, 0, 0, 0, 0, 0, 1, 1])
         if steering > 0.15:
@@ -49,38 +80,96 @@ class QCarHardwareInterface:
             LEDs[5] = 1
         self.qcar.write(throttle, steering, LEDs)
 
+    def start_acquisition(self):
+        if self.sensor_threads:
+            return
+        for name, read_function in self.readers.items():
+            # The gamepad read does not block, so poll it instead of spinning. The other
+            # sensors are read again straight after a new reading, but back off briefly
+            # when the driver only handed back its last one
+            period = 0.01 if name == "gamepad" else 0.0
+            thread = SensorThread(f"{name}-acquisition", read_function, self.slots[name], period=period,
+                                  idle_period=0.001)
+            thread.start()
+            self.sensor_threads.append(thread)
+
+    def stop_acquisition(self):
+        for thread in self.sensor_threads:
+            thread.stop()
+        self.sensor_threads = []
+
+    def _entry(self, name):
+        # (value, sequence, timestamp) of the sensor's latest new reading
+        if self.asynchronous:
+            self.start_acquisition()
+        else:
+            value = self.readers[name]()
+            if value is not None:
+                self.slots[name].publish(value)
+        return self.slots[name].get()
+
+    def read_snapshot(self):
+        # Each slot entry is an immutable tuple, so reading them once gives a coherent set
+        entries = {name: self._entry(name) for name in self.slots}
+        lidar_distances, lidar_angles = entries["lidar"][0] or (None, None)
+        gamepad_new_read = self.gamepad_reads.advance(entries["gamepad"][1])
+        return SensorSnapshot(
+            frame=entries["image"][0],
+            depth_data=entries["depth"][0],
+            lidar_distances=lidar_distances,
+            lidar_angles=lidar_angles,
+            gamepad_new_read=gamepad_new_read,
+            gamepad=self.gamepad,
+            sequences={name: entry[1] for name, entry in entries.items()},
+            timestamps={name: entry[2] for name, entry in entries.items()},
+        )
+
     def read_image(self):
+        return self._entry("image")[0]
+
+    def read_depth_data(self):
+        return self._entry("depth")[0]
+
+    def read_lidar_data(self):
+        return self._entry("lidar")[0] or (None, None)
+
+    def read_gamepad(self):
+        return self.gamepad_reads.advance(self._entry("gamepad")[1]), self.gamepad
+
+    def _acquire_image(self):
         self.cameras.readAll()
+        images = [
+            self.cameras.csiLeft.imageData,
+            self.cameras.csiFront.imageData,
+            self.cameras.csiRight.imageData,
+            self.cameras.csiBack.imageData,
+        ]
+        # Nothing to stitch if the cameras have no new images
+        if not self.repeats["image"].is_new(*[image for image in images if image is not None]):
+            return None
         # Stitch images together to create a 360-degree view
-        # Assuming images are available from csiFront, csiRight, csiBack, csiLeft
-        # This is a simplified stitching, actual stitching might require calibration
-        front_image = self.cameras.csiFront.imageData
-        right_image = self.cameras.csiRight.imageData
-        back_image = self.cameras.csiBack.imageData
-        left_image = self.cameras.csiLeft.imageData
-
-        if all(img is not None for img in [front_image, right_image, back_image, left_image]):
-            # Resize images to a common height if they are not already
-            target_height = front_image.shape[0]
-            right_image_resized = cv2.resize(right_image, (int(right_image.shape[1] * target_height / right_image.shape[0]), target_height))
-            back_image_resized = cv2.resize(back_image, (int(back_image.shape[1] * target_height / back_image.shape[0]), target_height))
-            left_image_resized = cv2.resize(left_image, (int(left_image.shape[1] * target_height / left_image.shape[0]), target_height))
-
-            # Concatenate images horizontally
-            stitched_image = np.concatenate((left_image_resized, front_image, right_image_resized, back_image_resized), axis=1)
-
-            _, buffer = cv2.imencode('.jpg', stitched_image)
-            return base64.b64encode(buffer).decode('utf-8')
+        # The stitcher's placement tables are built once and the panorama is written
+        # into a reused buffer, so this does not allocate per frame
+        stitched_image = self.stitcher.stitch(images)
+
+        if stitched_image is not None:
+            self.frame_count += 1
+            return Frame(stitched_image, timestamp=time.time(), frame_id=self.frame_count)
         return None
 
-    def read_depth_data(self):
+    def _acquire_depth(self):
         self.realsense.read_depth()
-        return self.realsense.imageBufferDepth
+        if not self.repeats["depth"].is_new(self.realsense.imageBufferDepth):
+            return None
+        # The driver reuses its buffer, so publish a copy the consumers can keep
+        return np.copy(self.realsense.imageBufferDepth)
 
-    def read_lidar_data(self):
+    def _acquire_lidar(self):
         self.lidar.read()
-        return self.lidar.distances, self.lidar.angles
+        if self.lidar.angles is None or not self.repeats["lidar"].is_new(self.lidar.distances):
+            return None
+        return np.copy(self.lidar.distances), np.copy(self.lidar.angles)
 
-    def read_gamepad(self):
-        new_read = self.gamepad.read()
-        return new_read, self.gamepad
+    def _acquire_gamepad(self):
+        # Only publish when the gamepad actually produced new data
+        return True if self.gamepad.read() else None
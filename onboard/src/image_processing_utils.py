@@ -1,6 +1,200 @@
 
 import cv2
 import numpy as np
+from src.frame import as_frame
+
+class LaneLine:
+    # One lane line found in a binary band: x = polyval(coefficients, y), with y the
+    # band's row and x its column. confidence is in [0, 1].
+    def __init__(self, coefficients, confidence, pixels):
+        self.coefficients = coefficients
+        self.confidence = confidence
+        self.pixels = pixels
+
+    def x_at(self, y):
+        return np.polyval(self.coefficients, y)
+
+class LaneDetector:
+    # Sliding-window lane search on a binary band that only reads every row_step-th row.
+    # A column histogram of the lower part of the band gives up to `candidates` places a
+    # line may start (peaks at least min_separation of the width apart). Each is then
+    # followed upwards through num_windows windows of +-margin (fraction of the width),
+    # re-centred on the pixels found. Only the pixels inside the windows are read, and a
+    # degree-`degree` polynomial is fitted to their per-row mean columns, so neither blobs
+    # away from the line nor the amount of yellow elsewhere in view change the fit or its cost.
+    # Confidence is the share of windows that found the line, lowered by the fit's
+    # residual relative to the window margin; the max_lines most confident lines are kept,
+    # so a blob that outweighs the line in the histogram does not replace it.
+    def __init__(self, num_windows=8, margin=0.06, min_pixels=10, row_step=2, degree=2, max_lines=1,
+                 candidates=3, min_separation=0.15, histogram_rows=0.5):
+        self.num_windows = num_windows
+        self.margin = margin
+        self.min_pixels = min_pixels
+        self.row_step = row_step
+        self.degree = degree
+        self.max_lines = max_lines
+        self.candidates = max(candidates, max_lines)
+        self.min_separation = min_separation
+        self.histogram_rows = histogram_rows
+        self._windows = {}
+        self._row_windows = {}
+
+    def _bases(self, binary, margin):
+        # Columns where lines start, strongest first
+        height, width = binary.shape
+        top = int(height * (1.0 - self.histogram_rows))
+        histogram = np.count_nonzero(binary[top::self.row_step], axis=0).astype(np.float64)
+        # Pixels within a window's width of a column count towards it
+        histogram = np.convolve(histogram, np.ones(2 * margin + 1), mode='same')
+        bases = []
+        separation = int(self.min_separation * width)
+        for _ in range(self.candidates):
+            base = int(np.argmax(histogram))
+            if histogram[base] < self.min_pixels:
+                break
+            bases.append(base)
+            histogram[max(0, base - separation):base + separation + 1] = 0
+        return bases
+
+    def _window_rows(self, height):
+        # (top, bottom) rows of each window, bottom window first, with top moved down onto
+        # the row_step grid of the whole band; cached per band height
+        windows = self._windows.get(height)
+        if windows is None:
+            edges = np.round(np.linspace(height, 0, self.num_windows + 1)).astype(int)
+            windows = [(int(top + -top % self.row_step), int(bottom)) for top, bottom in zip(edges[1:], edges[:-1])]
+            self._windows[height] = windows
+        return windows
+
+    def row_windows(self, height):
+        # Every row the windows read and the window each one falls in; cached per band height
+        row_windows = self._row_windows.get(height)
+        if row_windows is None:
+            windows = self._window_rows(height)
+            rows = np.concatenate([np.arange(top, bottom, self.row_step) for top, bottom in windows])
+            ids = np.concatenate([np.full(len(range(top, bottom, self.row_step)), k) for k, (top, bottom) in enumerate(windows)])
+            row_windows = (rows, ids)
+            self._row_windows[height] = row_windows
+        return row_windows
+
+    def follow(self, binary, base, margin):
+        # Follow one line up from column base. Every row read inside a window is reduced to
+        # the mean column of its set pixels; returns those rows, means and pixel counts,
+        # and the number of windows that found the line.
+        width = binary.shape[1]
+        center = base
+        rows, means, counts = [], [], []
+        windows_found = 0
+        for top, bottom in self._window_rows(binary.shape[0]):
+            x0, x1 = max(0, int(center) - margin), min(width, int(center) + margin + 1)
+            window = (binary[top:bottom:self.row_step, x0:x1] > 0).astype(np.float32)
+            row_counts = window.sum(axis=1)
+            total = row_counts.sum()
+            if total >= self.min_pixels:
+                row_sums = window @ np.arange(x0, x1, dtype=np.float32)
+                center = row_sums.sum() / total
+                found = row_counts > 0
+                rows.append(np.arange(top, bottom, self.row_step)[found])
+                means.append(row_sums[found] / row_counts[found])
+                counts.append(row_counts[found])
+                windows_found += 1
+        if not windows_found:
+            return None, None, None, 0
+        return np.concatenate(rows), np.concatenate(means), np.concatenate(counts), windows_found
+
+    def fit(self, rows, means, counts, windows_found, margin):
+        # Pixel-count weighted fit of the row means
+        degree = min(self.degree, windows_found - 1)
+        if degree < 1 or len(rows) <= degree:
+            return None
+        weights = np.sqrt(counts)
+        vander = np.vander(rows.astype(np.float64), degree + 1)
+        coefficients = np.linalg.lstsq(vander * weights[:, None], means * weights, rcond=None)[0]
+        residual = np.sqrt(np.sum(counts * (vander @ coefficients - means) ** 2) / counts.sum())
+        confidence = windows_found / self.num_windows * max(0.0, 1.0 - residual / margin)
+        return LaneLine(coefficients, confidence, int(counts.sum()))
+
+    def search(self, binary):
+        # Full search of the band; returns the LaneLines found, most confident first
+        margin = max(1, int(self.margin * binary.shape[1]))
+        lines = []
+        for base in self._bases(binary, margin):
+            rows, means, counts, windows_found = self.follow(binary, base, margin)
+            line = self.fit(rows, means, counts, windows_found, margin) if windows_found else None
+            if line is not None:
+                lines.append(line)
+        lines.sort(key=lambda line: -line.confidence)
+        return lines[:self.max_lines]
+
+class LaneTracker:
+    # Follows the lane from frame to frame. While the lines are confident, each one is
+    # only looked for within +-track_margin (fraction of the width) of its previous
+    # polynomial, on the detector's rows and windows, in a single vectorized gather; the
+    # detector's full search only runs when there is no track or a line falls below
+    # min_confidence. Coefficients are smoothed with an exponential moving average
+    # (smoothing is the weight of the new fit). Has the same search(binary) interface as
+    # LaneDetector, so find_lane_lines takes either.
+    def __init__(self, detector=None, track_margin=0.03, min_confidence=0.5, smoothing=0.5):
+        self.detector = LaneDetector() if detector is None else detector
+        self.track_margin = track_margin
+        self.min_confidence = min_confidence
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.lines = []
+        self.shape = None
+        self.tracked_frames = 0
+        self.full_searches = 0
+
+    def _track(self, binary, line):
+        # Re-fit one line from the pixels near its previous polynomial
+        height, width = binary.shape
+        rows, ids = self.detector.row_windows(height)
+        margin = max(1, int(self.track_margin * width))
+        centers = np.round(line.x_at(rows)).astype(np.int64)
+        columns = centers[:, None] + np.arange(-margin, margin + 1)
+        inside = (columns >= 0) & (columns < width)
+        window = (binary[rows[:, None], np.clip(columns, 0, width - 1)] > 0) & inside
+        counts = window.sum(axis=1)
+        sums = (window * columns).sum(axis=1)
+        per_window = np.bincount(ids, weights=counts, minlength=self.detector.num_windows)
+        keep = (counts > 0) & (per_window[ids] >= self.detector.min_pixels)
+        windows_found = int(np.count_nonzero(per_window >= self.detector.min_pixels))
+        if not windows_found:
+            return None
+        return self.detector.fit(rows[keep], sums[keep] / counts[keep], counts[keep], windows_found, margin)
+
+    def _smooth(self, previous, line):
+        # Blend the new fit into the previous one; lower-degree fits are padded with zeros
+        size = self.detector.degree + 1
+        new = np.pad(line.coefficients, (size - len(line.coefficients), 0))
+        old = np.pad(previous.coefficients, (size - len(previous.coefficients), 0))
+        return LaneLine(self.smoothing * new + (1.0 - self.smoothing) * old, line.confidence, line.pixels)
+
+    def search(self, binary):
+        # The smoothed LaneLines for this band, most confident first
+        if binary.shape != self.shape:
+            self.lines = []
+            self.shape = binary.shape
+        tracked = [self._track(binary, line) for line in self.lines]
+        if self.lines and all(line is not None and line.confidence >= self.min_confidence for line in tracked):
+            self.tracked_frames += 1
+            self.lines = [self._smooth(previous, line) for previous, line in zip(self.lines, tracked)]
+            return self.lines
+
+        # Lost: search the whole band and keep only the history of lines found again nearby
+        self.full_searches += 1
+        bottom = binary.shape[0] - 1
+        margin = self.detector.margin * binary.shape[1]
+        lines = []
+        for line in self.detector.search(binary):
+            if line.confidence < self.min_confidence:
+                continue
+            previous = [old for old in self.lines if abs(old.x_at(bottom) - line.x_at(bottom)) <= margin]
+            lines.append(self._smooth(previous[0], line) if previous else line)
+        self.lines = lines
+        return self.lines
 
 class ImageProcessing:
     @staticmethod
@@ -32,3 +226,21 @@ class ImageProcessing:
                 return 0.0, 0.0 # Default if linear regression fails
         
         return 0.0, 0.0 # Default if no white pixels found
+
+    @staticmethod
+    def find_lane_lines(image, lower_bound=np.array([10, 50, 100]), upper_bound=np.array([45, 255, 255]), crop=(0.7, 0.9),
+                        detector=None, birds_eye=None):
+        # Yellow lane detection on a horizontal band of the image, searched with a LaneDetector
+        # (or LaneTracker). With a BirdsEyeView the search runs on its warp of the floor
+        # instead of the band. Returns the LaneLines and the (height, width) of the image
+        # they refer to; no lines without a frame.
+        detector = LaneDetector() if detector is None else detector
+        frame = as_frame(image)
+        if frame is None:
+            return [], (0, 0)
+        if birds_eye is not None:
+            hsv_image = cv2.cvtColor(birds_eye.warp(frame.image), cv2.COLOR_BGR2HSV)
+        else:
+            hsv_image = frame.hsv(frame.band(crop[0], crop[1]))
+        binary_image = ImageProcessing.binary_thresholding(hsv_image, lower_bound, upper_bound)
+        return detector.search(binary_image), binary_image.shape
@@ -0,0 +1,106 @@
+import numpy as np
+
+class ScanGeometry:
+    # Everything that only depends on the Lidar's angle layout: the angles, their
+    # cos/sin and the sector of every return for each sector count asked for.
+    def __init__(self, angles):
+        self.angles = np.array(angles, dtype=np.float64)
+        self.angles.setflags(write=False)
+        self.cos = np.cos(self.angles)
+        self.sin = np.sin(self.angles)
+        self._sectors = {}
+
+    def matches(self, angles):
+        angles = np.asarray(angles)
+        return angles.shape == self.angles.shape and np.array_equal(angles, self.angles)
+
+    def sectors(self, num_sectors):
+        # Sector k is centred on k * 2pi / num_sectors, as in the VFH and the costmap
+        sectors = self._sectors.get(num_sectors)
+        if sectors is None:
+            width = 2 * np.pi / num_sectors
+            sectors = np.floor(np.mod(self.angles + width / 2, 2 * np.pi) / width).astype(np.int64) % num_sectors
+            self._sectors[num_sectors] = sectors
+        return sectors
+
+class LidarScan:
+    # One preprocessed scan, shared by every consumer in the tick. distances keeps the
+    # Lidar's layout (0 where a return was invalid or filtered out) so the consumers'
+    # per-layout caches stay valid; points and the list form for the web interface are
+    # built on first use and then reused.
+    def __init__(self, distances, geometry, timestamp=None):
+        self.distances = distances
+        self.geometry = geometry
+        self.timestamp = timestamp
+        self.valid = distances > 0
+        self._points = None
+        self._sector_ranges = {}
+        self._telemetry = None
+
+    @property
+    def angles(self):
+        return self.geometry.angles
+
+    @property
+    def points(self):
+        # (N, 2) Cartesian points of the valid returns in the sensor frame
+        if self._points is None:
+            d = self.distances[self.valid]
+            self._points = np.column_stack((d * self.geometry.cos[self.valid], d * self.geometry.sin[self.valid]))
+        return self._points
+
+    def sector_ranges(self, num_sectors):
+        # Nearest valid return per sector, inf where a sector has none
+        ranges = self._sector_ranges.get(num_sectors)
+        if ranges is None:
+            ranges = np.full(num_sectors, np.inf)
+            np.minimum.at(ranges, self.geometry.sectors(num_sectors)[self.valid], self.distances[self.valid])
+            self._sector_ranges[num_sectors] = ranges
+        return ranges
+
+    def to_telemetry(self):
+        if self._telemetry is None:
+            self._telemetry = {'distances': self.distances[self.valid].tolist(),
+                               'angles': self.angles[self.valid].tolist()}
+        return self._telemetry
+
+class ScanPreprocessor:
+    # Turns raw read_lidar_data() arrays into a LidarScan: drops zero, non-finite and
+    # out-of-range returns, then drops isolated spikes that differ from the median of
+    # their neighbours (the scan wraps around, so the first and last returns are
+    # neighbours) by more than outlier_ratio of that median. The geometry is only
+    # rebuilt when the angle layout changes, and a reading already processed (same
+    # timestamp) returns the same LidarScan.
+    def __init__(self, min_range=0.05, max_range=12.0, median_window=3, outlier_ratio=0.3):
+        self.min_range = min_range
+        self.max_range = max_range
+        self.median_window = median_window
+        self.outlier_ratio = outlier_ratio
+        self.geometry = None
+        self.last_scan = None
+
+    def process(self, distances, angles, timestamp=None):
+        if distances is None or angles is None:
+            return None
+        if self.last_scan is not None and timestamp is not None and timestamp == self.last_scan.timestamp:
+            return self.last_scan
+        if self.geometry is None or not self.geometry.matches(angles):
+            self.geometry = ScanGeometry(angles)
+
+        distances = np.array(distances, dtype=np.float64)
+        valid = np.isfinite(distances) & (distances >= self.min_range) & (distances <= self.max_range)
+        distances[~valid] = 0.0
+        if self.median_window > 1 and len(distances) >= self.median_window:
+            distances[self._outliers(distances, valid)] = 0.0
+        self.last_scan = LidarScan(distances, self.geometry, timestamp)
+        return self.last_scan
+
+    def _outliers(self, distances, valid):
+        half = self.median_window // 2
+        offsets = range(-half, half + 1)
+        window = np.stack([np.roll(distances, k) for k in offsets])
+        window_valid = np.stack([np.roll(valid, k) for k in offsets])
+        # Only judge returns whose whole neighbourhood is valid
+        complete = window_valid.all(axis=0)
+        median = np.sort(window, axis=0)[half]
+        return complete & (np.abs(distances - median) > self.outlier_ratio * median)
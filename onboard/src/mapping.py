@@ -0,0 +1,108 @@
+import numpy as np
+
+class OccupancyGrid:
+    # Log-odds occupancy grid built from lidar scans (and depth pseudo-scans).
+    # Cell (i, j) covers world x in [origin_x + i * resolution, ...) and y likewise,
+    # which is the (row, column) order AStar indexes its grid with.
+    # Each scan is ray cast in one vectorized pass: the cells between the sensor and a
+    # return are made more likely free, the cell of the return more likely occupied.
+    # Only the cells a scan touches are updated, so the cost of an update depends on the
+    # scan, not on the size of the grid. `occupied` is a 0/1 array that is kept in sync
+    # with the log-odds and can be handed to AStar as its grid; `version` goes up every
+    # time a cell in it flips.
+    def __init__(self, shape=(500, 500), resolution=0.05, origin=(0.0, 0.0), max_range=5.0,
+                 hit_log_odds=0.85, miss_log_odds=-0.4, min_log_odds=-4.0, max_log_odds=4.0,
+                 occupied_probability=0.65):
+        self.shape = tuple(shape)
+        self.resolution = resolution
+        self.origin = origin
+        self.max_range = max_range
+        self.hit_log_odds = hit_log_odds
+        self.miss_log_odds = miss_log_odds
+        self.min_log_odds = min_log_odds
+        self.max_log_odds = max_log_odds
+        self.occupied_log_odds = np.log(occupied_probability / (1.0 - occupied_probability))
+
+        self.log_odds = np.zeros(self.shape, dtype=np.float32)
+        self.occupied = np.zeros(self.shape, dtype=np.uint8)
+        self._log_odds_flat = self.log_odds.reshape(-1)
+        self._occupied_flat = self.occupied.reshape(-1)
+        self._hit_mark = np.zeros(self._log_odds_flat.shape, dtype=bool)
+        self.version = 0
+        self._steps = None
+
+    def world_to_cell(self, x, y):
+        i = np.floor((np.asarray(x) - self.origin[0]) / self.resolution).astype(np.int64)
+        j = np.floor((np.asarray(y) - self.origin[1]) / self.resolution).astype(np.int64)
+        return i, j
+
+    def cell_to_world(self, i, j):
+        x = self.origin[0] + (np.asarray(i) + 0.5) * self.resolution
+        y = self.origin[1] + (np.asarray(j) + 0.5) * self.resolution
+        return x, y
+
+    def probabilities(self):
+        return 1.0 - 1.0 / (1.0 + np.exp(self.log_odds))
+
+    def _ray_steps(self, max_range):
+        # Sample every half cell along a beam; the same offsets serve every scan
+        if self._steps is None or self._steps[0] != max_range:
+            self._steps = (max_range, np.arange(0.0, max_range, self.resolution / 2))
+        return self._steps[1]
+
+    def _flat_cells(self, x, y):
+        # Flat indices of the points inside the grid
+        i, j = self.world_to_cell(x, y)
+        inside = (i >= 0) & (i < self.shape[0]) & (j >= 0) & (j < self.shape[1])
+        return i[inside] * self.shape[1] + j[inside]
+
+    def _apply(self, cells, delta):
+        # cells may repeat: every copy gets the same new value, so a cell is updated once
+        values = np.clip(self._log_odds_flat[cells] + delta, self.min_log_odds, self.max_log_odds)
+        self._log_odds_flat[cells] = values
+        occupied = (values > self.occupied_log_odds).astype(np.uint8)
+        changed = occupied != self._occupied_flat[cells]
+        if changed.any():
+            self._occupied_flat[cells[changed]] = occupied[changed]
+            self.version += 1
+
+    def insert_scan(self, distances, angles, pose=(0.0, 0.0, 0.0), max_range=None):
+        # distances/angles are in the sensor frame, pose is the sensor's (x, y, heading)
+        if distances is None or angles is None:
+            return
+        max_range = self.max_range if max_range is None else max_range
+        distances = np.asarray(distances, dtype=np.float64)
+        angles = np.asarray(angles, dtype=np.float64)
+        # Zero distances are invalid returns from the lidar
+        valid = np.isfinite(distances) & (distances > 0)
+        distances = distances[valid]
+        angles = angles[valid]
+        if len(distances) == 0:
+            return
+
+        x, y, heading = pose
+        cos = np.cos(heading + angles)
+        sin = np.sin(heading + angles)
+        ranges = np.minimum(distances, max_range)
+
+        # Free space: the samples of every beam up to one cell short of its end point
+        steps = self._ray_steps(max_range)
+        beams, samples = np.nonzero(steps[None, :] < (ranges[:, None] - self.resolution))
+        t = steps[samples]
+        free = self._flat_cells(x + t * cos[beams], y + t * sin[beams])
+
+        # Returns beyond max_range only clear space, they do not mark a hit
+        hit = distances < max_range
+        hits = self._flat_cells(x + distances[hit] * cos[hit], y + distances[hit] * sin[hit])
+        # A cell holding a return is not also cleared by a neighbouring beam in the same scan
+        self._hit_mark[hits] = True
+        free = free[~self._hit_mark[free]]
+        self._hit_mark[hits] = False
+
+        self._apply(free, self.miss_log_odds)
+        self._apply(hits, self.hit_log_odds)
+
+    def clear(self):
+        self.log_odds[...] = 0.0
+        self.occupied[...] = 0
+        self.version += 1
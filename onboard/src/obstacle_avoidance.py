@@ -1,28 +1,239 @@
 import numpy as np
 
 class VFH:
-    def __init__(self, num_sectors=36, min_distance=0.5):
+    # Vectorized Vector Field Histogram (VFH+ style).
+    # Every return closer than histogram_range adds (histogram_range - d) / histogram_range
+    # to its sector. The sector lookup and the circular smoothing window are folded
+    # into one (num_returns, num_sectors) matrix per lidar angle layout, so building the
+    # smoothed polar density of one scan, or of many scans at once, is a single matmul.
+    # Sectors are blocked/freed with a two-threshold hysteresis and the steering
+    # direction is chosen among candidate valleys with a cost that favours the target
+    # direction and the previously chosen one.
+    def __init__(self, num_sectors=36, min_distance=0.5, histogram_range=2.0, smoothing=2,
+                 threshold_low=0.5, threshold_high=1.0, wide_valley=6, target_weight=5.0,
+                 previous_weight=2.0, forward_angle=0.0, max_steering=0.5, obstacle_fov=np.radians(90.0)):
         self.num_sectors = num_sectors
         self.min_distance = min_distance
+        self.histogram_range = histogram_range
+        self.smoothing = smoothing
+        self.threshold_low = threshold_low
+        self.threshold_high = threshold_high
+        self.wide_valley = wide_valley
+        self.target_weight = target_weight
+        self.previous_weight = previous_weight
+        self.forward_angle = forward_angle
+        self.max_steering = max_steering
+        # Width of the cone around forward_angle in which a close obstacle means back off
+        self.obstacle_fov = obstacle_fov
 
-    def get_steering_direction(self, lidar_distances, lidar_angles):
+        self.sector_width = 2 * np.pi / num_sectors
+        # Sector k is centred on k * sector_width, so straight ahead has a sector of its own
+        self.sector_angles = np.arange(num_sectors) * self.sector_width
+        self.smoothing_matrix = self._build_smoothing_matrix()
+        self._layout_angles = None
+        self._layout_matrix = None
+        self.blocked = np.zeros(num_sectors, dtype=bool)
+        self.previous_sector = None
+
+    def _build_smoothing_matrix(self):
+        # Circulant matrix of the VFH smoothing window (l, ..., 2, 1 around each sector)
+        l = self.smoothing
+        matrix = np.zeros((self.num_sectors, self.num_sectors))
+        for k in range(-l, l + 1):
+            matrix += np.roll(np.eye(self.num_sectors), k, axis=1) * (l + 1 - abs(k))
+        return matrix / (2 * l + 1)
+
+    def _layout(self, lidar_angles):
+        # The lidar's angle array is static, so the sector matrix is only rebuilt if it changes
+        angles = np.asarray(lidar_angles, dtype=np.float64)
+        cached = self._layout_angles
+        if cached is None or cached.shape != angles.shape or not np.array_equal(cached, angles):
+            sectors = self._sector_of(angles)
+            one_hot = np.zeros((len(angles), self.num_sectors))
+            one_hot[np.arange(len(angles)), sectors] = 1.0
+            self._layout_angles = angles.copy()
+            self._layout_matrix = one_hot @ self.smoothing_matrix
+        return self._layout_matrix
+
+    def is_obstacle_present(self, lidar_distances, lidar_angles):
+        if lidar_distances is None or lidar_angles is None:
+            return False
+
+        # Zero distances are invalid returns from the lidar
+        distances = np.asarray(lidar_distances)
+        return bool(np.any((distances > 0) & (distances < self.min_distance)))
+
+    def histogram(self, lidar_distances, lidar_angles):
+        # Smoothed polar obstacle density; distances may be one scan (K,) or a batch (N, K)
+        distances = np.asarray(lidar_distances, dtype=np.float64)
+        valid = np.isfinite(distances) & (distances > 0) & (distances < self.histogram_range)
+        weights = np.where(valid, (self.histogram_range - np.where(valid, distances, 0.0)) / self.histogram_range, 0.0)
+        return weights @ self._layout(lidar_angles)
+
+    def _angle_difference(self, a, b):
+        return np.abs(np.angle(np.exp(1j * (np.asarray(a) - np.asarray(b)))))
+
+    def _sector_of(self, angle):
+        sector = np.floor(np.mod(np.asarray(angle) + self.sector_width / 2, 2 * np.pi) / self.sector_width).astype(np.int64)
+        return sector % self.num_sectors
+
+    def _candidates(self, free, target_sector):
+        if free.all():
+            return np.array([target_sector])
+        if not free.any():
+            return np.zeros(0, dtype=np.int64)
+        # Rotate so the histogram starts on a blocked sector; then every valley is a plain run
+        shift = int(np.argmin(free))
+        rolled = np.roll(free, -shift).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], rolled, [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        candidates = []
+        for start, end in zip(starts, ends):
+            if end - start + 1 > self.wide_valley:
+                # Wide valley: keep a safety margin from both borders, or head for the target
+                candidates.append(start + self.wide_valley // 2)
+                candidates.append(end - self.wide_valley // 2)
+                target = (target_sector - shift) % self.num_sectors
+                if start <= target <= end:
+                    candidates.append(target)
+            else:
+                candidates.append((start + end) // 2)
+        return (np.array(candidates) + shift) % self.num_sectors
+
+    def select_sector(self, smoothed, target_angle=None):
+        target_angle = self.forward_angle if target_angle is None else target_angle
+        # Hysteresis: a sector is blocked above threshold_high and only freed again below threshold_low
+        self.blocked = (smoothed > self.threshold_high) | (self.blocked & (smoothed >= self.threshold_low))
+        candidates = self._candidates(~self.blocked, int(self._sector_of(target_angle)))
+        if len(candidates) == 0:
+            # Everything is blocked; fall back to the least dense sector
+            sector = int(np.argmin(smoothed))
+        else:
+            angles = self.sector_angles[candidates]
+            cost = self.target_weight * self._angle_difference(angles, target_angle)
+            if self.previous_sector is not None:
+                cost = cost + self.previous_weight * self._angle_difference(angles, self.sector_angles[self.previous_sector])
+            sector = int(candidates[int(np.argmin(cost))])
+        self.previous_sector = sector
+        return sector
+
+    def sector_to_steering(self, sector):
+        direction = np.angle(np.exp(1j * (self.sector_angles[sector] - self.forward_angle)))
+        return float(np.clip(direction, -self.max_steering, self.max_steering))
+
+    def get_steering_direction(self, lidar_distances, lidar_angles, target_angle=None):
         if lidar_distances is None or lidar_angles is None:
             return 0.0
 
-        # Create a histogram of the lidar data
-        histogram = np.zeros(self.num_sectors)
-        for i in range(len(lidar_distances)):
-            if lidar_distances[i] < self.min_distance:
-                sector = int(lidar_angles[i] / (2 * np.pi / self.num_sectors))
-                histogram[sector] += 1
+        smoothed = self.histogram(lidar_distances, lidar_angles)
+        return self.sector_to_steering(self.select_sector(smoothed, target_angle))
+
+    def score_scans(self, distances_batch, lidar_angles, target_angle=None):
+        # Offline replay: smoothed histograms and steering for many scans (N, K) at once.
+        # Each scan is scored on its own (no hysteresis): the free sector closest to the
+        # target, or the least dense sector if none is free.
+        target_angle = self.forward_angle if target_angle is None else target_angle
+        histograms = self.histogram(np.atleast_2d(distances_batch), lidar_angles)
+        free = histograms <= self.threshold_high
+        cost = np.broadcast_to(self._angle_difference(self.sector_angles, target_angle), histograms.shape)
+        best_free = np.argmin(np.where(free, cost, np.inf), axis=1)
+        least_dense = np.argmin(histograms, axis=1)
+        sectors = np.where(free.any(axis=1), best_free, least_dense)
+        directions = np.angle(np.exp(1j * (self.sector_angles[sectors] - self.forward_angle)))
+        return histograms, np.clip(directions, -self.max_steering, self.max_steering)
 
-        # Find the sector with the fewest obstacles
-        best_sector = np.argmin(histogram)
+class TimeToCollision:
+    # Per-sector closing speed and time to collision from consecutive timestamped scans.
+    # Each scan is reduced to the nearest return per sector; the drop in that range since
+    # the previous scan over the time between them is the closing speed, smoothed with an
+    # exponential moving average. A sector's time to collision is its range over its
+    # closing speed (inf when it is not closing).
+    def __init__(self, num_sectors=36, smoothing=0.5, max_closing_speed=5.0, stop_time=0.5, slow_time=2.0):
+        self.num_sectors = num_sectors
+        self.smoothing = smoothing
+        self.max_closing_speed = max_closing_speed
+        self.stop_time = stop_time
+        self.slow_time = slow_time
+        self.sector_width = 2 * np.pi / num_sectors
+        self.sector_angles = np.arange(num_sectors) * self.sector_width
+        self._layout_angles = None
+        self._sectors = None
+        self._cones = {}
+        self.reset()
 
-        # Calculate the steering direction
-        steering_direction = (best_sector - self.num_sectors / 2) * (2 * np.pi / self.num_sectors)
+    def reset(self):
+        self.ranges = None
+        self.timestamp = None
+        self.closing_speed = np.zeros(self.num_sectors)
+        self.ttc = np.full(self.num_sectors, np.inf)
 
-        return steering_direction
+    def _layout(self, angles):
+        angles = np.asarray(angles, dtype=np.float64)
+        cached = self._layout_angles
+        if cached is None or cached.shape != angles.shape or not np.array_equal(cached, angles):
+            self._sectors = np.floor(np.mod(angles + self.sector_width / 2, 2 * np.pi) / self.sector_width).astype(np.int64) % self.num_sectors
+            self._layout_angles = angles.copy()
+        return self._sectors
+
+    def _accept(self, timestamp):
+        if self.timestamp is not None and timestamp <= self.timestamp:
+            if timestamp == self.timestamp:
+                return False
+            # The clock went back (a replay starting over); start again from this scan
+            self.reset()
+        return True
+
+    def update(self, distances, angles, timestamp):
+        # Returns False if the scan is missing or not newer than the last one
+        if distances is None or angles is None or not self._accept(timestamp):
+            return False
+        distances = np.asarray(distances, dtype=np.float64)
+        sectors = self._layout(angles)
+        # Zero distances are invalid returns
+        valid = np.isfinite(distances) & (distances > 0)
+        ranges = np.full(self.num_sectors, np.inf)
+        np.minimum.at(ranges, sectors[valid], distances[valid])
+        self._apply(ranges, timestamp)
+        return True
+
+    def update_ranges(self, ranges, timestamp):
+        # Same as update, from the nearest range per sector (e.g. LidarScan.sector_ranges)
+        if not self._accept(timestamp):
+            return False
+        self._apply(np.asarray(ranges, dtype=np.float64), timestamp)
+        return True
+
+    def _apply(self, ranges, timestamp):
+        if self.ranges is not None:
+            dt = timestamp - self.timestamp
+            seen = np.isfinite(ranges) & np.isfinite(self.ranges)
+            closing = np.where(seen, (self.ranges - np.where(seen, ranges, 0.0)) / dt, 0.0)
+            # Sectors whose nearest return jumped to another object are not a real speed
+            closing = np.clip(closing, -self.max_closing_speed, self.max_closing_speed)
+            self.closing_speed = self.smoothing * closing + (1.0 - self.smoothing) * self.closing_speed
+            self.closing_speed[~np.isfinite(ranges)] = 0.0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.ttc = np.where(self.closing_speed > 1e-3, ranges / self.closing_speed, np.inf)
+        self.ranges = ranges
+        self.timestamp = timestamp
+
+    def _cone(self, center, half_angle):
+        key = (center, half_angle)
+        cone = self._cones.get(key)
+        if cone is None:
+            offset = np.abs(np.angle(np.exp(1j * (self.sector_angles - center))))
+            cone = offset <= half_angle + 1e-9
+            self._cones[key] = cone
+        return cone
+
+    def min_ttc(self, center=0.0, half_angle=np.radians(30)):
+        return float(self.ttc[self._cone(center, half_angle)].min())
+
+    def throttle_scale(self, center=0.0, half_angle=np.radians(30)):
+        # 1 with slow_time or more to spare, falling linearly to 0 at stop_time
+        ttc = self.min_ttc(center, half_angle)
+        return float(np.clip((ttc - self.stop_time) / (self.slow_time - self.stop_time), 0.0, 1.0))
 
 class DepthObstacleDetector:
     def __init__(self, obstacle_threshold=0.25, scan_box_width=120, scan_box_height=80, image_width=640, image_height=480):
@@ -48,4 +259,57 @@ class DepthObstacleDetector:
         if np.isfinite(min_depth) and min_depth < self.obstacle_threshold:
             return True
 
-        return False
\ No newline at end of file
+        return False
+
+class DepthProfile:
+    # Reduces the whole depth image to the nearest obstacle per group of columns,
+    # published as a pseudo-scan (distances, angles) in the lidar's convention:
+    # angle 0 is straight ahead, positive angles to the left, 0 marks no return.
+    # Rows are decimated with a stride and only a horizontal band is kept, so the floor
+    # and ceiling do not show up as obstacles; NaNs, zeros and out-of-range readings are
+    # ignored. The bearing of each column group is computed once per image shape.
+    def __init__(self, horizontal_fov=np.radians(87.0), rows=(0.3, 0.6), row_step=4, column_step=8,
+                 min_depth=0.1, max_depth=10.0, mount_angle=0.0):
+        self.horizontal_fov = horizontal_fov
+        self.rows = rows
+        self.row_step = row_step
+        self.column_step = column_step
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.mount_angle = mount_angle
+        self._geometry_shape = None
+
+    def _geometry(self, shape):
+        if self._geometry_shape != shape:
+            height, width = shape
+            groups = width // self.column_step
+            centers = (np.arange(groups) + 0.5) * self.column_step
+            focal = (width / 2) / np.tan(self.horizontal_fov / 2)
+            bearings = np.arctan((width / 2 - centers) / focal)
+            self._bearings = bearings
+            self._angles = bearings + self.mount_angle
+            self._inverse_cos = (1.0 / np.cos(bearings)).astype(np.float32)
+            self._row_slice = slice(int(height * self.rows[0]), int(height * self.rows[1]), self.row_step)
+            self._columns = groups * self.column_step
+            self._geometry_shape = shape
+        return self._row_slice, self._columns
+
+    def column_depths(self, depth_image):
+        # Nearest valid depth in each column group; inf where the group has no valid reading
+        depth = np.asarray(depth_image)
+        if depth.ndim == 3:
+            depth = depth[:, :, 0]
+        row_slice, columns = self._geometry(depth.shape)
+        band = depth[row_slice, :columns]
+        groups = band.reshape(band.shape[0], -1, self.column_step)
+        # NaN fails both comparisons, so it is dropped along with out-of-range values
+        valid = (groups > self.min_depth) & (groups < self.max_depth)
+        return np.where(valid, groups, np.float32(np.inf)).min(axis=(0, 2))
+
+    def scan(self, depth_image):
+        if depth_image is None:
+            return None, None
+        nearest = self.column_depths(depth_image)
+        # Depth is along the optical axis; the range along each bearing is longer
+        distances = np.where(np.isfinite(nearest), nearest * self._inverse_cos, 0.0)
+        return distances, self._angles
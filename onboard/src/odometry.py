@@ -0,0 +1,176 @@
+import numpy as np
+import cv2
+
+class NearestPointGrid:
+    # Lookup grid answering "which reference point is nearest" in O(1) per query.
+    # The reference points are rasterised and a labelled distance transform gives every
+    # cell the label of its nearest occupied cell, which maps back to a point index.
+    # Points are expected in scan order, so each one's surface normal is the minor axis
+    # of the window of normal_window neighbours on either side; a window spanning a gap
+    # wider than max_gap between consecutive points is marked invalid.
+    def __init__(self, points, resolution=0.05, margin=1.0, max_gap=0.3, normal_window=3):
+        self.points = points
+        offsets = range(-normal_window, normal_window + 1)
+        window = np.stack([np.roll(points, -k, axis=0) for k in offsets])
+        step = np.hypot(*(points - np.roll(points, 1, axis=0)).T)
+        gaps = np.stack([np.roll(step, -k) for k in offsets[1:]])
+        self.normal_valid = np.all(gaps < max_gap, axis=0)
+        centred = window - window.mean(axis=0)
+        sxx = np.mean(centred[..., 0] ** 2, axis=0)
+        syy = np.mean(centred[..., 1] ** 2, axis=0)
+        sxy = np.mean(centred[..., 0] * centred[..., 1], axis=0)
+        # Direction of the window's major axis, the normal is perpendicular to it
+        direction = 0.5 * np.arctan2(2 * sxy, sxx - syy)
+        self.normals = np.column_stack((-np.sin(direction), np.cos(direction)))
+        self.resolution = resolution
+        self.origin = points.min(axis=0) - margin
+        cells = np.floor((points - self.origin) / resolution).astype(np.int64)
+        self.shape = tuple(int(n) for n in cells.max(axis=0) + int(np.ceil(margin / resolution)) + 1)
+        flat = cells[:, 0] * self.shape[1] + cells[:, 1]
+
+        image = np.full(self.shape, 255, dtype=np.uint8)
+        image.reshape(-1)[flat] = 0
+        _, labels = cv2.distanceTransformWithLabels(image, cv2.DIST_L2, 5, labelType=cv2.DIST_LABEL_PIXEL)
+        # Labels number the occupied cells in row-major order, starting at 1
+        cell_point = np.full(image.size, -1, dtype=np.int64)
+        cell_point[flat] = np.arange(len(points))
+        occupied = np.flatnonzero(image.reshape(-1) == 0)
+        self.nearest = cell_point[occupied][labels.reshape(-1) - 1]
+
+    def query(self, queries):
+        # Index of the nearest reference point per query, -1 outside the grid
+        cells = np.floor((queries - self.origin) / self.resolution).astype(np.int64)
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < self.shape[0]) & (cells[:, 1] >= 0) & (cells[:, 1] < self.shape[1])
+        index = np.full(len(queries), -1, dtype=np.int64)
+        index[inside] = self.nearest[cells[inside, 0] * self.shape[1] + cells[inside, 1]]
+        return index
+
+def _transform(points, x, y, heading):
+    c, s = np.cos(heading), np.sin(heading)
+    return np.column_stack((c * points[:, 0] - s * points[:, 1] + x, s * points[:, 0] + c * points[:, 1] + y))
+
+def _compose(pose, delta):
+    # pose followed by a motion delta expressed in pose's frame
+    x, y, heading = pose
+    dx, dy, dheading = delta
+    c, s = np.cos(heading), np.sin(heading)
+    return (float(x + c * dx - s * dy), float(y + s * dx + c * dy), _wrap(heading + dheading))
+
+def _relative(a, b):
+    # Motion from pose a to pose b, in a's frame
+    c, s = np.cos(a[2]), np.sin(a[2])
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    return (c * dx + s * dy, -s * dx + c * dy, _wrap(b[2] - a[2]))
+
+def _wrap(angle):
+    return float(np.angle(np.exp(1j * angle)))
+
+class ScanOdometry:
+    # Tracks the car's pose (x, y, heading) from successive Lidar scans with
+    # point-to-line ICP. Each scan is matched against a keyframe scan whose points sit
+    # in a NearestPointGrid, so every correspondence search is a vectorized lookup, and
+    # each iteration is a single linear least-squares step. The previous motion seeds
+    # the next match, and a new keyframe is taken once the car has moved far enough.
+    # pose is in the frame of the first scan (x forward, y left, heading CCW).
+    def __init__(self, resolution=0.05, max_iterations=20, max_correspondence=0.5, min_correspondence=0.1,
+                 tolerance=5e-4, keyframe_distance=0.3, keyframe_angle=np.radians(15), min_points=20,
+                 max_points=400):
+        self.resolution = resolution
+        self.max_iterations = max_iterations
+        self.max_correspondence = max_correspondence
+        self.min_correspondence = min_correspondence
+        self.tolerance = tolerance
+        self.keyframe_distance = keyframe_distance
+        self.keyframe_angle = keyframe_angle
+        self.min_points = min_points
+        self.max_points = max_points
+        self.reset()
+
+    def reset(self, pose=(0.0, 0.0, 0.0)):
+        self.pose = tuple(pose)
+        self.timestamp = None
+        self.keyframe = None
+        self.keyframe_pose = self.pose
+        self.velocity = (0.0, 0.0, 0.0)
+        self.last_error = None
+        self.last_iterations = 0
+        self.matched = False
+
+    def _subsample(self, points):
+        if len(points) > self.max_points:
+            points = points[np.linspace(0, len(points) - 1, self.max_points).astype(np.int64)]
+        return points
+
+    def match(self, points, guess=(0.0, 0.0, 0.0)):
+        # Pose of the scan in the keyframe's frame, starting from guess; None if too few
+        # points match or the estimate has not settled after max_iterations.
+        # Each iteration minimises the point-to-line distances to the matched reference
+        # points' tangent lines, linearised around the current estimate (one 3x3 solve).
+        grid = self.keyframe
+        reference = grid.points
+        x, y, heading = guess
+        threshold = self.max_correspondence
+        error = None
+        for iteration in range(1, self.max_iterations + 1):
+            moved = _transform(points, x, y, heading)
+            index = grid.query(moved)
+            found = index >= 0
+            index[~found] = 0
+            offset = moved - reference[index]
+            distance = np.hypot(offset[:, 0], offset[:, 1])
+            pairs = found & (distance < threshold) & grid.normal_valid[index]
+            if pairs.sum() < self.min_points:
+                return None, iteration, None
+            q = moved[pairs]
+            n = grid.normals[index[pairs]]
+            residual = np.sum(offset[pairs] * n, axis=1)
+            # Jacobian of the residual w.r.t. (tx, ty, dtheta) about the current estimate
+            jacobian = np.column_stack((n[:, 0], n[:, 1], n[:, 1] * q[:, 0] - n[:, 0] * q[:, 1]))
+            step = np.linalg.lstsq(jacobian, -residual, rcond=None)[0]
+            tx, ty, dtheta = step
+            c, s = np.cos(dtheta), np.sin(dtheta)
+            # Apply the increment on top of the current estimate
+            x, y = c * x - s * y + tx, s * x + c * y + ty
+            heading = _wrap(heading + dtheta)
+            error = float(np.sqrt(np.mean(residual ** 2)))
+            # Tighten the gate as the estimate converges
+            threshold = max(self.min_correspondence, min(threshold, 3.0 * float(np.mean(distance[pairs]))))
+            if abs(dtheta) < self.tolerance and np.hypot(tx, ty) < self.tolerance:
+                return (x, y, heading), iteration, error
+        # Still moving after max_iterations: most likely a wrong local minimum
+        return None, iteration, error
+
+    def update(self, points, timestamp=None):
+        # points is the (N, 2) Cartesian scan (e.g. LidarScan.points); returns the pose
+        all_points = np.asarray(points, dtype=np.float64)
+        points = self._subsample(all_points)
+        if len(points) < self.min_points:
+            self.matched = False
+            return self.pose
+        if self.keyframe is None:
+            self.keyframe = NearestPointGrid(all_points, self.resolution)
+            self.keyframe_pose = self.pose
+            self.timestamp = timestamp
+            self.matched = True
+            return self.pose
+
+        # Constant-velocity guess for where this scan sits relative to the keyframe
+        guess = _relative(self.keyframe_pose, _compose(self.pose, self.velocity))
+        relative, self.last_iterations, self.last_error = self.match(points, guess)
+        self.matched = relative is not None
+        if relative is None:
+            # Coast on the previous motion and restart from this scan
+            self.pose = _compose(self.pose, self.velocity)
+            self.keyframe = NearestPointGrid(all_points, self.resolution)
+            self.keyframe_pose = self.pose
+            self.timestamp = timestamp
+            return self.pose
+
+        pose = _compose(self.keyframe_pose, relative)
+        self.velocity = _relative(self.pose, pose)
+        self.pose = pose
+        self.timestamp = timestamp
+        if np.hypot(relative[0], relative[1]) > self.keyframe_distance or abs(relative[2]) > self.keyframe_angle:
+            self.keyframe = NearestPointGrid(all_points, self.resolution)
+            self.keyframe_pose = pose
+        return self.pose
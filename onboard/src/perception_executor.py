@@ -0,0 +1,218 @@
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+
+# Face tracking stays in the agent: its FaceTracker follows the face from one frame to
+# the next and only runs the cascade every few frames, which needs every frame in order
+DETECTORS = ("color", "lane", "depth")
+
+class SharedArrayRing:
+    # A few fixed-size shared-memory slots. A frame is copied into a slot once and the
+    # workers read it in place. A slot is not reused while tasks on it are outstanding.
+    def __init__(self, shape, dtype, num_slots):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size) for _ in range(num_slots)]
+        self.arrays = [np.ndarray(self.shape, dtype=self.dtype, buffer=block.buf) for block in self.blocks]
+        self.pending = [0] * num_slots
+        self.next_slot = 0
+
+    def matches(self, array):
+        return array.shape == self.shape and array.dtype == self.dtype
+
+    def put(self, array):
+        # Returns the slot index, or None if every slot is still being worked on
+        for _ in range(len(self.blocks)):
+            slot = self.next_slot
+            self.next_slot = (self.next_slot + 1) % len(self.blocks)
+            if self.pending[slot] == 0:
+                self.arrays[slot][...] = array
+                return slot
+        return None
+
+    def name(self, slot):
+        return self.blocks[slot].name
+
+    def close(self):
+        self.arrays = []
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+def _build_detectors(camera_width, camera_height, color):
+    from src.camera_processing import ColorTracker
+    from src.obstacle_avoidance import DepthObstacleDetector
+    from src.image_processing_utils import ImageProcessing
+
+    tracker = ColorTracker(camera_width, camera_height)
+    tracker.set_color_to_track(color)
+    depth_detector = DepthObstacleDetector(image_width=camera_width, image_height=camera_height)
+
+    def find_object(image, color):
+        # The agent's tracked color can change at any time, so it comes with each task
+        if color != tracker.current_color_to_track:
+            tracker.set_color_to_track(color)
+        return tracker.find_object(image)
+
+    return {
+        "color": find_object,
+        "lane": ImageProcessing.find_lane_lines,
+        "depth": depth_detector.is_obstacle_present,
+    }
+
+def _worker_main(task_queue, result_queue, camera_width, camera_height, color):
+    detectors = _build_detectors(camera_width, camera_height, color)
+    attached = {}
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        frame_id, detector, block_name, shape, dtype, color = task
+        block = attached.get(block_name)
+        if block is None:
+            block = shared_memory.SharedMemory(name=block_name)
+            attached[block_name] = block
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        try:
+            result = detectors[detector](array, color) if detector == "color" else detectors[detector](array)
+        except Exception as e:
+            print(f"Warning: {detector} detector failed on frame {frame_id}: {e}")
+            result = None
+        del array
+        result_queue.put((frame_id, detector, block_name, color, result))
+    for block in attached.values():
+        block.close()
+
+class PerceptionExecutor:
+    # Runs the detectors in a pool of worker processes. Each frame (and depth image)
+    # is placed in shared memory once and every detector becomes one task on it.
+    # Results come back tagged with their frame id; the agent asks for results of a
+    # recent enough frame, and anything older than max_frame_lag frames is dropped.
+    # Color results are for the color the frame was submitted with; once the tracked
+    # color changes, results for the old one are dropped too.
+    def __init__(self, camera_width, camera_height, num_workers=3, detectors=DETECTORS, color="yellow",
+                 num_slots=4, max_frame_lag=2, start_method="spawn"):
+        unknown = set(detectors) - set(DETECTORS)
+        if unknown:
+            raise ValueError(f"Detectors {sorted(unknown)} cannot run in the perception workers")
+        self.detectors = tuple(detectors)
+        self.color = color
+        self.num_slots = num_slots
+        self.max_frame_lag = max_frame_lag
+        self.context = multiprocessing.get_context(start_method)
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.workers = [
+            self.context.Process(target=_worker_main, args=(self.task_queue, self.result_queue, camera_width, camera_height, color), daemon=True)
+            for _ in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+        self.rings = {}
+        self.slot_lookup = {}
+        self.latest = {}
+        self.last_frame_id = None
+        self.last_depth = None
+        self.submitted_frames = 0
+        self.repeated_frames = 0
+        self.dropped_frames = 0
+        self.stale_results = 0
+
+    def _ring(self, kind, array):
+        ring = self.rings.get(kind)
+        if ring is None or not ring.matches(array):
+            if ring is not None:
+                if any(ring.pending):
+                    return None
+                self._forget_ring(ring)
+                ring.close()
+            ring = SharedArrayRing(array.shape, array.dtype, self.num_slots)
+            self.rings[kind] = ring
+            for slot in range(self.num_slots):
+                self.slot_lookup[ring.name(slot)] = (ring, slot)
+        return ring
+
+    def _forget_ring(self, ring):
+        for slot in range(len(ring.blocks)):
+            self.slot_lookup.pop(ring.name(slot), None)
+
+    def _submit_array(self, kind, frame_id, array, detectors):
+        ring = self._ring(kind, array)
+        slot = ring.put(array) if ring is not None else None
+        if slot is None:
+            # The workers are behind; drop this frame rather than queue up stale work
+            self.dropped_frames += 1
+            return False
+        for detector in detectors:
+            ring.pending[slot] += 1
+            self.task_queue.put((frame_id, detector, ring.name(slot), ring.shape, ring.dtype.str, self.color))
+        return True
+
+    def submit(self, frame_id, image=None, depth_data=None, color=None):
+        if color is not None and color != self.color:
+            self.color = color
+            self.latest.pop("color", None)
+            # The current frame has to be looked at again for the new color
+            self.last_frame_id = None
+        # With asynchronous sensors the same frame (and depth image) comes back for several
+        # ticks; the workers have already been given it
+        new_image = image is not None and frame_id != self.last_frame_id
+        new_depth = depth_data is not None and depth_data is not self.last_depth
+        if not new_image and not new_depth:
+            self.repeated_frames += 1
+            return
+        # Collect finished work first so its slots can be reused for this frame
+        self.poll()
+        image_detectors = [d for d in self.detectors if d != "depth"]
+        # A frame dropped because the workers are behind is offered again next tick
+        if new_image and image_detectors:
+            if self._submit_array("image", frame_id, np.ascontiguousarray(image), image_detectors):
+                self.last_frame_id = frame_id
+        if new_depth and "depth" in self.detectors:
+            if self._submit_array("depth", frame_id, np.ascontiguousarray(depth_data), ["depth"]):
+                self.last_depth = depth_data
+        self.submitted_frames += 1
+
+    def poll(self):
+        while True:
+            try:
+                frame_id, detector, block_name, color, result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            ring_slot = self.slot_lookup.get(block_name)
+            if ring_slot is not None:
+                ring, slot = ring_slot
+                ring.pending[slot] -= 1
+            if detector == "color" and color != self.color:
+                self.stale_results += 1
+                continue
+            previous = self.latest.get(detector)
+            if previous is None or frame_id >= previous[0]:
+                self.latest[detector] = (frame_id, result)
+
+    def results(self, current_frame_id):
+        # Latest result per detector, leaving out anything too old to act on
+        self.poll()
+        fresh = {}
+        for detector, (frame_id, result) in list(self.latest.items()):
+            if current_frame_id - frame_id <= self.max_frame_lag:
+                fresh[detector] = (frame_id, result)
+            else:
+                del self.latest[detector]
+                self.stale_results += 1
+        return fresh
+
+    def close(self):
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+        self.slot_lookup = {}
@@ -1,50 +1,422 @@
-
 import heapq
+import math
+from collections import OrderedDict
+from array import array
+import numpy as np
+
+SQRT2 = math.sqrt(2.0)
+INF = math.inf
 
 class AStar:
-    def __init__(self, grid):
+    # A* over a 2D grid where non-zero cells are blocked (nested lists or a NumPy
+    # array such as OccupancyGrid.occupied, which is re-read on every call).
+    # Cells are addressed by flat indices into a copy of the grid padded with a
+    # blocked border, so neighbours never need a bounds check. g-scores, parents and
+    # the closed set are flat arrays over that grid, allocated once per grid size and
+    # reset after each search only where it wrote; stale heap entries are skipped
+    # instead of searched for.
+    # cost is an optional array of per-cell traversal costs (>= 1, inf for blocked);
+    # a step into a cell costs its step length times the cell's cost.
+    # heuristic_weight > 1 trades path optimality (paths at most that factor longer)
+    # for far fewer expansions on cluttered maps.
+    def __init__(self, grid, connectivity=4, cost=None, heuristic_weight=1.0):
+        if connectivity not in (4, 8):
+            raise ValueError("connectivity must be 4 or 8")
         self.grid = grid
+        self.connectivity = connectivity
+        self.cost = cost
+        self.heuristic_weight = heuristic_weight
+        self.expanded = 0
+        self.g_score = None
+        self.came_from = None
+        self.closed = None
+
+    def _prepare(self):
+        grid = np.asarray(self.grid)
+        self.rows, self.cols = grid.shape
+        width = self.cols + 2
+        blocked = np.ones((self.rows + 2, width), dtype=np.uint8)
+        blocked[1:-1, 1:-1] = grid != 0
+        cost = None
+        if self.cost is not None:
+            cost = np.full((self.rows + 2, width), np.inf)
+            cost[1:-1, 1:-1] = self.cost
+            blocked[~np.isfinite(cost)] = 1
+            # array('d') indexes straight to Python floats without a per-cell conversion
+            cost = array('d', cost.tobytes())
+        offsets = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0)]
+        if self.connectivity == 8:
+            offsets += [(-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2)]
+        self.width = width
+        self.neighbors = [(dr * width + dc, step) for dr, dc, step in offsets]
+        return blocked.tobytes(), cost
+
+    def _index(self, node):
+        return (node[0] + 1) * self.width + node[1] + 1
+
+    def _node(self, index):
+        r, c = divmod(index, self.width)
+        return (r - 1, c - 1)
+
+    def heuristic(self, a, b):
+        dr = abs(a[0] - b[0])
+        dc = abs(a[1] - b[1])
+        if self.connectivity == 8:
+            return max(dr, dc) + (SQRT2 - 1.0) * min(dr, dc)
+        return dr + dc
 
     def find_path(self, start, end):
-        open_set = []
-        heapq.heappush(open_set, (0, start))
-        came_from = {}
-        g_score = {node: float('inf') for row in self.grid for node in row}
-        g_score[start] = 0
-        f_score = {node: float('inf') for row in self.grid for node in row}
-        f_score[start] = self.heuristic(start, end)
+        blocked, cost = self._prepare()
+        if not (0 <= end[0] < self.rows and 0 <= end[1] < self.cols) or \
+           not (0 <= start[0] < self.rows and 0 <= start[1] < self.cols):
+            return None
+        start_index = self._index(start)
+        end_index = self._index(end)
+        if blocked[end_index]:
+            return None
 
-        while open_set:
-            _, current = heapq.heappop(open_set)
+        # array('d') and array('l') read and write plain Python numbers without boxing NumPy scalars
+        if self.g_score is None or len(self.g_score) != len(blocked):
+            self.g_score = array('d', [INF]) * len(blocked)
+            self.came_from = array('l', [-1]) * len(blocked)
+            self.closed = bytearray(len(blocked))
+        g_score = self.g_score
+        came_from = self.came_from
+        closed = self.closed
+        # Every cell the search writes to is reached first, so resetting these is enough
+        reached = [start_index]
+        g_score[start_index] = 0.0
+        try:
+            return self._search(blocked, cost, start_index, end_index, g_score, came_from, closed, reached)
+        finally:
+            for index in reached:
+                g_score[index] = INF
+                came_from[index] = -1
+                closed[index] = 0
+
+    def _search(self, blocked, cost, start_index, end_index, g_score, came_from, closed, reached):
+        width = self.width
+        end_r, end_c = divmod(end_index, width)
+        # Octile distance for 8-connectivity, Manhattan for 4; cell costs are >= 1 so both stay admissible
+        diagonal_term = (SQRT2 - 2.0) if self.connectivity == 8 else 0.0
+        weight = self.heuristic_weight
+        neighbors = self.neighbors
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        add_reached = reached.append
+
+        r, c = divmod(start_index, width)
+        dr, dc = abs(r - end_r), abs(c - end_c)
+        estimate = weight * (dr + dc + diagonal_term * (dr if dr < dc else dc))
+        # Ties on f go to the entry closest to the goal, which keeps open-field searches narrow
+        open_set = [(estimate, estimate, start_index)]
+        expanded = 0
 
-            if current == end:
+        while open_set:
+            _, _, current = heappop(open_set)
+            if closed[current]:
+                continue
+            if current == end_index:
+                self.expanded = expanded
                 return self.reconstruct_path(came_from, current)
+            closed[current] = 1
+            expanded += 1
+            current_g = g_score[current]
 
-            for neighbor in self.get_neighbors(current):
-                tentative_g_score = g_score[current] + 1
+            for offset, step in neighbors:
+                neighbor = current + offset
+                if blocked[neighbor] or closed[neighbor]:
+                    continue
+                tentative_g_score = current_g + (step if cost is None else step * cost[neighbor])
                 if tentative_g_score < g_score[neighbor]:
+                    if came_from[neighbor] < 0:
+                        add_reached(neighbor)
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = g_score[neighbor] + self.heuristic(neighbor, end)
-                    if neighbor not in [i[1] for i in open_set]:
-                        heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    r, c = divmod(neighbor, width)
+                    dr = r - end_r if r > end_r else end_r - r
+                    dc = c - end_c if c > end_c else end_c - c
+                    estimate = weight * (dr + dc + diagonal_term * (dr if dr < dc else dc))
+                    heappush(open_set, (tentative_g_score + estimate, estimate, neighbor))
 
+        self.expanded = expanded
         return None
 
-    def heuristic(self, a, b):
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
-
     def get_neighbors(self, node):
-        neighbors = []
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            x, y = node[0] + dx, node[1] + dy
-            if 0 <= x < len(self.grid) and 0 <= y < len(self.grid[0]) and self.grid[x][y] == 0:
-                neighbors.append((x, y))
-        return neighbors
+        blocked, _ = self._prepare()
+        index = self._index(node)
+        return [self._node(index + offset) for offset, _ in self.neighbors if not blocked[index + offset]]
 
     def reconstruct_path(self, came_from, current):
-        total_path = [current]
-        while current in came_from:
+        total_path = [self._node(current)]
+        while came_from[current] >= 0:
             current = came_from[current]
-            total_path.append(current)
+            total_path.append(self._node(current))
         return total_path[::-1]
+
+class DStarLite:
+    # Incremental planner (D* Lite) over the same grids as AStar. The search runs
+    # backwards from the goal and its g/rhs values are kept between calls, so
+    # find_path only repairs the part of the search the changes since the last call
+    # affect: cells that became blocked or free (found by diffing the grid against a
+    # snapshot, which NumPy does in one pass) and the robot's own movement.
+    # A new goal, or a grid of a different shape, starts a fresh search.
+    def __init__(self, grid, connectivity=4, cost=None):
+        if connectivity not in (4, 8):
+            raise ValueError("connectivity must be 4 or 8")
+        self.grid = grid
+        self.connectivity = connectivity
+        self.cost = cost
+        self.goal = None
+        self.expanded = 0
+
+    def _reset(self, start, goal):
+        grid = np.asarray(self.grid)
+        self.rows, self.cols = grid.shape
+        width = self.cols + 2
+        self.width = width
+        self.snapshot = grid != 0
+        blocked = np.ones((self.rows + 2, width), dtype=np.uint8)
+        blocked[1:-1, 1:-1] = self.snapshot
+        self.cost_snapshot = None
+        self.cell_cost = None
+        if self.cost is not None:
+            self.cost_snapshot = np.array(self.cost, dtype=np.float64)
+            cost = np.full((self.rows + 2, width), np.inf)
+            cost[1:-1, 1:-1] = self.cost_snapshot
+            blocked[~np.isfinite(cost)] = 1
+            self.cell_cost = array('d', cost.tobytes())
+        self.blocked = bytearray(blocked.tobytes())
+        offsets = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0)]
+        if self.connectivity == 8:
+            offsets += [(-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2)]
+        self.neighbors = [(dr * width + dc, step) for dr, dc, step in offsets]
+
+        self.goal = goal
+        self.goal_index = self._index(goal)
+        self.start_index = self._index(start)
+        self.last_index = self.start_index
+        self.km = 0.0
+        self.g = {}
+        self.rhs = {self.goal_index: 0.0}
+        self.queue = []
+        self.queued = {}
+        self._push(self.goal_index, (self._h(self.start_index, self.goal_index), 0.0))
+
+    def _index(self, node):
+        return (node[0] + 1) * self.width + node[1] + 1
+
+    def _node(self, index):
+        r, c = divmod(index, self.width)
+        return (r - 1, c - 1)
+
+    def _h(self, a, b):
+        ar, ac = divmod(a, self.width)
+        br, bc = divmod(b, self.width)
+        dr = abs(ar - br)
+        dc = abs(ac - bc)
+        if self.connectivity == 8:
+            return dr + dc + (SQRT2 - 2.0) * min(dr, dc)
+        return dr + dc
+
+    def _edge(self, b, step):
+        # Cost of moving into cell b
+        if self.blocked[b]:
+            return INF
+        return step if self.cell_cost is None else step * self.cell_cost[b]
+
+    def _key(self, s):
+        m = min(self.g.get(s, INF), self.rhs.get(s, INF))
+        return (m + self._h(self.start_index, s) + self.km, m)
+
+    def _push(self, s, key):
+        self.queued[s] = key
+        heapq.heappush(self.queue, (key[0], key[1], s))
+
+    def _top(self):
+        # Heap entries whose key no longer matches are stale and dropped here
+        while self.queue:
+            k1, k2, s = self.queue[0]
+            if self.queued.get(s) == (k1, k2):
+                return (k1, k2), s
+            heapq.heappop(self.queue)
+        return (INF, INF), None
+
+    def _update_vertex(self, s):
+        if self.g.get(s, INF) != self.rhs.get(s, INF):
+            self._push(s, self._key(s))
+        else:
+            self.queued.pop(s, None)
+
+    def _best_successor_cost(self, s):
+        best = INF
+        g = self.g
+        for offset, step in self.neighbors:
+            n = s + offset
+            value = self._edge(n, step) + g.get(n, INF)
+            if value < best:
+                best = value
+        return best
+
+    def _recompute(self, s):
+        if s != self.goal_index and not self.blocked[s]:
+            self.rhs[s] = self._best_successor_cost(s)
+        self._update_vertex(s)
+
+    def _compute_shortest_path(self):
+        g = self.g
+        rhs = self.rhs
+        start = self.start_index
+        expanded = 0
+        while True:
+            top_key, u = self._top()
+            if u is None:
+                break
+            start_key = self._key(start)
+            # Cells tied with the start are expanded too: on a grid many cells lie on equally
+            # short paths, and the path is read off their g values afterwards
+            if top_key[0] > start_key[0] + 1e-9 and rhs.get(start, INF) == g.get(start, INF):
+                break
+            new_key = self._key(u)
+            if top_key < new_key:
+                self._push(u, new_key)
+                continue
+            expanded += 1
+            del self.queued[u]
+            g_u = g.get(u, INF)
+            rhs_u = rhs.get(u, INF)
+            if g_u > rhs_u:
+                g[u] = rhs_u
+                # Predecessors of u are its neighbours; moving into u costs the same from each
+                for offset, step in self.neighbors:
+                    s = u + offset
+                    if s == self.goal_index or self.blocked[s]:
+                        continue
+                    value = self._edge(u, step) + rhs_u
+                    if value < rhs.get(s, INF):
+                        rhs[s] = value
+                        self._update_vertex(s)
+            else:
+                g[u] = INF
+                self._recompute(u)
+                for offset, _ in self.neighbors:
+                    s = u + offset
+                    if not self.blocked[s]:
+                        self._recompute(s)
+        self.expanded += expanded
+
+    def _apply_changes(self):
+        # Cells whose blocked state or cost differs from what the search last saw
+        grid = np.asarray(self.grid) != 0
+        changed = grid != self.snapshot
+        if self.cost is not None:
+            cost = np.asarray(self.cost, dtype=np.float64)
+            changed |= cost != self.cost_snapshot
+        rows, cols = np.nonzero(changed)
+        if len(rows) == 0:
+            return False
+        self.snapshot = grid
+        if self.cost is not None:
+            self.cost_snapshot = cost.copy()
+        cells = [(r + 1) * self.width + c + 1 for r, c in zip(rows.tolist(), cols.tolist())]
+        for v, r, c in zip(cells, rows.tolist(), cols.tolist()):
+            blocked = grid[r, c]
+            if self.cost is not None:
+                self.cell_cost[v] = float(cost[r, c])
+                blocked = blocked or not np.isfinite(cost[r, c])
+            self.blocked[v] = 1 if blocked else 0
+        # Only the edges into the changed cells moved, so their neighbours need new rhs values.
+        # Blocked cells are not kept up to date, so a freed cell needs one as well.
+        for v in cells:
+            if not self.blocked[v]:
+                self._recompute(v)
+            for offset, _ in self.neighbors:
+                s = v + offset
+                if not self.blocked[s]:
+                    self._recompute(s)
+        return True
+
+    def find_path(self, start, end):
+        grid = np.asarray(self.grid)
+        if not (0 <= end[0] < grid.shape[0] and 0 <= end[1] < grid.shape[1]) or \
+           not (0 <= start[0] < grid.shape[0] and 0 <= start[1] < grid.shape[1]):
+            return None
+        self.expanded = 0
+        if self.goal != tuple(end) or grid.shape != (self.rows, self.cols):
+            self._reset(tuple(start), tuple(end))
+        else:
+            # Queued keys were computed against the old start; km keeps them lower bounds for
+            # the new one, whether or not the map changed too
+            self.start_index = self._index(start)
+            self.km += self._h(self.last_index, self.start_index)
+            self.last_index = self.start_index
+            self._apply_changes()
+        if self.blocked[self.goal_index]:
+            return None
+        self._compute_shortest_path()
+        return self._extract_path()
+
+    def _extract_path(self):
+        # Follow the cheapest successor from the start down to the goal
+        current = self.start_index
+        # The start may be left locally inconsistent; its rhs holds the path cost
+        if self.rhs.get(current, INF) == INF:
+            return None
+        path = [self._node(current)]
+        limit = self.rows * self.cols
+        while current != self.goal_index and len(path) <= limit:
+            best, best_cost = None, INF
+            for offset, step in self.neighbors:
+                n = current + offset
+                value = self._edge(n, step) + self.g.get(n, INF)
+                if value < best_cost:
+                    best, best_cost = n, value
+            if best is None:
+                return None
+            current = best
+            path.append(self._node(current))
+        if current != self.goal_index:
+            return None
+        return path
+
+class PlanningService:
+    # Bounded LRU of recent plans in front of a planner, keyed on (grid version,
+    # start, goal). grid_version returns the map's current version (for example
+    # OccupancyGrid.version); a plan is reused until that changes. Without one the
+    # grid is taken to be static.
+    def __init__(self, planner, grid_version=None, max_entries=32):
+        self.planner = planner
+        self.grid_version = grid_version
+        self.max_entries = max_entries
+        self.plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def find_path(self, start, end):
+        version = self.grid_version() if self.grid_version is not None else 0
+        key = (version, tuple(start), tuple(end))
+        if key in self.plans:
+            self.hits += 1
+            self.plans.move_to_end(key)
+            return self.plans[key]
+        self.misses += 1
+        path = self.planner.find_path(start, end)
+        # Plans for an older map can never be hit again
+        for old_key in [k for k in self.plans if k[0] != version]:
+            del self.plans[old_key]
+        self.plans[key] = path
+        if len(self.plans) > self.max_entries:
+            self.plans.popitem(last=False)
+        return path
+
+    def clear(self):
+        self.plans.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'cached_plans': len(self.plans),
+        }
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import numpy as np
+from src.replay_interface import SensorRecording
+
+# On-disk layout of a recording directory, one sub-directory per stream:
+#
+#   <stream>/stream.json     kind, dtype, record shape and chunk size
+#   <stream>/timestamps.f64  one float64 capture time per record, in order
+#   "array" streams (image, depth, gamepad, command) have a fixed record shape and
+#   are stored in chunk_NNNNN.npy files of chunk_records records each.
+#   "ragged" streams (lidar) store float32 rows back to back in values.f32 with
+#   the end offset of each record in offsets.i64.
+#
+# Everything is read through np.memmap, so a reader can seek by timestamp and
+# slice a run without loading it into RAM.
+
+GAMEPAD_FIELDS = ["leftJoystickX", "leftJoystickY", "rightJoystickX", "rightJoystickY", "trigger",
+                  "buttonA", "buttonB", "buttonX", "buttonY", "buttonLeft", "buttonRight"]
+
+class _ArrayStreamWriter:
+    def __init__(self, directory, shape, dtype, chunk_records):
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_records = chunk_records
+        self.count = 0
+        self.chunk = None
+        os.makedirs(directory, exist_ok=True)
+        self.timestamps = open(os.path.join(directory, "timestamps.f64"), "wb")
+        with open(os.path.join(directory, "stream.json"), "w") as f:
+            json.dump({'kind': 'array', 'shape': list(self.shape), 'dtype': self.dtype.str,
+                       'chunk_records': chunk_records}, f)
+
+    def append(self, timestamp, value):
+        value = np.asarray(value)
+        if value.shape != self.shape:
+            raise ValueError(f"Record shape {value.shape} does not match stream shape {self.shape}")
+        slot = self.count % self.chunk_records
+        if slot == 0:
+            self._close_chunk()
+            path = os.path.join(self.directory, f"chunk_{self.count // self.chunk_records:05d}.npy")
+            self.chunk = np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype,
+                                                   shape=(self.chunk_records,) + self.shape)
+        self.chunk[slot] = value
+        self.timestamps.write(np.float64(timestamp).tobytes())
+        self.count += 1
+
+    def _close_chunk(self):
+        if self.chunk is not None:
+            self.chunk.flush()
+            self.chunk = None
+
+    def close(self):
+        self._close_chunk()
+        self.timestamps.close()
+
+class _RaggedStreamWriter:
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = columns
+        self.offset = 0
+        os.makedirs(directory, exist_ok=True)
+        self.timestamps = open(os.path.join(directory, "timestamps.f64"), "wb")
+        self.values = open(os.path.join(directory, "values.f32"), "wb")
+        self.offsets = open(os.path.join(directory, "offsets.i64"), "wb")
+        with open(os.path.join(directory, "stream.json"), "w") as f:
+            json.dump({'kind': 'ragged', 'columns': columns, 'dtype': '<f4'}, f)
+
+    def append(self, timestamp, columns):
+        rows = np.column_stack([np.asarray(c, dtype=np.float32).ravel() for c in columns])
+        self.values.write(np.ascontiguousarray(rows, dtype='<f4').tobytes())
+        self.offset += len(rows)
+        self.offsets.write(np.int64(self.offset).tobytes())
+        self.timestamps.write(np.float64(timestamp).tobytes())
+
+    def close(self):
+        for f in (self.timestamps, self.values, self.offsets):
+            f.close()
+
+class SensorRecorder:
+    # Streams camera frames, depth images, lidar scans, gamepad state and commands
+    # to a recording directory as they arrive, instead of buffering rows in memory.
+    def __init__(self, directory, chunk_records=256, streams=("image", "depth", "lidar", "gamepad", "command")):
+        self.directory = directory
+        self.chunk_records = chunk_records
+        self.enabled_streams = set(streams)
+        self.writers = {}
+        self.last_timestamps = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _array_writer(self, name, value):
+        writer = self.writers.get(name)
+        if writer is None:
+            value = np.asarray(value)
+            writer = _ArrayStreamWriter(os.path.join(self.directory, name), value.shape, value.dtype, self.chunk_records)
+            self.writers[name] = writer
+        return writer
+
+    def _is_new(self, name, timestamp):
+        # In asynchronous mode the same reading shows up in several snapshots
+        if name not in self.enabled_streams or self.last_timestamps.get(name) == timestamp:
+            return False
+        self.last_timestamps[name] = timestamp
+        return True
+
+    def record_array(self, name, timestamp, value):
+        self._array_writer(name, value).append(timestamp, value)
+
+    def record_lidar(self, timestamp, distances, angles):
+        writer = self.writers.get("lidar")
+        if writer is None:
+            writer = _RaggedStreamWriter(os.path.join(self.directory, "lidar"), ["distances", "angles"])
+            self.writers["lidar"] = writer
+        writer.append(timestamp, (distances, angles))
+
+    def record_snapshot(self, snapshot):
+        now = time.time()
+        timestamps = {name: snapshot.timestamps.get(name) or now for name in ("depth", "lidar", "gamepad")}
+        if snapshot.frame is not None and self._is_new("image", snapshot.frame.timestamp):
+            self.record_array("image", snapshot.frame.timestamp, snapshot.frame.image)
+        if snapshot.depth_data is not None and self._is_new("depth", timestamps["depth"]):
+            self.record_array("depth", timestamps["depth"], snapshot.depth_data)
+        if snapshot.lidar_distances is not None and snapshot.lidar_angles is not None \
+                and self._is_new("lidar", timestamps["lidar"]):
+            self.record_lidar(timestamps["lidar"], snapshot.lidar_distances, snapshot.lidar_angles)
+        if snapshot.gamepad is not None and snapshot.gamepad_new_read and self._is_new("gamepad", timestamps["gamepad"]):
+            values = [float(getattr(snapshot.gamepad, field, 0.0)) for field in GAMEPAD_FIELDS]
+            self.record_array("gamepad", timestamps["gamepad"], np.array(values, dtype=np.float32))
+
+    def record_command(self, timestamp, throttle, steering):
+        if "command" in self.enabled_streams:
+            self.record_array("command", timestamp, np.array([throttle, steering], dtype=np.float64))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class RecordingReader:
+    # Memory-mapped view of a recording directory. It also provides the
+    # stream_names/timestamps/value interface ReplayHardwareInterface expects.
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta = {}
+        self._timestamps = {}
+        self._chunks = {}
+        self._ragged = {}
+        for name in sorted(os.listdir(directory)):
+            meta_path = os.path.join(directory, name, "stream.json")
+            if not os.path.isfile(meta_path):
+                continue
+            with open(meta_path) as f:
+                self.meta[name] = json.load(f)
+            self._timestamps[name] = self._map(os.path.join(directory, name, "timestamps.f64"), np.float64)
+
+    @staticmethod
+    def _map(path, dtype):
+        # np.memmap refuses empty files
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def stream_names(self):
+        return list(self.meta)
+
+    def __len__(self):
+        return max((len(ts) for ts in self._timestamps.values()), default=0)
+
+    def count(self, name):
+        return len(self._timestamps[name])
+
+    def timestamps(self, name):
+        if name not in self._timestamps:
+            return np.zeros(0)
+        return self._timestamps[name]
+
+    def index_at(self, name, timestamp):
+        # Index of the latest record at or before timestamp, or -1
+        return int(np.searchsorted(self._timestamps[name], timestamp, side='right')) - 1
+
+    def index_range(self, name, start_time, end_time):
+        timestamps = self._timestamps[name]
+        start = int(np.searchsorted(timestamps, start_time, side='left'))
+        stop = int(np.searchsorted(timestamps, end_time, side='right'))
+        return start, stop
+
+    def _chunk(self, name, chunk_index):
+        key = (name, chunk_index)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            path = os.path.join(self.directory, name, f"chunk_{chunk_index:05d}.npy")
+            chunk = np.load(path, mmap_mode="r")
+            self._chunks[key] = chunk
+        return chunk
+
+    def _ragged_maps(self, name):
+        maps = self._ragged.get(name)
+        if maps is None:
+            columns = len(self.meta[name]['columns'])
+            values = self._map(os.path.join(self.directory, name, "values.f32"), '<f4').reshape(-1, columns)
+            offsets = self._map(os.path.join(self.directory, name, "offsets.i64"), '<i8')
+            maps = (values, offsets)
+            self._ragged[name] = maps
+        return maps
+
+    def raw(self, name, index):
+        # The stored record: an ndarray view for array streams, the (n, columns) rows for ragged ones
+        if index < 0:
+            index += self.count(name)
+        if self.meta[name]['kind'] == 'ragged':
+            values, offsets = self._ragged_maps(name)
+            start = offsets[index - 1] if index > 0 else 0
+            return values[start:offsets[index]]
+        chunk_records = self.meta[name]['chunk_records']
+        return self._chunk(name, index // chunk_records)[index % chunk_records]
+
+    def value(self, name, index):
+        record = self.raw(name, index)
+        if name == "lidar":
+            return np.asarray(record[:, 0], dtype=np.float64), np.asarray(record[:, 1], dtype=np.float64)
+        if name == "gamepad":
+            return {field: float(v) for field, v in zip(GAMEPAD_FIELDS, record)}
+        return record
+
+    def slice(self, name, start, stop):
+        # Yields (timestamp, value) for records start..stop-1 without materialising them all
+        timestamps = self._timestamps[name]
+        for index in range(start, min(stop, len(timestamps))):
+            yield timestamps[index], self.value(name, index)
+
+    def array_slice(self, name, start, stop):
+        # Stacked copy of an array stream's records start..stop-1 (e.g. all commands of a run)
+        chunk_records = self.meta[name]['chunk_records']
+        stop = min(stop, self.count(name))
+        parts = []
+        index = start
+        while index < stop:
+            chunk_index = index // chunk_records
+            chunk_stop = min(stop, (chunk_index + 1) * chunk_records)
+            chunk = self._chunk(name, chunk_index)
+            parts.append(chunk[index % chunk_records:index % chunk_records + chunk_stop - index])
+            index = chunk_stop
+        if not parts:
+            shape = tuple(self.meta[name]['shape'])
+            return np.zeros((0,) + shape, dtype=np.dtype(self.meta[name]['dtype']))
+        return np.concatenate(parts)
+
+def open_recording(path):
+    # Recording directories are memory-mapped; anything else is a pickled SensorRecording
+    if os.path.isdir(path):
+        return RecordingReader(path)
+    return SensorRecording.load(path)
@@ -0,0 +1,220 @@
+import time
+import pickle
+import numpy as np
+from src.frame import Frame
+from src.sensor_threads import SensorSnapshot
+
+class SensorRecording:
+    # In-memory set of timestamped sensor streams: "image", "depth", "lidar" and "gamepad".
+    # Image values are BGR ndarrays, depth values are depth images, lidar values are
+    # (distances, angles) tuples and gamepad values are dicts of LogitechF710 attributes.
+    def __init__(self):
+        self.streams = {}
+
+    def add(self, name, timestamp, value):
+        timestamps, values = self.streams.setdefault(name, ([], []))
+        timestamps.append(timestamp)
+        values.append(value)
+
+    def stream_names(self):
+        return list(self.streams)
+
+    def timestamps(self, name):
+        if name not in self.streams:
+            return np.zeros(0)
+        return np.asarray(self.streams[name][0], dtype=np.float64)
+
+    def value(self, name, index):
+        return self.streams[name][1][index]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self.streams, f)
+
+    @classmethod
+    def load(cls, path):
+        recording = cls()
+        with open(path, "rb") as f:
+            recording.streams = pickle.load(f)
+        return recording
+
+class ReplayGamepad:
+    # Stand-in for LogitechF710 whose attributes come from the recording
+    def __init__(self):
+        self.leftJoystickX = 0.0
+        self.leftJoystickY = 0.0
+        self.rightJoystickX = 0.0
+        self.rightJoystickY = 0.0
+        self.trigger = 0.0
+        self.buttonA = 0
+        self.buttonB = 0
+        self.buttonX = 0
+        self.buttonY = 0
+        self.buttonLeft = 0
+        self.buttonRight = 0
+
+    def update(self, values):
+        for key, value in values.items():
+            setattr(self, key, value)
+
+    def terminate(self):
+        pass
+
+class ReplayHardwareInterface:
+    # Drop-in replacement for QCarHardwareInterface that plays back a recording.
+    # speed=1.0 replays in real time, larger values replay faster, and speed=None
+    # steps one camera frame per read_snapshot() as fast as the consumer can go.
+    # Every send_command() is captured in self.commands as (time, throttle, steering).
+    def __init__(self, recording, speed=1.0, loop=False, clock=time.perf_counter):
+        self.recording = recording
+        self.speed = speed
+        self.loop = loop
+        self.clock = clock
+        self.asynchronous = False
+        self.gamepad = ReplayGamepad()
+        self.commands = []
+        self.finished = False
+
+        self.timestamps = {name: recording.timestamps(name) for name in recording.stream_names()}
+        all_timestamps = [ts for ts in self.timestamps.values() if len(ts)]
+        self.start_time = min(ts[0] for ts in all_timestamps) if all_timestamps else 0.0
+        self.end_time = max(ts[-1] for ts in all_timestamps) if all_timestamps else 0.0
+        # In stepped mode the replay advances along the camera (or lidar) timeline
+        tick_stream = "image" if len(self.timestamps.get("image", [])) else "lidar"
+        self.tick_timestamps = self.timestamps.get(tick_stream, np.zeros(0))
+        self.tick_index = -1
+        self.wall_start = None
+        self.time = self.start_time
+        self.frames = {}
+        self.last_gamepad_index = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.send_command(0.0, 0.0)
+
+    def start_acquisition(self):
+        pass
+
+    def stop_acquisition(self):
+        pass
+
+    def camera_resolution(self):
+        if not len(self.timestamps.get("image", [])):
+            return 640, 480
+        image = self.recording.value("image", 0)
+        return image.shape[1], image.shape[0]
+
+    def advance(self):
+        # Moves the replay clock forward and returns the current recording time
+        if self.speed is None:
+            self.tick_index += 1
+            if self.tick_index >= len(self.tick_timestamps):
+                if self.loop and len(self.tick_timestamps):
+                    self.tick_index = 0
+                    self.frames = {}
+                    self.last_gamepad_index = -1
+                else:
+                    self.finished = True
+                    self.tick_index = len(self.tick_timestamps) - 1
+            if len(self.tick_timestamps):
+                self.time = self.tick_timestamps[self.tick_index]
+            return self.time
+
+        now = self.clock()
+        if self.wall_start is None:
+            self.wall_start = now
+        self.time = self.start_time + (now - self.wall_start) * self.speed
+        if self.time > self.end_time:
+            if self.loop:
+                self.wall_start = now
+                self.time = self.start_time
+                self.frames = {}
+                self.last_gamepad_index = -1
+            else:
+                self.finished = True
+                self.time = self.end_time
+        return self.time
+
+    def _follow_clock(self):
+        # Individual reads only move a timed replay; a stepped replay advances once
+        # per read_snapshot() so extra reads (web feed, describe) do not skip frames
+        if self.speed is not None:
+            self.advance()
+
+    def _latest_index(self, name):
+        timestamps = self.timestamps.get(name)
+        if timestamps is None or not len(timestamps):
+            return -1
+        return int(np.searchsorted(timestamps, self.time, side='right')) - 1
+
+    def read_snapshot(self):
+        self.advance()
+        lidar_distances, lidar_angles = self._read_lidar()
+        gamepad_new_read, gamepad = self._read_gamepad()
+        sequences = {}
+        timestamps = {}
+        for name, stream_timestamps in self.timestamps.items():
+            index = self._latest_index(name)
+            sequences[name] = index + 1
+            if index >= 0:
+                timestamps[name] = stream_timestamps[index]
+        return SensorSnapshot(
+            frame=self._read_image(),
+            depth_data=self._read_depth(),
+            lidar_distances=lidar_distances,
+            lidar_angles=lidar_angles,
+            gamepad_new_read=gamepad_new_read,
+            gamepad=gamepad,
+            sequences=sequences,
+            timestamps=timestamps,
+        )
+
+    def read_image(self):
+        self._follow_clock()
+        return self._read_image()
+
+    def read_depth_data(self):
+        self._follow_clock()
+        return self._read_depth()
+
+    def read_lidar_data(self):
+        self._follow_clock()
+        return self._read_lidar()
+
+    def read_gamepad(self):
+        self._follow_clock()
+        return self._read_gamepad()
+
+    def send_command(self, throttle, steering):
+        self.commands.append((self.time, throttle, steering))
+
+    def _read_image(self):
+        index = self._latest_index("image")
+        if index < 0:
+            return None
+        # Keep one Frame per recorded image so its lazy JPEG encode is shared too
+        frame = self.frames.get(index)
+        if frame is None:
+            frame = Frame(self.recording.value("image", index), timestamp=self.timestamps["image"][index], frame_id=index + 1)
+            self.frames = {index: frame}
+        return frame
+
+    def _read_depth(self):
+        index = self._latest_index("depth")
+        return self.recording.value("depth", index) if index >= 0 else None
+
+    def _read_lidar(self):
+        index = self._latest_index("lidar")
+        if index < 0:
+            return None, None
+        return self.recording.value("lidar", index)
+
+    def _read_gamepad(self):
+        index = self._latest_index("gamepad")
+        new_read = index >= 0 and index != self.last_gamepad_index
+        if new_read:
+            self.gamepad.update(self.recording.value("gamepad", index))
+            self.last_gamepad_index = index
+        return new_read, self.gamepad
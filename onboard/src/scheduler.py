@@ -0,0 +1,112 @@
+import math
+import time
+
+class RateScheduler:
+    # Runs a control loop at a fixed rate using absolute deadlines, so the rate does
+    # not drift with however long each tick took. Missed deadlines and wake-up jitter
+    # are counted, and optional low-priority work (telemetry, display) is only run
+    # when the current tick still has time left for it.
+    def __init__(self, frequency=100, clock=time.perf_counter, sleep=time.sleep, cost_smoothing=0.2):
+        self.frequency = frequency
+        self.period = 1.0 / frequency
+        self.clock = clock
+        self.sleep = sleep
+        self.cost_smoothing = cost_smoothing
+        self.next_deadline = None
+        self.tick_start = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.skipped_periods = 0
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+        self.max_overrun = 0.0
+        self.low_priority_runs = {}
+        self.low_priority_skips = {}
+        self.low_priority_costs = {}
+        self.consecutive_skips = {}
+
+    def start(self):
+        self.next_deadline = self.clock() + self.period
+        self.tick_start = self.clock()
+
+    def wait_for_next_tick(self):
+        # Blocks until the next deadline and returns the tick's start time
+        if self.next_deadline is None:
+            self.start()
+            self.ticks += 1
+            return self.tick_start
+
+        now = self.clock()
+        if now > self.next_deadline:
+            # The previous tick overran. Resynchronise to the next future deadline
+            # instead of firing a burst of catch-up ticks.
+            overrun = now - self.next_deadline
+            self.missed_deadlines += 1
+            self.max_overrun = max(self.max_overrun, overrun)
+            missed = int(math.floor(overrun / self.period)) + 1
+            self.skipped_periods += missed - 1
+            self.next_deadline += missed * self.period
+            self.tick_start = now
+        else:
+            self.sleep(self.next_deadline - now)
+            self.tick_start = self.clock()
+            jitter = self.tick_start - self.next_deadline
+            self.total_jitter += jitter
+            self.max_jitter = max(self.max_jitter, jitter)
+            self.next_deadline += self.period
+
+        self.ticks += 1
+        return self.tick_start
+
+    def time_remaining(self):
+        if self.next_deadline is None:
+            return self.period
+        return self.next_deadline - self.clock()
+
+    def is_overrunning(self):
+        return self.time_remaining() <= 0
+
+    def run_low_priority(self, name, task, *args, force_after=None):
+        # Runs task only if its typical cost fits in what is left of this tick.
+        # force_after runs it anyway once it has been skipped that many ticks in a row,
+        # so e.g. keyboard handling cannot be starved forever. Returns True if the task ran.
+        estimate = self.low_priority_costs.get(name, 0.0)
+        starved = force_after is not None and self.consecutive_skips.get(name, 0) >= force_after
+        if not starved and (self.time_remaining() < estimate or self.is_overrunning()):
+            self.low_priority_skips[name] = self.low_priority_skips.get(name, 0) + 1
+            self.consecutive_skips[name] = self.consecutive_skips.get(name, 0) + 1
+            return False
+        self.consecutive_skips[name] = 0
+
+        start = self.clock()
+        task(*args)
+        cost = self.clock() - start
+        if name in self.low_priority_costs:
+            cost = (1 - self.cost_smoothing) * estimate + self.cost_smoothing * cost
+        self.low_priority_costs[name] = cost
+        self.low_priority_runs[name] = self.low_priority_runs.get(name, 0) + 1
+        return True
+
+    def stats(self):
+        on_time = self.ticks - self.missed_deadlines - 1
+        return {
+            'frequency': self.frequency,
+            'ticks': self.ticks,
+            'missed_deadlines': self.missed_deadlines,
+            'skipped_periods': self.skipped_periods,
+            'mean_jitter': self.total_jitter / on_time if on_time > 0 else 0.0,
+            'max_jitter': self.max_jitter,
+            'max_overrun': self.max_overrun,
+            'low_priority_runs': dict(self.low_priority_runs),
+            'low_priority_skips': dict(self.low_priority_skips),
+        }
+
+    def run(self, step, max_ticks=None):
+        # Convenience loop: calls step(scheduler) once per tick
+        while max_ticks is None or self.ticks < max_ticks:
+            self.wait_for_next_tick()
+            if step(self) is False:
+                break
@@ -0,0 +1,97 @@
+import time
+import threading
+import numpy as np
+
+class LatestValue:
+    # Single-producer slot that always holds the most recent reading.
+    # The (value, sequence, timestamp) entry is replaced with one reference
+    # assignment, which is atomic under the GIL, so readers never take a lock.
+    def __init__(self):
+        self._entry = (None, 0, 0.0)
+
+    def publish(self, value, timestamp=None):
+        sequence = self._entry[1] + 1
+        self._entry = (value, sequence, time.time() if timestamp is None else timestamp)
+
+    def get(self):
+        return self._entry
+
+class RepeatFilter:
+    # Drivers hand back their last reading again when nothing new has arrived. is_new()
+    # compares an evenly strided sample of the arrays (up to `samples` values each) with
+    # the last new reading's; sensor noise makes that enough to tell new data from a repeat.
+    def __init__(self, samples=256):
+        self.samples = samples
+        self.previous = None
+
+    def _sample(self, array):
+        flat = np.asarray(array).reshape(-1)
+        return flat[::max(1, flat.size // self.samples)].copy()
+
+    def is_new(self, *arrays):
+        if any(array is None for array in arrays):
+            return False
+        sample = [self._sample(array) for array in arrays]
+        if self.previous is not None and all(a.shape == b.shape and np.array_equal(a, b) for a, b in zip(sample, self.previous)):
+            return False
+        self.previous = sample
+        return True
+
+class ReadCursor:
+    # Remembers the last slot sequence one consumer has seen, so it can tell whether
+    # the slot was published to since it last looked
+    def __init__(self):
+        self.sequence = 0
+
+    def advance(self, sequence):
+        new_read = sequence > self.sequence
+        self.sequence = max(self.sequence, sequence)
+        return new_read
+
+class SensorThread(threading.Thread):
+    # Calls a read function in a loop and publishes every result; None means no new
+    # reading. period is the wait after a reading and idle_period the wait after None,
+    # so a driver that keeps handing back its last buffer is not polled in a busy loop.
+    def __init__(self, name, read_function, slot, period=0.0, idle_period=0.0):
+        super().__init__(name=name, daemon=True)
+        self.read_function = read_function
+        self.slot = slot
+        self.period = period
+        self.idle_period = idle_period
+        self.stop_event = threading.Event()
+        self.error_count = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                value = self.read_function()
+            except Exception as e:
+                self.error_count += 1
+                print(f"Warning: {self.name} read failed: {e}")
+                self.stop_event.wait(0.1)
+                continue
+            if value is not None:
+                self.slot.publish(value)
+                wait = self.period
+            else:
+                wait = max(self.period, self.idle_period)
+            if wait > 0:
+                self.stop_event.wait(wait)
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+class SensorSnapshot:
+    # One coherent set of sensor readings for a control tick
+    def __init__(self, frame=None, depth_data=None, lidar_distances=None, lidar_angles=None,
+                 gamepad_new_read=False, gamepad=None, sequences=None, timestamps=None):
+        self.frame = frame
+        self.depth_data = depth_data
+        self.lidar_distances = lidar_distances
+        self.lidar_angles = lidar_angles
+        self.gamepad_new_read = gamepad_new_read
+        self.gamepad = gamepad
+        self.sequences = sequences or {}
+        self.timestamps = timestamps or {}
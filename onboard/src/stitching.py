@@ -0,0 +1,113 @@
+import weakref
+import numpy as np
+import cv2
+
+class PanoramaStitcher:
+    # Builds the 360-degree view from the CSI cameras without allocating per frame.
+    # Placement and remap tables are computed once from the camera geometry and each
+    # camera is written straight into a preallocated panorama buffer. With
+    # blend_width > 0 neighbouring cameras overlap by that many columns and the seam
+    # is cross-faded with precomputed weights.
+    def __init__(self, camera_order=("left", "front", "right", "back"), target_height=None, blend_width=0, num_buffers=2):
+        self.camera_order = list(camera_order)
+        self.target_height = target_height
+        self.blend_width = blend_width
+        # Panoramas handed out are views of these buffers. A buffer is only written
+        # again once the last panorama from it has been dropped, so a Frame that is
+        # still being encoded or analysed never changes under its consumer; when every
+        # buffer is still held the ring grows by one.
+        self.num_buffers = max(1, num_buffers)
+        self.buffers = []
+        self.handed_out = []
+        self.buffer_index = 0
+        self.input_shapes = None
+        self.placements = []
+        self.seam_buffers = []
+        self.seam_weights = None
+
+    def configure(self, input_shapes):
+        # input_shapes: list of (height, width, channels) in camera_order
+        self.input_shapes = [tuple(shape) for shape in input_shapes]
+        # By default everything is scaled to the front camera's height
+        reference = self.camera_order.index("front") if "front" in self.camera_order else 0
+        height = self.target_height or self.input_shapes[reference][0]
+        channels = self.input_shapes[0][2] if len(self.input_shapes[0]) > 2 else 1
+
+        self.placements = []
+        x = 0
+        for shape in self.input_shapes:
+            src_h, src_w = shape[0], shape[1]
+            width = int(src_w * height / src_h)
+            if src_h == height and src_w == width:
+                maps = None
+            else:
+                # Equivalent of cv2.resize(INTER_LINEAR), but as a fixed-point remap table
+                # that is built once instead of on every frame
+                scale_x = src_w / width
+                scale_y = src_h / height
+                map_x = np.tile(((np.arange(width, dtype=np.float32) + 0.5) * scale_x - 0.5), (height, 1))
+                map_y = np.tile(((np.arange(height, dtype=np.float32) + 0.5) * scale_y - 0.5)[:, None], (1, width))
+                maps = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            self.placements.append((x, width, maps))
+            x += width - self.blend_width
+        total_width = x + self.blend_width
+
+        buffer_shape = (height, total_width, channels) if channels > 1 else (height, total_width)
+        self.buffers = [np.zeros(buffer_shape, dtype=np.uint8) for _ in range(self.num_buffers)]
+        self.handed_out = [None] * self.num_buffers
+        self.buffer_index = 0
+
+        if self.blend_width > 0:
+            ramp = np.linspace(1.0, 0.0, self.blend_width, dtype=np.float32)
+            weights_left = np.ascontiguousarray(np.tile(ramp, (height, 1)))
+            self.seam_weights = (weights_left, 1.0 - weights_left)
+            seam_shape = (height, self.blend_width, channels) if channels > 1 else (height, self.blend_width)
+            self.seam_buffers = [np.zeros(seam_shape, dtype=np.uint8) for _ in range(len(self.placements) - 1)]
+        else:
+            self.seam_weights = None
+            self.seam_buffers = []
+
+    def _next_buffer(self):
+        # Round robin over the ring, skipping buffers whose last panorama is still alive
+        for _ in range(len(self.buffers)):
+            index = self.buffer_index
+            self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+            if self.handed_out[index] is None or self.handed_out[index]() is None:
+                return index
+        self.buffers.append(np.zeros_like(self.buffers[0]))
+        self.handed_out.append(None)
+        return len(self.buffers) - 1
+
+    def output_shape(self):
+        return self.buffers[0].shape if self.buffers else None
+
+    def stitch(self, images):
+        if any(img is None for img in images):
+            return None
+        shapes = [img.shape for img in images]
+        if shapes != self.input_shapes:
+            self.configure(shapes)
+
+        index = self._next_buffer()
+        panorama = self.buffers[index]
+
+        for i, (img, (x, width, maps)) in enumerate(zip(images, self.placements)):
+            target = panorama[:, x:x + width]
+            if maps is None:
+                target[...] = img
+            else:
+                cv2.remap(img, maps[0], maps[1], cv2.INTER_LINEAR, dst=target, borderMode=cv2.BORDER_REPLICATE)
+
+            if self.blend_width > 0:
+                if i > 0:
+                    # Cross-fade the tail of the previous camera into the head of this one
+                    seam = panorama[:, x:x + self.blend_width]
+                    cv2.blendLinear(self.seam_buffers[i - 1], seam, self.seam_weights[0], self.seam_weights[1], dst=seam)
+                if i < len(self.seam_buffers):
+                    self.seam_buffers[i][...] = panorama[:, x + width - self.blend_width:x + width]
+
+        # Hand out a fresh view and watch it; views taken from it keep only the buffer alive,
+        # so whoever holds the panorama (the Frame) decides when the buffer is free again
+        view = panorama[...]
+        self.handed_out[index] = weakref.ref(view)
+        return view
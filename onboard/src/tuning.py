@@ -0,0 +1,141 @@
+import csv
+import itertools
+import multiprocessing
+import numpy as np
+import cv2
+from src.agent import Agent
+from src.birds_eye import BirdsEyeView
+from src.recording import open_recording
+from src.replay_interface import ReplayHardwareInterface
+
+# Offline tuning of the agent's parameters on recorded sensor sessions. Each candidate is
+# a dict of dotted Agent attribute paths ("tracking_pid.kp", "steering_limiter.rate",
+# "lane_lookahead", ...) to values, applied to a fresh Agent that then steps through every
+# recorded frame as fast as it can go. A run is scored on
+#   jitter: RMS change in steering from one tick to the next,
+#   error:  RMS of the error the agent steered on (pixels, or metres with a bird's-eye view),
+#   loss:   fraction of ticks with no object, face or lane to steer on.
+# Candidates are spread over a pool of worker processes, each of which opens the recordings
+# once.
+
+METRICS = ('jitter', 'error', 'loss')
+
+def parameter_grid(values):
+    # {name: [values]} to a list of {name: value}, one per combination
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+def apply_parameters(agent, parameters):
+    for name, value in parameters.items():
+        *path, attribute = name.split('.')
+        target = agent
+        for part in path:
+            target = getattr(target, part)
+        if not hasattr(target, attribute):
+            raise AttributeError(f"Agent has no parameter {name}")
+        setattr(target, attribute, value)
+
+def run_metrics(steering, errors):
+    steering = np.asarray(steering, dtype=np.float64)
+    found = np.array([error is not None for error in errors], dtype=bool)
+    errors = np.array([error for error in errors if error is not None], dtype=np.float64)
+    return {
+        'ticks': len(steering),
+        'jitter': float(np.sqrt(np.mean(np.diff(steering) ** 2))) if len(steering) > 1 else 0.0,
+        'error': float(np.sqrt(np.mean(errors ** 2))) if len(errors) else float('nan'),
+        'loss': float(1.0 - found.mean()) if len(found) else 1.0,
+    }
+
+def replay(recording, command, parameters=None, birds_eye=None, target_location=(9, 9)):
+    # Metrics of one stepped replay of the recording with the candidate's parameters
+    hardware = ReplayHardwareInterface(recording, speed=None)
+    camera_width, camera_height = hardware.camera_resolution()
+    grid = [[0 for _ in range(10)] for _ in range(10)]
+    agent = Agent(camera_width, camera_height, grid, birds_eye=birds_eye)
+    apply_parameters(agent, parameters or {})
+
+    steering, errors = [], []
+    while True:
+        snapshot = hardware.read_snapshot()
+        if hardware.finished:
+            break
+        throttle, steer = agent.get_action_from_snapshot(command, snapshot, target_location=target_location)
+        hardware.send_command(throttle, steer)
+        steering.append(steer)
+        errors.append(agent.steering_error)
+    return run_metrics(steering, errors)
+
+def evaluate(recordings, command, parameters=None, birds_eye_config=None):
+    # Metrics over several recordings, averaged by their number of ticks
+    runs = []
+    for recording in recordings:
+        birds_eye = BirdsEyeView.from_config(birds_eye_config) if birds_eye_config is not None else None
+        runs.append(replay(recording, command, parameters, birds_eye))
+    ticks = np.array([run['ticks'] for run in runs], dtype=np.float64)
+    weights = ticks / ticks.sum() if ticks.sum() > 0 else np.full(len(runs), 1.0 / max(len(runs), 1))
+    metrics = {'ticks': int(ticks.sum())}
+    for name in METRICS:
+        values = np.array([run[name] for run in runs])
+        valid = ~np.isnan(values)
+        metrics[name] = float(np.sum(values[valid] * weights[valid]) / weights[valid].sum()) if valid.any() else float('nan')
+    return metrics
+
+def score(metrics, baseline, weights=(1.0, 1.0, 1.0)):
+    # Weighted sum of the metrics, each relative to the baseline's so pixels, metres and
+    # fractions can be added. Lower is better; a run that never found a target scores inf.
+    total = 0.0
+    for name, weight in zip(METRICS, weights):
+        value, reference = metrics[name], baseline[name]
+        if np.isnan(value):
+            return float('inf')
+        total += weight * value / (reference if reference > 0 else 1.0)
+    return total
+
+_recordings = None
+_birds_eye_config = None
+
+def _init_worker(paths, birds_eye_config):
+    global _recordings, _birds_eye_config
+    # One process per core already; OpenCV's own threads would only compete with them
+    cv2.setNumThreads(1)
+    _recordings = [open_recording(path) for path in paths]
+    _birds_eye_config = birds_eye_config
+
+def _evaluate_task(task):
+    index, command, parameters = task
+    return index, evaluate(_recordings, command, parameters, _birds_eye_config)
+
+def sweep(paths, command, candidates, workers=None, birds_eye_config=None, weights=(1.0, 1.0, 1.0),
+          start_method="spawn", progress=None):
+    # Replays every candidate and the agent's defaults on the recordings at `paths`. Returns
+    # the baseline metrics and a list of (score, parameters, metrics), best first. workers=0
+    # runs everything in this process; None uses one worker per core.
+    tasks = [(index, command, parameters) for index, parameters in enumerate([{}] + list(candidates))]
+    results = [None] * len(tasks)
+    if workers == 0:
+        recordings = [open_recording(path) for path in paths]
+        completed = ((index, evaluate(recordings, command, parameters, birds_eye_config)) for index, command, parameters in tasks)
+        for done, (index, metrics) in enumerate(completed, 1):
+            results[index] = metrics
+            if progress is not None:
+                progress(done, len(tasks))
+    else:
+        context = multiprocessing.get_context(start_method)
+        with context.Pool(workers, initializer=_init_worker, initargs=(list(paths), birds_eye_config)) as pool:
+            for done, (index, metrics) in enumerate(pool.imap_unordered(_evaluate_task, tasks), 1):
+                results[index] = metrics
+                if progress is not None:
+                    progress(done, len(tasks))
+
+    baseline = results[0]
+    ranked = [(score(metrics, baseline, weights), task[2], metrics) for task, metrics in zip(tasks[1:], results[1:])]
+    ranked.sort(key=lambda result: result[0])
+    return baseline, ranked
+
+def command_log_jitter(path, column="Steering"):
+    # Steering jitter of a CSV command log (e.g. done/qcar_log_smooth.csv). Those logs hold
+    # only the commands sent, so they cannot be replayed, but their jitter is a reference
+    # for what a tuned run should beat.
+    with open(path, newline="") as f:
+        steering = [float(row[column]) for row in csv.DictReader(f) if row.get(column) not in (None, "")]
+    return run_metrics(steering, [None] * len(steering))['jitter']
@@ -35,12 +35,11 @@ class WebServer:
 
     def generate_frames(self):
         while True:
-            image = self.main_app.hardware.read_image()
-            if image is not None:
-                ret, buffer = cv2.imencode('.jpg', image)
-                frame = buffer.tobytes()
+            frame = self.main_app.hardware.read_image()
+            if frame is not None:
+                jpeg = frame.to_jpeg()
                 yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
 
     def generate_lidar_data(self):
         while True:
@@ -0,0 +1,67 @@
+import sys
+import json
+import time
+import argparse
+from src.tuning import METRICS, parameter_grid, sweep, command_log_jitter
+
+# Sweeps agent parameters on recorded sensor sessions. Every combination of the --param
+# values is replayed through the agent in a pool of worker processes, alongside a run with
+# the agent's defaults that the scores are relative to.
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recordings", nargs="+", help="Recording directories or pickled sensor sessions.")
+    parser.add_argument("--command", default="track", help="Agent command to replay with (track, face_track, lane_follow, ...).")
+    parser.add_argument("--param", nargs="+", action="append", default=[], metavar=("NAME", "VALUE"),
+                        help="Agent attribute and the values to try, e.g. --param tracking_pid.kp 0.005 0.01 0.02. Repeat for more parameters.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes. Defaults to one per core; 0 runs in this process.")
+    parser.add_argument("--weights", type=float, nargs=3, default=(1.0, 1.0, 1.0), metavar=("JITTER", "ERROR", "LOSS"),
+                        help="Weights of steering jitter, tracking error and target loss in the score.")
+    parser.add_argument("--birds-eye", default=None, help="JSON bird's-eye calibration to follow lanes with, as for main.py.")
+    parser.add_argument("--reference", nargs="+", default=[], help="CSV command logs whose steering jitter to print for comparison.")
+    parser.add_argument("--top", type=int, default=10, help="Number of candidates to print.")
+    parser.add_argument("--output", default=None, help="Write every candidate's parameters, metrics and score to this JSON file.")
+    args = parser.parse_args()
+
+    values = {}
+    for param in args.param:
+        if len(param) < 2:
+            parser.error(f"--param {param[0]} needs at least one value")
+        values[param[0]] = [parse_value(text) for text in param[1:]]
+    candidates = parameter_grid(values) if values else []
+
+    birds_eye_config = None
+    if args.birds_eye:
+        with open(args.birds_eye) as f:
+            birds_eye_config = json.load(f)
+
+    def progress(done, total):
+        sys.stdout.write(f"\r{done}/{total} runs")
+        sys.stdout.flush()
+
+    start = time.perf_counter()
+    baseline, ranked = sweep(args.recordings, args.command, candidates, workers=args.workers,
+                             birds_eye_config=birds_eye_config, weights=args.weights, progress=progress)
+    total = time.perf_counter() - start
+    print(f"\n{len(candidates) + 1} runs of {baseline['ticks']} ticks in {total:.1f} s")
+
+    def describe(metrics):
+        return ", ".join(f"{name} {metrics[name]:.4g}" for name in METRICS)
+
+    print(f"Defaults: {describe(baseline)}")
+    for path in args.reference:
+        print(f"Reference {path}: jitter {command_log_jitter(path):.4g}")
+    for result_score, parameters, metrics in ranked[:args.top]:
+        print(f"{result_score:.3f}  {describe(metrics)}  {json.dumps(parameters)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'baseline': baseline,
+                       'candidates': [{'score': result_score, 'parameters': parameters, 'metrics': metrics}
+                                      for result_score, parameters, metrics in ranked]}, f, indent=2)
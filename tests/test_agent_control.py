@@ -0,0 +1,75 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.agent import Agent
+from src.frame import Frame
+
+ANGLES = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+
+def make_agent():
+    return Agent(160, 120, [[0] * 10 for _ in range(10)])
+
+def scan_with_obstacle(bearing, distance=0.2):
+    # Open space with one close obstacle at the bearing (radians, 0 ahead, CCW positive)
+    distances = np.full(360, 3.0)
+    near = np.abs(np.angle(np.exp(1j * (ANGLES - bearing)))) < np.radians(10)
+    distances[near] = distance
+    return distances
+
+class TestObstacleCheck(unittest.TestCase):
+
+    def test_obstacle_ahead_reverses(self):
+        agent = make_agent()
+        self.assertEqual(agent.get_action("explore", None, None, scan_with_obstacle(0.0), ANGLES, False, None), (-0.2, 0.5))
+
+    def test_obstacle_behind_or_beside_is_ignored(self):
+        for bearing in (np.pi, np.pi / 2, -np.pi / 2):
+            agent = make_agent()
+            throttle, _ = agent.get_action("explore", None, None, scan_with_obstacle(bearing), ANGLES, False, None)
+            self.assertGreater(throttle, 0.0)
+
+def frame(t, box_left=None):
+    # Camera frame at time t, with a yellow box at box_left if given
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    if box_left is not None:
+        image[45:75, box_left:box_left + 30] = (0, 220, 255)
+    return Frame(image, timestamp=t)
+
+class TestSteeringChain(unittest.TestCase):
+
+    def test_vfh_steering_is_smoothed(self):
+        agent = make_agent()
+        # Open space, then something 1 m ahead that the VFH turns hard away from
+        open_space = np.full(360, 3.0)
+        blocked = scan_with_obstacle(0.0, distance=1.0)
+        _, first = agent.get_action("explore", frame(0.0), None, open_space, ANGLES, False, None, timestamps={"lidar": 0.0})
+        _, second = agent.get_action("explore", frame(0.05), None, blocked, ANGLES, False, None, timestamps={"lidar": 0.05})
+        self.assertEqual(first, 0.0)
+        self.assertEqual(abs(agent.avoider_lidar.get_steering_direction(*agent.costmap.as_scan())), 0.5)
+        # The limiter allows rate * dt = 0.2 in 50 ms
+        self.assertGreater(abs(second), 0.0)
+        self.assertLessEqual(abs(second), 0.2 + 1e-9)
+
+    def test_pid_restarts_after_the_target_was_lost(self):
+        agent = make_agent()
+        agent.tracking_pid.ki = 0.01
+        scan = np.full(360, 3.0)
+        t = 0.0
+        for _ in range(5):
+            agent.get_action("track", frame(t, box_left=20), None, scan, ANGLES, False, None, timestamps={"lidar": t})
+            t += 0.1
+        self.assertGreater(agent.tracking_pid.integral, 10.0)
+        # One tick without the box drops the agent to searching
+        agent.get_action("track", frame(t, box_left=None), None, scan, ANGLES, False, None, timestamps={"lidar": t})
+        self.assertEqual(agent.state, "searching")
+        t += 0.1
+        agent.get_action("track", frame(t, box_left=20), None, scan, ANGLES, False, None, timestamps={"lidar": t})
+        self.assertEqual(agent.state, "tracking")
+        # A fresh integral: one sample of error over the default sample time
+        self.assertAlmostEqual(agent.tracking_pid.integral, agent.steering_error * agent.tracking_pid.sample_time)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.birds_eye import BirdsEyeView
+from src.image_processing_utils import ImageProcessing, LaneDetector
+
+HEIGHT = 0.2
+PITCH = np.arctan2(HEIGHT, 1.0)  # Optical axis hits the floor 1 m ahead
+
+def camera(**kwargs):
+    return BirdsEyeView.from_camera((640, 480), np.radians(90), HEIGHT, PITCH, **kwargs)
+
+def lane_image(view, lateral):
+    # Camera image of a yellow line on the floor at lateral(forward) metres to the left
+    forward = np.linspace(0.3, 3.0, 200)
+    points = view.project(np.column_stack((forward, lateral(forward)))).astype(np.int32)
+    image = np.full((480, 640, 3), 90, dtype=np.uint8)
+    cv2.polylines(image, [points], False, (0, 220, 230), 8)
+    return image
+
+class TestBirdsEyeView(unittest.TestCase):
+
+    def test_camera_projection(self):
+        view = camera()
+        pixels = view.project(np.array([[1.0, 0.0], [1.0, 0.2], [2.0, 0.0]]))
+        np.testing.assert_allclose(pixels[0], (320, 240), atol=1e-6)
+        # Left of the axis is left in the image, further away is higher up
+        self.assertLess(pixels[1, 0], 320)
+        self.assertLess(pixels[2, 1], 240)
+
+    def test_points_calibration_matches_camera(self):
+        view = camera()
+        ground = np.array([[0.5, -0.3], [0.5, 0.3], [1.5, -0.3], [1.5, 0.3]])
+        calibrated = BirdsEyeView.from_points(view.project(ground), ground)
+        query = np.array([[0.8, 0.1], [1.2, -0.25]])
+        np.testing.assert_allclose(calibrated.project(query), view.project(query), atol=1e-3)
+
+    def test_warp_reads_only_the_roi_into_one_buffer(self):
+        view = camera(forward_range=(0.5, 1.5), lateral_range=(-0.4, 0.4), resolution=0.01)
+        image = lane_image(view, lambda forward: np.full_like(forward, 0.1))
+        warped = view.warp(image)
+        self.assertEqual(warped.shape, (100, 80, 3))
+        top, bottom = view.rows
+        self.assertGreater(top, 0)
+        self.assertLess(bottom, 480)
+        self.assertIs(view.warp(image), warped)
+
+    def test_lane_offset_in_metres(self):
+        view = camera()
+        lateral = lambda forward: 0.1 + 0.05 * forward ** 2
+        lines, _ = ImageProcessing.find_lane_lines(lane_image(view, lateral), detector=LaneDetector(), birds_eye=view)
+        self.assertEqual(len(lines), 1)
+        for forward in (0.5, 1.2):
+            self.assertAlmostEqual(view.lateral_at(lines[0], forward), lateral(forward), delta=0.01)
+
+    def test_config(self):
+        view = BirdsEyeView.from_config({'image_size': [640, 480], 'horizontal_fov': 90, 'height': HEIGHT,
+                                         'pitch': np.degrees(PITCH), 'forward_range': [0.5, 1.0], 'resolution': 0.01})
+        self.assertEqual(view.shape, (50, 100))
+        np.testing.assert_allclose(view.project(np.array([[1.0, 0.0]]))[0], (320, 240), atol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
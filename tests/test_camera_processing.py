@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.camera_processing import ColorTracker, FaceDetector, FaceTracker
+from src.perception_executor import PerceptionExecutor
+from src.agent import Agent
+
+RED, BLUE = (0, 0, 220), (220, 60, 0)
+ANGLES = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+
+def boxes_image(*boxes):
+    # (color, top, left, size) boxes on black
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    for color, top, left, size in boxes:
+        image[top:top + size, left:left + size] = color
+    return image
+
+class TestColorTracker(unittest.TestCase):
+
+    def test_lut_matches_in_range(self):
+        tracker = ColorTracker(160, 120)
+        image = np.random.default_rng(0).integers(0, 256, (60, 80, 3), dtype=np.uint8)
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        for color, ranges in tracker.COLOR_RANGES.items():
+            expected = np.zeros(hsv.shape[:2], dtype=bool)
+            for lower, upper in ranges:
+                expected |= cv2.inRange(hsv, lower, upper) > 0
+            np.testing.assert_array_equal(tracker.color_mask(image, color) > 0, expected)
+
+    def test_multi_color_search(self):
+        tracker = ColorTracker(160, 120)
+        image = boxes_image((RED, 10, 10, 30), (BLUE, 60, 100, 40))
+        objects = tracker.find_objects(image, ["red", "blue", "green", "purple"])
+        self.assertEqual(objects["red"], ((24, 24), 900.0))
+        self.assertEqual(objects["blue"], ((119, 79), 1600.0))
+        self.assertEqual(objects["green"], (None, 0))
+        self.assertEqual(objects["purple"], (None, 0))
+        color, center, area = tracker.find_largest_object(image, ["red", "blue"])
+        self.assertEqual((color, center, area), ("blue", (119, 79), 1600.0))
+        self.assertEqual(tracker.find_largest_object(image, ["green"]), (None, None, 0))
+
+class CountingFaceDetector(FaceDetector):
+    # Stands in for the Haar cascade: reports the bounding box of the bright pixels
+    def __init__(self):
+        self.calls = []
+
+    def detect(self, gray, min_size=(60, 60)):
+        self.calls.append(gray.shape)
+        rows, columns = np.nonzero(gray > 20)
+        if len(rows) == 0:
+            return None
+        return (columns.min(), rows.min(), columns.max() - columns.min() + 1, rows.max() - rows.min() + 1)
+
+def face_image(left, top=60, size=64):
+    # A textured square on black, so template matching has something to lock on to
+    image = np.zeros((240, 320, 3), dtype=np.uint8)
+    texture = np.random.default_rng(0).integers(60, 256, (size // 8, size // 8), dtype=np.uint8)
+    image[top:top + size, left:left + size] = np.kron(texture, np.ones((8, 8), dtype=np.uint8))[:, :, None]
+    return image
+
+class TestFaceTracker(unittest.TestCase):
+
+    def test_cascade_runs_every_detect_every_frames(self):
+        detector = CountingFaceDetector()
+        tracker = FaceTracker(detector, detect_every=5)
+        sources = []
+        for tick in range(12):
+            bbox, source = tracker.update(face_image(40 + 4 * tick))
+            sources.append(source)
+            self.assertEqual(tracker.last_source, source)
+            self.assertLessEqual(abs(bbox[0] - (40 + 4 * tick)), 2)
+            self.assertLessEqual(abs(bbox[1] - 60), 2)
+        self.assertEqual(sources, (["detect"] + ["track"] * 4) * 2 + ["detect", "track"])
+        self.assertEqual(len(detector.calls), 3)
+        # Detection runs on the half-resolution pyramid level
+        self.assertEqual(detector.calls[0], (120, 160))
+
+    def test_lost_track_falls_back_to_the_cascade(self):
+        detector = CountingFaceDetector()
+        tracker = FaceTracker(detector, detect_every=15)
+        self.assertEqual(tracker.update(face_image(40))[1], "detect")
+        self.assertEqual(tracker.update(face_image(44))[1], "track")
+        self.assertEqual(tracker.update(np.zeros((240, 320, 3), dtype=np.uint8)), (None, None))
+        self.assertEqual(len(detector.calls), 2)
+        bbox, source = tracker.update(face_image(200))
+        self.assertEqual(source, "detect")
+        self.assertLessEqual(abs(bbox[0] - 200), 2)
+
+    def test_detection_region(self):
+        detector = CountingFaceDetector()
+        tracker = FaceTracker(detector, region=(0, 240, 160, 320))
+        self.assertEqual(tracker.update(face_image(40)), (None, None))
+        bbox, source = tracker.update(face_image(200))
+        self.assertEqual(source, "detect")
+        self.assertEqual(detector.calls, [(120, 80), (120, 80)])
+        self.assertLessEqual(abs(bbox[0] - 200), 2)
+
+class TestSearch(unittest.TestCase):
+
+    def test_search_finds_any_known_color(self):
+        agent = Agent(160, 120, [[0] * 10 for _ in range(10)])
+        self.assertEqual(agent.tracker.current_color_to_track, "yellow")
+        image = boxes_image((RED, 10, 10, 20), (BLUE, 60, 100, 40))
+        agent.get_action("search", image, None, np.full(360, 2.0), ANGLES, False, None)
+        self.assertEqual(agent.state, "tracking")
+        self.assertEqual(agent.tracker.current_color_to_track, "blue")
+        agent.get_action("track", image, None, np.full(360, 2.0), ANGLES, False, None)
+        self.assertEqual(agent.state, "tracking")
+        self.assertEqual(agent.steering_error, 80 - 119)
+
+class TestSearchWithPerceptionWorkers(unittest.TestCase):
+
+    def test_found_color_stays_tracked(self):
+        perception = PerceptionExecutor(160, 120, num_workers=1, detectors=("color",))
+        try:
+            agent = Agent(160, 120, [[0] * 10 for _ in range(10)], perception=perception)
+            agent.search_colors = ["red", "blue"]
+            image = boxes_image((RED, 40, 60, 30))
+            for tick in range(10):
+                command = "search" if tick == 0 else "track"
+                agent.get_action(command, image, None, np.full(360, 2.0), ANGLES, False, None)
+                self.assertEqual(agent.state, "tracking")
+                self.assertEqual(agent.tracker.current_color_to_track, "red")
+                # Wait for this frame's result so every tick sees the workers' answer
+                deadline = time.time() + 10.0
+                while perception.latest.get("color", (0,))[0] < agent.frame_count and time.time() < deadline:
+                    perception.poll()
+                    time.sleep(0.005)
+            self.assertEqual(perception.latest["color"][1][0], (74, 54))
+        finally:
+            perception.close()
+
+    def test_face_tracking_stays_in_the_agent(self):
+        with self.assertRaises(ValueError):
+            PerceptionExecutor(320, 240, detectors=("color", "face"))
+        perception = PerceptionExecutor(320, 240, num_workers=1, detectors=("color",))
+        try:
+            agent = Agent(320, 240, [[0] * 10 for _ in range(10)], perception=perception)
+            detector = CountingFaceDetector()
+            agent.face_tracker = FaceTracker(detector, detect_every=5)
+            sources = []
+            for tick in range(6):
+                agent.get_action("face_track", face_image(40 + 4 * tick), None, np.full(360, 2.0), ANGLES, False, None)
+                sources.append(agent.face_tracker.last_source)
+            self.assertEqual(sources, ["detect"] + ["track"] * 4 + ["detect"])
+            self.assertEqual(len(detector.calls), 2)
+        finally:
+            perception.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from onboard.src.controllers import PID, LowPassFilter, RateLimiter
+
+def trace(count=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(0, 1, count)), np.cumsum(rng.uniform(0.005, 0.02, count))
+
+def stepped(controller, values, timestamps):
+    controller.reset()
+    return np.array([controller.update(value, timestamp) for value, timestamp in zip(values, timestamps)])
+
+class TestControllers(unittest.TestCase):
+
+    def test_batch_matches_updates(self):
+        values, timestamps = trace()
+        for controller in (PID(1.0, 2.0, 0.05, output_limit=3.0, integral_limit=0.5), PID(0.3, 0.5, 0.01),
+                           LowPassFilter(25.0), RateLimiter(4.0)):
+            expected = stepped(controller, values, timestamps)
+            controller.reset()
+            np.testing.assert_allclose(controller.run(values, timestamps), expected, atol=1e-9)
+            # Without timestamps every sample is sample_time apart
+            np.testing.assert_allclose(controller.run(values), stepped(controller, values, [None] * len(values)), atol=1e-9)
+
+    def test_batch_leaves_state_alone(self):
+        pid = PID(1.0, 1.0)
+        pid.update(2.0, 0.0)
+        pid.run(np.ones(10))
+        self.assertEqual(pid.previous_error, 2.0)
+
+    def test_integral_anti_windup(self):
+        pid = PID(kp=0.0, ki=1.0, integral_limit=0.1, sample_time=0.1)
+        output = pid.run(np.concatenate((np.ones(50), -np.ones(3))))
+        self.assertAlmostEqual(output[49], 0.1)
+        # Unwinds right away instead of after 50 samples
+        self.assertAlmostEqual(output[-1], -0.1)
+
+    def test_candidate_gains_in_one_call(self):
+        values, timestamps = trace()
+        gains = np.linspace(0.0, 1.0, 7)
+        outputs = PID(kp=gains[:, None], ki=0.2, integral_limit=1.0).run(values, timestamps)
+        self.assertEqual(outputs.shape, (7, len(values)))
+        np.testing.assert_allclose(outputs[3], PID(kp=gains[3], ki=0.2, integral_limit=1.0).run(values, timestamps))
+        rates = np.array([1.0, 4.0])[:, None]
+        limited = RateLimiter(rates).run(values, timestamps)
+        np.testing.assert_allclose(limited[1], RateLimiter(4.0).run(values, timestamps))
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(rate=1.0, sample_time=0.1)
+        output = limiter.run(np.array([0.0, 1.0, 1.0, -1.0]))
+        np.testing.assert_allclose(output, [0.0, 0.1, 0.2, 0.1])
+
+    def test_low_pass_step_response(self):
+        output = LowPassFilter(cutoff=10.0, sample_time=0.01).run(np.concatenate(([0.0], np.ones(200))))
+        # One time constant (0.1 s) after the step it is about 63% of the way there
+        self.assertAlmostEqual(output[10], 1 - np.exp(-1), delta=0.03)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+from onboard.src.costmap import PolarCostmap
+
+class TestPolarCostmap(unittest.TestCase):
+
+    def setUp(self):
+        self.angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+
+    def test_sources_are_fused(self):
+        costmap = PolarCostmap(num_bins=36)
+        costmap.update("lidar", np.full(360, 3.0), self.angles, timestamp=1.0)
+        costmap.update("depth", np.array([1.0, 2.0]), np.array([0.0, 0.5]), timestamp=1.0)
+        nearest = costmap.nearest()
+        self.assertAlmostEqual(nearest[0], 1.0)
+        self.assertAlmostEqual(nearest[18], 3.0)
+        self.assertTrue(costmap.is_obstacle_present(1.5, half_angle=0.2))
+        self.assertFalse(costmap.is_obstacle_present(1.5, center=np.pi, half_angle=0.2))
+
+    def test_old_readings_expire(self):
+        costmap = PolarCostmap(num_bins=36, max_age=0.5)
+        costmap.update("depth", np.array([1.0]), np.array([0.0]), timestamp=1.0)
+        costmap.update("lidar", np.full(360, 3.0), self.angles, timestamp=1.2)
+        self.assertLess(costmap.nearest()[0], 3.0)
+        self.assertGreater(costmap.cost()[0], 0.0)
+        # The lidar keeps updating, the depth reading goes stale
+        costmap.update("lidar", np.full(360, 3.0), self.angles, timestamp=2.0)
+        self.assertAlmostEqual(costmap.nearest()[0], 3.0)
+
+    def test_old_readings_fade(self):
+        costmap = PolarCostmap(num_bins=36, decay_time=0.3, max_age=1.0)
+        costmap.update("depth", np.array([0.3]), np.array([0.0]), timestamp=1.0)
+        self.assertAlmostEqual(costmap.nearest()[0], 0.3)
+        self.assertTrue(costmap.is_obstacle_present(0.4, half_angle=0.2))
+        # A reading 0.2 s old counts as farther away, for the obstacle check and the VFH alike
+        costmap.update("lidar", np.full(360, 3.0), self.angles, timestamp=1.2)
+        self.assertAlmostEqual(costmap.nearest()[0], 0.3 * np.exp(0.2 / 0.3))
+        self.assertFalse(costmap.is_obstacle_present(0.4, half_angle=0.2))
+        distances, _ = costmap.as_scan()
+        self.assertAlmostEqual(distances[0], 0.3 * np.exp(0.2 / 0.3))
+        self.assertAlmostEqual(costmap.cost()[0], (5.0 - 0.3) / 5.0 * np.exp(-0.2 / 0.3))
+
+    def test_a_sensor_only_replaces_bins_it_covers(self):
+        costmap = PolarCostmap(num_bins=36)
+        costmap.update("lidar", np.full(360, 3.0), self.angles, timestamp=1.0)
+        costmap.update("lidar", np.zeros(360), self.angles, timestamp=1.1)
+        self.assertTrue(np.all(np.isinf(costmap.nearest())))
+        distances, angles = costmap.as_scan()
+        self.assertTrue(np.all(distances == 0))
+        self.assertEqual(len(angles), 36)
+
+    def test_same_reading_is_applied_once_and_rotation_shifts_bins(self):
+        costmap = PolarCostmap(num_bins=36)
+        self.assertTrue(costmap.update("depth", np.array([1.0]), np.array([0.0]), timestamp=1.0))
+        self.assertFalse(costmap.update("depth", np.array([1.0]), np.array([0.0]), timestamp=1.0))
+        # Turning left by one bin moves the obstacle one bin to the right
+        costmap.rotate(costmap.bin_width)
+        self.assertAlmostEqual(costmap.nearest()[35], 1.0)
+
+    def test_small_rotations_accumulate(self):
+        costmap = PolarCostmap(num_bins=36)
+        costmap.update("lidar", np.array([1.0]), np.array([0.0]), timestamp=1.0)
+        # A slow steady turn: a tenth of a bin per tick for 24 ticks is 2.4 bins
+        for _ in range(24):
+            costmap.rotate(costmap.bin_width / 10)
+        self.assertEqual(int(np.argmin(costmap.nearest())), 34)
+        # Turning back the same way ends where it started
+        for _ in range(24):
+            costmap.rotate(-costmap.bin_width / 10)
+        self.assertEqual(int(np.argmin(costmap.nearest())), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+import numpy as np
+import cv2
+from onboard.src.frame import Frame, as_frame, as_ndarray
+
+def gradient_image(height=60, width=80):
+    rows, columns = np.mgrid[0:height, 0:width]
+    return np.dstack([columns * 3, rows * 4, (rows + columns) * 2]).astype(np.uint8)
+
+class TestFrameEncoding(unittest.TestCase):
+
+    def test_jpeg_is_encoded_once(self):
+        frame = Frame(gradient_image(), timestamp=1.0, frame_id=7)
+        with mock.patch.object(cv2, "imencode", wraps=cv2.imencode) as imencode:
+            encoded = frame.to_base64()
+            self.assertIs(frame.to_base64(), encoded)
+            self.assertIs(frame.to_jpeg(), frame.to_jpeg())
+        self.assertEqual(imencode.call_count, 1)
+        self.assertEqual((frame.timestamp, frame.frame_id), (1.0, 7))
+
+    def test_base64_round_trip(self):
+        image = gradient_image()
+        encoded = Frame(image, jpeg_quality=95).to_base64()
+        decoded = as_ndarray(encoded)
+        self.assertEqual(decoded.shape, image.shape)
+        self.assertLess(np.abs(decoded.astype(int) - image).mean(), 3.0)
+        self.assertEqual(as_frame(encoded).shape, image.shape)
+
+    def test_raw_inputs_pass_through(self):
+        image = gradient_image()
+        frame = as_frame(image)
+        self.assertIs(frame.image, image)
+        self.assertIs(as_frame(frame), frame)
+        self.assertIs(as_ndarray(frame), image)
+        self.assertIs(as_ndarray(image), image)
+        self.assertIsNone(as_frame(None))
+        self.assertIsNone(as_ndarray(None))
+
+class TestFrameProducts(unittest.TestCase):
+
+    def test_conversions_are_computed_once(self):
+        frame = Frame(gradient_image())
+        with mock.patch.object(cv2, "cvtColor", wraps=cv2.cvtColor) as cvt_color:
+            hsv = frame.hsv()
+            self.assertIs(frame.hsv(), hsv)
+            self.assertIs(frame.gray(), frame.gray())
+        self.assertEqual(cvt_color.call_count, 2)
+        np.testing.assert_array_equal(hsv, cv2.cvtColor(frame.image, cv2.COLOR_BGR2HSV))
+
+    def test_crop_of_converted_frame_is_a_view(self):
+        frame = Frame(gradient_image())
+        roi = frame.band(0.5, 1.0)
+        self.assertEqual(roi, (30, 60, 0, 80))
+        # Before the full frame is converted only the crop is converted, and cached
+        band = frame.hsv(roi)
+        self.assertIs(frame.hsv(roi), band)
+        np.testing.assert_array_equal(band, cv2.cvtColor(frame.image[30:60], cv2.COLOR_BGR2HSV))
+        full = frame.gray()
+        crop = frame.gray((10, 20, 5, 50))
+        self.assertTrue(np.shares_memory(crop, full))
+        np.testing.assert_array_equal(crop, full[10:20, 5:50])
+
+    def test_pyramid_levels_are_cached(self):
+        frame = Frame(gradient_image())
+        self.assertIs(frame.pyramid(0), frame.image)
+        with mock.patch.object(cv2, "pyrDown", wraps=cv2.pyrDown) as pyr_down:
+            second = frame.pyramid(2)
+            self.assertIs(frame.pyramid(2), second)
+            frame.pyramid(1)
+        self.assertEqual(pyr_down.call_count, 2)
+        self.assertEqual(second.shape, (15, 20, 3))
+        computed = []
+        self.assertEqual(frame.product("edges", lambda: computed.append(1) or 42), 42)
+        self.assertEqual(frame.product("edges", lambda: computed.append(1) or 43), 42)
+        self.assertEqual(computed, [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import unittest
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.image_processing_utils import ImageProcessing, LaneDetector, LaneTracker
+from src.agent import Agent
+
+def lane_band(height=100, width=640, thickness=12, shift=0.0):
+    # Binary band with one curved lane line; returns it and the line's column per row
+    rows = np.arange(height)
+    columns = 300 + shift + 0.5 * (height - rows) + 0.01 * (height - rows) ** 2
+    binary = np.zeros((height, width), dtype=np.uint8)
+    for row, column in zip(rows, columns.astype(int)):
+        binary[row, column - thickness // 2:column + thickness // 2] = 255
+    return binary, columns
+
+class TestLaneDetector(unittest.TestCase):
+
+    def test_fits_curved_line(self):
+        binary, columns = lane_band()
+        lines = LaneDetector().search(binary)
+        self.assertEqual(len(lines), 1)
+        self.assertGreater(lines[0].confidence, 0.9)
+        np.testing.assert_allclose(lines[0].x_at(np.arange(100)), columns, atol=2.0)
+
+    def test_blob_does_not_replace_line(self):
+        binary, columns = lane_band()
+        # A blob in the lower band that outweighs the line in the column histogram
+        cv2.circle(binary, (560, 80), 20, 255, -1)
+        lines = LaneDetector().search(binary)
+        self.assertEqual(len(lines), 1)
+        self.assertAlmostEqual(lines[0].x_at(99), columns[99], delta=2.0)
+
+    def test_two_lines(self):
+        binary, _ = lane_band()
+        binary[:, 100:110] = 255
+        lines = LaneDetector(max_lines=2).search(binary)
+        self.assertEqual(len(lines), 2)
+        bottoms = sorted(line.x_at(99) for line in lines)
+        self.assertAlmostEqual(bottoms[0], 104.5, delta=1.0)
+
+    def test_empty_band(self):
+        self.assertEqual(LaneDetector().search(np.zeros((100, 640), dtype=np.uint8)), [])
+
+    def test_no_frame(self):
+        self.assertEqual(ImageProcessing.find_lane_lines(None), ([], (0, 0)))
+        # A replay tick with a Lidar scan but no camera frame stops the car
+        agent = Agent(640, 480, [[0] * 10 for _ in range(10)])
+        angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+        self.assertEqual(agent.get_action("lane_follow", None, None, np.full(360, 2.0), angles, False, None), (0.0, 0.0))
+
+class TestLaneTracker(unittest.TestCase):
+
+    def test_tracks_a_moving_line_without_full_searches(self):
+        tracker = LaneTracker(smoothing=1.0)
+        for k in range(20):
+            binary, columns = lane_band(shift=2.0 * k)
+            lines = tracker.search(binary)
+            self.assertEqual(len(lines), 1)
+            self.assertAlmostEqual(lines[0].x_at(99), columns[99], delta=2.0)
+        self.assertEqual(tracker.full_searches, 1)
+        self.assertEqual(tracker.tracked_frames, 19)
+
+    def test_ignores_blob_outside_track(self):
+        tracker = LaneTracker(smoothing=1.0)
+        binary, columns = lane_band()
+        tracker.search(binary)
+        cv2.circle(binary, (560, 80), 20, 255, -1)
+        lines = tracker.search(binary)
+        self.assertEqual(tracker.full_searches, 1)
+        self.assertAlmostEqual(lines[0].x_at(99), columns[99], delta=2.0)
+
+    def test_smoothing(self):
+        tracker = LaneTracker(smoothing=0.5)
+        tracker.search(lane_band()[0])
+        _, columns = lane_band(shift=8.0)
+        lines = tracker.search(lane_band(shift=8.0)[0])
+        # Halfway between the previous fit and the new one
+        self.assertAlmostEqual(lines[0].x_at(99), columns[99] - 4.0, delta=2.0)
+
+    def test_full_search_after_loss(self):
+        tracker = LaneTracker()
+        tracker.search(lane_band()[0])
+        self.assertEqual(tracker.search(np.zeros((100, 640), dtype=np.uint8)), [])
+        binary, columns = lane_band(shift=-150.0)
+        lines = tracker.search(binary)
+        self.assertEqual(tracker.full_searches, 3)
+        self.assertAlmostEqual(lines[0].x_at(99), columns[99], delta=2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from onboard.src.lidar_scan import ScanPreprocessor
+
+class TestScanPreprocessor(unittest.TestCase):
+
+    def setUp(self):
+        self.angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+
+    def test_invalid_returns_and_spikes_are_dropped(self):
+        preprocessor = ScanPreprocessor()
+        distances = np.full(360, 2.0)
+        distances[10] = 0.0
+        distances[20] = np.nan
+        distances[100] = 0.3  # Isolated spike
+        scan = preprocessor.process(distances, self.angles, timestamp=1.0)
+        self.assertEqual(scan.distances[10], 0.0)
+        self.assertEqual(scan.distances[20], 0.0)
+        self.assertEqual(scan.distances[100], 0.0)
+        self.assertEqual(int(scan.valid.sum()), 357)
+        self.assertEqual(scan.points.shape, (357, 2))
+        np.testing.assert_allclose(np.hypot(scan.points[:, 0], scan.points[:, 1]), 2.0)
+
+    def test_real_edges_are_kept(self):
+        preprocessor = ScanPreprocessor()
+        distances = np.full(360, 2.0)
+        distances[100:120] = 0.5  # An object, not a spike
+        scan = preprocessor.process(distances, self.angles, timestamp=1.0)
+        self.assertTrue(np.all(scan.distances[100:120] == 0.5))
+
+    def test_geometry_and_scans_are_reused(self):
+        preprocessor = ScanPreprocessor()
+        first = preprocessor.process(np.full(360, 2.0), self.angles, timestamp=1.0)
+        self.assertIs(preprocessor.process(np.full(360, 2.0), self.angles, timestamp=1.0), first)
+        second = preprocessor.process(np.full(360, 3.0), self.angles.copy(), timestamp=2.0)
+        self.assertIs(second.geometry, first.geometry)
+        ranges = second.sector_ranges(36)
+        self.assertEqual(ranges.shape, (36,))
+        np.testing.assert_allclose(ranges, 3.0)
+        self.assertEqual(len(second.to_telemetry()['distances']), 360)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from onboard.src.mapping import OccupancyGrid
+
+class TestOccupancyGrid(unittest.TestCase):
+
+    def test_wall_is_occupied_and_space_before_it_is_free(self):
+        grid = OccupancyGrid(shape=(100, 100), resolution=0.1, origin=(-5.0, -5.0))
+        angles = np.linspace(-0.3, 0.3, 61)
+        # Wall 2 m ahead of the sensor along +x
+        distances = 2.0 / np.cos(angles)
+        for _ in range(3):
+            grid.insert_scan(distances, angles)
+
+        wall = grid.world_to_cell(2.05, 0.0)
+        before = grid.world_to_cell(1.0, 0.0)
+        self.assertEqual(grid.occupied[wall], 1)
+        self.assertEqual(grid.occupied[before], 0)
+        self.assertLess(grid.log_odds[before], 0)
+        self.assertGreater(grid.version, 0)
+
+    def test_only_touched_cells_change(self):
+        grid = OccupancyGrid(shape=(100, 100), resolution=0.1, origin=(-5.0, -5.0))
+        grid.insert_scan(np.array([1.0]), np.array([0.0]))
+        self.assertLessEqual(np.count_nonzero(grid.log_odds), 12)
+        behind = grid.world_to_cell(-1.0, 0.0)
+        self.assertEqual(grid.log_odds[behind], 0)
+
+    def test_pose_moves_the_scan(self):
+        grid = OccupancyGrid(shape=(100, 100), resolution=0.1, origin=(-5.0, -5.0))
+        for _ in range(3):
+            grid.insert_scan(np.array([1.0]), np.array([0.0]), pose=(1.0, 1.0, np.pi / 2))
+        self.assertEqual(grid.occupied[grid.world_to_cell(1.0, 2.05)], 1)
+
+    def test_invalid_returns_are_ignored(self):
+        grid = OccupancyGrid(shape=(50, 50), resolution=0.1, origin=(-2.5, -2.5))
+        grid.insert_scan(np.zeros(10), np.linspace(0, 1, 10))
+        self.assertEqual(np.count_nonzero(grid.log_odds), 0)
+
+if __name__ == '__main__':
+    unittest.main()
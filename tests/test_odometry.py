@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from onboard.src.odometry import NearestPointGrid, ScanOdometry
+
+# A 8 m x 6 m room with a 1 m box in it
+WALLS = np.array([((-3, -2), (5, -2)), ((5, -2), (5, 4)), ((5, 4), (-3, 4)), ((-3, 4), (-3, -2)),
+                  ((1, 0.5), (2, 0.5)), ((2, 0.5), (2, 1.5)), ((2, 1.5), (1, 1.5)), ((1, 1.5), (1, 0.5))], dtype=float)
+ANGLES = np.linspace(0, 2 * np.pi, 720, endpoint=False)
+
+def room_scan(pose, noise=0.0, rng=None):
+    # Ray cast the room from pose, returning the scan as sensor-frame points
+    x, y, heading = pose
+    directions = np.column_stack((np.cos(ANGLES + heading), np.sin(ANGLES + heading)))
+    start, edge = WALLS[:, 0], WALLS[:, 1] - WALLS[:, 0]
+    offset = start[None] - np.array([x, y])
+    cross = lambda a, b: a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+    denominator = cross(directions[:, None], edge[None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = cross(offset, edge[None]) / denominator
+        u = cross(offset, directions[:, None]) / denominator
+    hit = (t > 0) & (u >= 0) & (u <= 1) & np.isfinite(t)
+    distances = np.where(hit, t, np.inf).min(axis=1)
+    if rng is not None:
+        distances = distances + rng.normal(0, noise, distances.shape)
+    return np.column_stack((distances * np.cos(ANGLES), distances * np.sin(ANGLES)))
+
+class TestNearestPointGrid(unittest.TestCase):
+
+    def test_query_matches_brute_force(self):
+        points = room_scan((0.0, 0.0, 0.0))
+        grid = NearestPointGrid(points, resolution=0.05)
+        queries = np.random.default_rng(0).uniform(-2.5, 4.5, (200, 2))
+        index = grid.query(queries)
+        distance = np.hypot(*(queries - points[index]).T)
+        nearest = np.min(np.hypot(queries[:, None, 0] - points[None, :, 0], queries[:, None, 1] - points[None, :, 1]), axis=1)
+        # Cell-sized lookup error at most
+        self.assertTrue(np.all(distance <= nearest + 2 * 0.05))
+        self.assertTrue(np.all(grid.query(np.array([[100.0, 100.0]])) == -1))
+
+class TestScanOdometry(unittest.TestCase):
+
+    def test_match_recovers_motion(self):
+        odometry = ScanOdometry()
+        odometry.update(room_scan((0.0, 0.0, 0.0)), 0.0)
+        pose = odometry.update(room_scan((0.05, 0.02, 0.03)), 0.1)
+        self.assertTrue(odometry.matched)
+        np.testing.assert_allclose(pose, (0.05, 0.02, 0.03), atol=0.01)
+
+    def test_tracks_a_drive_around_the_room(self):
+        rng = np.random.default_rng(1)
+        odometry = ScanOdometry()
+        odometry.reset((-2.5, -1.5, 0.0))
+        pose = np.array([-2.5, -1.5, 0.0])
+        for k in range(150):
+            if k > 0:
+                pose = pose + (0.03 * np.cos(pose[2]), 0.03 * np.sin(pose[2]), 0.005 if k < 100 else -0.01)
+            estimate = odometry.update(room_scan(pose, noise=0.01, rng=rng), k * 0.1)
+            self.assertTrue(odometry.matched)
+            self.assertEqual(odometry.timestamp, k * 0.1)
+        # 4.5 m driven; a few centimetres of drift at most
+        self.assertLess(np.hypot(estimate[0] - pose[0], estimate[1] - pose[1]), 0.1)
+        self.assertLess(abs(estimate[2] - pose[2]), 0.05)
+
+    def test_too_few_points_keeps_pose(self):
+        odometry = ScanOdometry()
+        odometry.update(room_scan((0.0, 0.0, 0.0)), 0.0)
+        pose = odometry.update(np.zeros((5, 2)), 0.1)
+        self.assertFalse(odometry.matched)
+        self.assertEqual(pose, (0.0, 0.0, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.perception_executor import SharedArrayRing, PerceptionExecutor
+
+def red_box_image(left=60):
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    image[40:70, left:left + 30] = (0, 0, 220)
+    return image
+
+def wait_for(executor, detector, frame_id, timeout=10.0):
+    # Polls until the workers have answered for frame_id
+    deadline = time.time() + timeout
+    while executor.latest.get(detector, (0,))[0] < frame_id and time.time() < deadline:
+        executor.poll()
+        time.sleep(0.005)
+    return executor.latest.get(detector)
+
+class TestSharedArrayRing(unittest.TestCase):
+
+    def test_slots_are_not_reused_while_pending(self):
+        ring = SharedArrayRing((4, 4), np.uint8, 2)
+        try:
+            first = ring.put(np.full((4, 4), 1, dtype=np.uint8))
+            ring.pending[first] += 1
+            second = ring.put(np.full((4, 4), 2, dtype=np.uint8))
+            ring.pending[second] += 1
+            self.assertNotEqual(first, second)
+            self.assertIsNone(ring.put(np.full((4, 4), 3, dtype=np.uint8)))
+            ring.pending[first] -= 1
+            self.assertEqual(ring.put(np.full((4, 4), 3, dtype=np.uint8)), first)
+            self.assertEqual(ring.arrays[first][0, 0], 3)
+            self.assertEqual(ring.arrays[second][0, 0], 2)
+        finally:
+            ring.close()
+
+class TestPerceptionExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = PerceptionExecutor(160, 120, num_workers=2, detectors=("color", "depth"), color="red", num_slots=2)
+
+    def tearDown(self):
+        self.executor.close()
+
+    def test_results_come_back_and_release_slots(self):
+        depth = np.full((120, 160), 0.1, dtype=np.float32)
+        self.executor.submit(1, red_box_image(), depth)
+        frame_id, (center, area) = wait_for(self.executor, "color", 1)
+        self.assertEqual((frame_id, center), (1, (74, 54)))
+        self.assertEqual(wait_for(self.executor, "depth", 1), (1, True))
+        self.assertEqual(self.executor.rings["image"].pending, [0, 0])
+        self.assertEqual(self.executor.rings["depth"].pending, [0, 0])
+
+        # Every later frame still finds a free slot once the earlier ones are collected
+        for frame_id in range(2, 8):
+            self.executor.submit(frame_id, red_box_image(left=frame_id * 10))
+            wait_for(self.executor, "color", frame_id)
+        self.assertEqual(self.executor.dropped_frames, 0)
+        self.assertEqual(self.executor.latest["color"][1][0], (84, 54))
+
+    def test_repeated_frame_is_submitted_once(self):
+        image = red_box_image()
+        for _ in range(5):
+            self.executor.submit(1, image)
+        self.assertEqual((self.executor.submitted_frames, self.executor.repeated_frames), (1, 4))
+        wait_for(self.executor, "color", 1)
+        # A new tracked color sends the same frame again
+        self.executor.submit(1, image, color="blue")
+        self.assertEqual(self.executor.submitted_frames, 2)
+        frame_id, (center, area) = wait_for(self.executor, "color", 1)
+        self.assertEqual((center, area), (None, 0))
+
+    def test_old_results_are_dropped(self):
+        self.executor.submit(1, red_box_image())
+        wait_for(self.executor, "color", 1)
+        self.assertIn("color", self.executor.results(3))
+        self.assertNotIn("color", self.executor.results(4))
+        self.assertEqual(self.executor.stale_results, 1)
+
+if __name__ == '__main__':
+    unittest.main()
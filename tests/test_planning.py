@@ -0,0 +1,153 @@
+import unittest
+import numpy as np
+from onboard.src.planning import AStar, DStarLite, PlanningService
+
+class TestAStar(unittest.TestCase):
+
+    def test_nested_list_grid(self):
+        grid = [[0 for _ in range(10)] for _ in range(10)]
+        path = AStar(grid).find_path((0, 0), (9, 9))
+        self.assertEqual(path[0], (0, 0))
+        self.assertEqual(path[-1], (9, 9))
+        self.assertEqual(len(path), 19)
+
+    def test_routes_around_wall(self):
+        grid = np.zeros((20, 20), dtype=np.uint8)
+        grid[10, :19] = 1
+        path = AStar(grid).find_path((0, 0), (19, 0))
+        self.assertIn((10, 19), path)
+        for a, b in zip(path, path[1:]):
+            self.assertEqual(abs(a[0] - b[0]) + abs(a[1] - b[1]), 1)
+            self.assertEqual(grid[b], 0)
+
+    def test_eight_connectivity_moves_diagonally(self):
+        grid = np.zeros((10, 10), dtype=np.uint8)
+        path = AStar(grid, connectivity=8).find_path((0, 0), (9, 9))
+        self.assertEqual(len(path), 10)
+
+    def test_cell_costs_are_avoided(self):
+        grid = np.zeros((10, 10), dtype=np.uint8)
+        cost = np.ones((10, 10))
+        cost[1:9, 5] = 50.0
+        path = AStar(grid, cost=cost).find_path((5, 0), (5, 9))
+        self.assertTrue(all(cost[node] == 1.0 for node in path))
+
+    def test_unreachable_goal(self):
+        grid = np.zeros((10, 10), dtype=np.uint8)
+        grid[5, :] = 1
+        self.assertIsNone(AStar(grid).find_path((0, 0), (9, 9)))
+        self.assertIsNone(AStar(grid).find_path((0, 0), (5, 5)))
+        self.assertIsNone(AStar(grid).find_path((0, 0), (20, 20)))
+
+class TestDStarLite(unittest.TestCase):
+
+    def path_cost(self, path):
+        return sum(np.hypot(a[0] - b[0], a[1] - b[1]) for a, b in zip(path, path[1:]))
+
+    def test_matches_astar_as_the_map_changes(self):
+        rng = np.random.default_rng(3)
+        for connectivity in (4, 8):
+            grid = (rng.random((25, 25)) < 0.2).astype(np.uint8)
+            grid[0, 0] = grid[-1, -1] = 0
+            planner = DStarLite(grid, connectivity=connectivity)
+            start = (0, 0)
+            for _ in range(6):
+                path = planner.find_path(start, (24, 24))
+                expected = AStar(grid, connectivity=connectivity).find_path(start, (24, 24))
+                self.assertEqual(path is None, expected is None)
+                if path is not None:
+                    self.assertAlmostEqual(self.path_cost(path), self.path_cost(expected))
+                    self.assertTrue(all(grid[node] == 0 for node in path[1:]))
+                    start = path[min(2, len(path) - 1)]
+                for r, c in rng.integers(0, 25, size=(4, 2)):
+                    if (r, c) not in (start, (24, 24)):
+                        grid[r, c] ^= 1
+
+    def check_moving_start(self, next_start):
+        # The start moves somewhere next_start picks while the map stays the same
+        for seed in range(20):
+            rng = np.random.default_rng(seed)
+            for connectivity in (4, 8):
+                grid = (rng.random((20, 20)) < 0.25).astype(np.uint8)
+                free = [tuple(cell) for cell in np.argwhere(grid == 0)]
+                goal = free[rng.integers(len(free))]
+                start = free[rng.integers(len(free))]
+                planner = DStarLite(grid, connectivity=connectivity)
+                for _ in range(8):
+                    path = planner.find_path(start, goal)
+                    expected = AStar(grid, connectivity=connectivity).find_path(start, goal)
+                    self.assertEqual(path is None, expected is None)
+                    if path is not None:
+                        self.assertEqual((path[0], path[-1]), (start, goal))
+                        self.assertAlmostEqual(self.path_cost(path), self.path_cost(expected))
+                    start = next_start(grid, free, start, path, rng)
+
+    def test_start_drifts_off_the_path(self):
+        def drift(grid, free, start, path, rng):
+            # One cell aside, to a free neighbour that is not the path's next cell
+            neighbours = [(start[0] + dr, start[1] + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                          if 0 <= start[0] + dr < 20 and 0 <= start[1] + dc < 20 and grid[start[0] + dr, start[1] + dc] == 0]
+            off_path = [cell for cell in neighbours if not path or cell not in path[:2]]
+            choices = off_path or neighbours
+            return choices[rng.integers(len(choices))]
+        self.check_moving_start(drift)
+
+    def test_start_jumps(self):
+        self.check_moving_start(lambda grid, free, start, path, rng: free[rng.integers(len(free))])
+
+    def test_unchanged_map_needs_no_search(self):
+        grid = np.zeros((50, 50), dtype=np.uint8)
+        planner = DStarLite(grid)
+        first = planner.find_path((0, 0), (49, 49))
+        second = planner.find_path((0, 0), (49, 49))
+        self.assertEqual(planner.expanded, 0)
+        self.assertEqual(first, second)
+
+    def test_blocked_path_is_repaired(self):
+        grid = np.zeros((20, 20), dtype=np.uint8)
+        planner = DStarLite(grid)
+        planner.find_path((0, 10), (19, 10))
+        grid[10, :19] = 1
+        path = planner.find_path((0, 10), (19, 10))
+        self.assertIn((10, 19), path)
+        grid[10, :] = 1
+        self.assertIsNone(planner.find_path((0, 10), (19, 10)))
+
+class CountingPlanner:
+    def __init__(self):
+        self.calls = 0
+
+    def find_path(self, start, end):
+        self.calls += 1
+        return [start, end]
+
+class TestPlanningService(unittest.TestCase):
+
+    def test_reuses_plan_until_map_version_changes(self):
+        planner = CountingPlanner()
+        version = [0]
+        service = PlanningService(planner, grid_version=lambda: version[0])
+        first = service.find_path((0, 0), (5, 5))
+        self.assertIs(service.find_path((0, 0), (5, 5)), first)
+        self.assertEqual(planner.calls, 1)
+        version[0] += 1
+        service.find_path((0, 0), (5, 5))
+        self.assertEqual(planner.calls, 2)
+        self.assertEqual(service.stats()['hits'], 1)
+        self.assertEqual(service.stats()['misses'], 2)
+
+    def test_lru_is_bounded(self):
+        planner = CountingPlanner()
+        service = PlanningService(planner, max_entries=2)
+        service.find_path((0, 0), (1, 1))
+        service.find_path((0, 0), (2, 2))
+        service.find_path((0, 0), (1, 1))
+        service.find_path((0, 0), (3, 3))
+        self.assertEqual(service.stats()['cached_plans'], 2)
+        service.find_path((0, 0), (1, 1))
+        self.assertEqual(planner.calls, 3)
+        service.find_path((0, 0), (2, 2))
+        self.assertEqual(planner.calls, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.frame import Frame
+from src.recording import SensorRecorder, RecordingReader
+from src.replay_interface import ReplayHardwareInterface
+from src.sensor_threads import SensorSnapshot
+
+class TestRecording(unittest.TestCase):
+
+    def test_round_trip_and_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with SensorRecorder(directory, chunk_records=4) as recorder:
+                for i in range(10):
+                    t = float(i)
+                    image = np.full((6, 8, 3), i, dtype=np.uint8)
+                    scan_size = 5 + i # Lidar scans do not all have the same length
+                    snapshot = SensorSnapshot(
+                        frame=Frame(image, timestamp=t, frame_id=i + 1),
+                        depth_data=np.full((6, 8), i, dtype=np.float32),
+                        lidar_distances=np.full(scan_size, float(i)),
+                        lidar_angles=np.linspace(0, 1, scan_size),
+                        timestamps={'depth': t, 'lidar': t + 0.5},
+                    )
+                    recorder.record_snapshot(snapshot)
+                    recorder.record_snapshot(snapshot) # Repeated readings are only stored once
+                    recorder.record_command(t, 0.1 * i, -0.1 * i)
+
+            reader = RecordingReader(directory)
+            self.assertEqual(reader.count("image"), 10)
+            self.assertEqual(reader.value("image", 7)[0, 0, 0], 7)
+            self.assertEqual(reader.index_at("lidar", 3.9), 3)
+            distances, angles = reader.value("lidar", 3)
+            self.assertEqual(len(distances), 8)
+            self.assertTrue(np.all(distances == 3.0))
+
+            start, stop = reader.index_range("command", 2.0, 6.0)
+            commands = reader.array_slice("command", start, stop)
+            np.testing.assert_allclose(commands[:, 0], [0.2, 0.3, 0.4, 0.5, 0.6])
+
+            hardware = ReplayHardwareInterface(reader, speed=None)
+            frames = 0
+            while True:
+                snapshot = hardware.read_snapshot()
+                if hardware.finished:
+                    break
+                frames += 1
+            self.assertEqual(frames, 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.replay_interface import SensorRecording, ReplayHardwareInterface
+from src.agent import Agent
+
+def make_recording(num_frames=20):
+    recording = SensorRecording()
+    angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+    for i in range(num_frames):
+        t = i * 0.05
+        recording.add("image", t, np.zeros((48, 64, 3), dtype=np.uint8))
+        recording.add("lidar", t + 0.01, (np.full(360, 2.0), angles))
+        recording.add("gamepad", t, {'leftJoystickY': -0.5, 'rightJoystickX': 0.25})
+    return recording
+
+class TestReplayHardwareInterface(unittest.TestCase):
+
+    def test_stepped_replay_visits_every_frame(self):
+        hardware = ReplayHardwareInterface(make_recording(), speed=None)
+        frame_ids = []
+        while True:
+            snapshot = hardware.read_snapshot()
+            if hardware.finished:
+                break
+            frame_ids.append(snapshot.frame.frame_id)
+            hardware.send_command(0.1, 0.0)
+
+        self.assertEqual(frame_ids, list(range(1, 21)))
+        self.assertEqual(len(hardware.commands), 20)
+
+    def test_gamepad_reading_is_new_once(self):
+        hardware = ReplayHardwareInterface(make_recording(), speed=None)
+        self.assertTrue(hardware.read_snapshot().gamepad_new_read)
+        self.assertFalse(hardware.read_gamepad()[0])
+        self.assertFalse(hardware.read_gamepad()[0])
+        hardware.advance()
+        self.assertTrue(hardware.read_gamepad()[0])
+        self.assertFalse(hardware.read_gamepad()[0])
+
+    def test_agent_runs_on_replay(self):
+        hardware = ReplayHardwareInterface(make_recording(), speed=None)
+        camera_width, camera_height = hardware.camera_resolution()
+        agent = Agent(camera_width, camera_height, [[0] * 10 for _ in range(10)])
+
+        snapshot = hardware.read_snapshot()
+        throttle, steering = agent.get_action_from_snapshot("teleop", snapshot)
+        self.assertEqual((throttle, steering), (0.5, 0.25))
+
+        snapshot = hardware.read_snapshot()
+        throttle, steering = agent.get_action_from_snapshot("explore", snapshot)
+        self.assertEqual(throttle, 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from onboard.src.scheduler import RateScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+class TestRateScheduler(unittest.TestCase):
+
+    def test_absolute_deadlines_do_not_drift(self):
+        clock = FakeClock()
+        scheduler = RateScheduler(frequency=100, clock=clock, sleep=clock.sleep)
+
+        def step(s):
+            clock.now += 0.004 # Each tick costs 4 ms of a 10 ms period
+
+        scheduler.run(step, max_ticks=101)
+
+        self.assertAlmostEqual(scheduler.tick_start, 1.0)
+        self.assertEqual(scheduler.missed_deadlines, 0)
+
+    def test_overrun_is_counted_and_low_priority_work_skipped(self):
+        clock = FakeClock()
+        scheduler = RateScheduler(frequency=100, clock=clock, sleep=clock.sleep)
+        scheduler.wait_for_next_tick()
+
+        clock.now += 0.025 # Overrun by 1.5 periods
+        scheduler.wait_for_next_tick()
+        self.assertEqual(scheduler.missed_deadlines, 1)
+        self.assertEqual(scheduler.skipped_periods, 1)
+        self.assertAlmostEqual(scheduler.time_remaining(), 0.005)
+
+        clock.now += 0.006
+        ran = scheduler.run_low_priority("telemetry", lambda: None)
+        self.assertFalse(ran)
+        self.assertEqual(scheduler.stats()['low_priority_skips'], {"telemetry": 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import time
+import unittest
+import numpy as np
+from onboard.src.sensor_threads import LatestValue, RepeatFilter, ReadCursor, SensorThread
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+class TestLatestValue(unittest.TestCase):
+
+    def test_publish_replaces_entry(self):
+        slot = LatestValue()
+        self.assertEqual(slot.get(), (None, 0, 0.0))
+        slot.publish("a", timestamp=1.5)
+        slot.publish("b", timestamp=2.5)
+        self.assertEqual(slot.get(), ("b", 2, 2.5))
+        before = time.time()
+        slot.publish("c")
+        value, sequence, timestamp = slot.get()
+        self.assertEqual((value, sequence), ("c", 3))
+        self.assertGreaterEqual(timestamp, before)
+
+class TestRepeatFilter(unittest.TestCase):
+
+    def test_repeats_are_not_new(self):
+        rng = np.random.default_rng(0)
+        scan = rng.uniform(0.2, 5.0, 720)
+        depth = rng.uniform(0.2, 5.0, (480, 640)).astype(np.float32)
+        repeats = RepeatFilter()
+        self.assertTrue(repeats.is_new(scan))
+        # The driver hands back the same buffer, or an equal copy of it
+        self.assertFalse(repeats.is_new(scan))
+        self.assertFalse(repeats.is_new(scan.copy()))
+        self.assertTrue(repeats.is_new(scan + rng.normal(0, 0.01, scan.shape)))
+        self.assertFalse(repeats.is_new(None))
+
+        repeats = RepeatFilter()
+        self.assertTrue(repeats.is_new(depth, depth[::2]))
+        self.assertFalse(repeats.is_new(depth, depth[::2]))
+        noisy = depth + rng.normal(0, 0.001, depth.shape).astype(np.float32)
+        self.assertTrue(repeats.is_new(noisy, depth[::2]))
+
+class TestReadCursor(unittest.TestCase):
+
+    def test_each_reading_is_new_once(self):
+        slot = LatestValue()
+        cursor = ReadCursor()
+        self.assertFalse(cursor.advance(slot.get()[1]))
+        slot.publish(True)
+        # The first read after a publish sees it, later ones do not
+        self.assertTrue(cursor.advance(slot.get()[1]))
+        self.assertFalse(cursor.advance(slot.get()[1]))
+        self.assertFalse(cursor.advance(slot.get()[1]))
+        slot.publish(True)
+        slot.publish(True)
+        self.assertTrue(cursor.advance(slot.get()[1]))
+        self.assertFalse(cursor.advance(slot.get()[1]))
+
+class TestSensorThread(unittest.TestCase):
+
+    def test_publishes_only_new_readings(self):
+        readings = iter([1, None, None, 2, None] + [None] * 10000)
+        slot = LatestValue()
+        thread = SensorThread("test", lambda: next(readings, None), slot, period=0.0005)
+        thread.start()
+        try:
+            self.assertTrue(wait_until(lambda: slot.get()[0] == 2))
+            time.sleep(0.01)
+            self.assertEqual(slot.get()[:2], (2, 2))
+        finally:
+            thread.stop()
+        self.assertFalse(thread.is_alive())
+
+    def test_waits_when_there_is_no_new_reading(self):
+        calls = []
+
+        def read():
+            calls.append(None)
+            return None
+        thread = SensorThread("test", read, LatestValue(), idle_period=0.01)
+        thread.start()
+        time.sleep(0.1)
+        thread.stop()
+        # A busy loop would have called it thousands of times
+        self.assertGreater(len(calls), 1)
+        self.assertLess(len(calls), 20)
+
+    def test_read_errors_are_counted(self):
+        calls = []
+
+        def read():
+            calls.append(None)
+            if len(calls) == 1:
+                raise IOError("driver hiccup")
+            return len(calls)
+        slot = LatestValue()
+        thread = SensorThread("test", read, slot, period=0.001)
+        thread.start()
+        try:
+            self.assertTrue(wait_until(lambda: slot.get()[0] is not None))
+        finally:
+            thread.stop()
+        self.assertEqual(thread.error_count, 1)
+        self.assertGreaterEqual(slot.get()[0], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+import cv2
+from onboard.src.stitching import PanoramaStitcher
+from onboard.src.frame import Frame
+
+def camera_images(shapes, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, shape, dtype=np.uint8) for shape in shapes]
+
+class TestPanoramaStitcher(unittest.TestCase):
+
+    def test_matches_resize_and_hconcat(self):
+        # The front camera sets the height, the others are scaled to it
+        shapes = [(240, 320, 3), (480, 640, 3), (300, 400, 3), (240, 320, 3)]
+        images = camera_images(shapes)
+        stitcher = PanoramaStitcher()
+        panorama = stitcher.stitch(images)
+
+        expected = cv2.hconcat([cv2.resize(img, (img.shape[1] * 480 // img.shape[0], 480), interpolation=cv2.INTER_LINEAR)
+                                for img in images])
+        self.assertEqual(panorama.shape, expected.shape)
+        self.assertLessEqual(np.abs(panorama.astype(int) - expected).max(), 1)
+
+    def test_buffers_are_reused(self):
+        shapes = [(120, 160, 3)] * 4
+        stitcher = PanoramaStitcher(num_buffers=2)
+        for seed in range(5):
+            # Dropping each panorama frees its buffer again
+            panorama = stitcher.stitch(camera_images(shapes, seed=seed))
+            np.testing.assert_array_equal(panorama, cv2.hconcat(camera_images(shapes, seed=seed)))
+            del panorama
+        self.assertEqual(len(stitcher.buffers), 2)
+        self.assertIsNone(stitcher.stitch([None] + camera_images(shapes[1:])))
+
+    def test_held_frame_is_not_overwritten(self):
+        shapes = [(120, 160, 3)] * 4
+        stitcher = PanoramaStitcher(num_buffers=2)
+        kept = Frame(stitcher.stitch(camera_images(shapes, seed=0)))
+        expected = cv2.hconcat(camera_images(shapes, seed=0))
+        # Wrap around the ring several times while the first frame is still in use
+        for seed in range(1, 6):
+            panorama = stitcher.stitch(camera_images(shapes, seed=seed))
+            self.assertFalse(np.shares_memory(panorama, kept.image))
+            del panorama
+        np.testing.assert_array_equal(kept.image, expected)
+        self.assertEqual(len(stitcher.buffers), 2)
+
+        # With every buffer held the ring grows instead of overwriting one
+        held = [stitcher.stitch(camera_images(shapes, seed=seed)) for seed in range(6, 8)]
+        self.assertEqual(len(stitcher.buffers), 3)
+        np.testing.assert_array_equal(kept.image, expected)
+        np.testing.assert_array_equal(held[0], cv2.hconcat(camera_images(shapes, seed=6)))
+
+    def test_seams_are_cross_faded(self):
+        shapes = [(120, 160, 3)] * 4
+        images = [np.full(shape, value, dtype=np.uint8) for shape, value in zip(shapes, (0, 100, 200, 40))]
+        stitcher = PanoramaStitcher(blend_width=10)
+        panorama = stitcher.stitch(images)
+        self.assertEqual(panorama.shape, (120, 4 * 160 - 3 * 10, 3))
+        # The seam between the first two cameras ramps from the left one to the right one
+        seam = panorama[0, 150:160, 0].astype(int)
+        self.assertTrue(np.all(np.diff(seam) >= 0))
+        self.assertLessEqual(seam[0], 1)
+        self.assertGreaterEqual(seam[-1], 99)
+        # Away from the seams each camera is copied unchanged
+        self.assertEqual(panorama[0, 380, 0], 200)
+
+if __name__ == '__main__':
+    unittest.main()
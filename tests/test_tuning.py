@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'onboard'))
+from src.replay_interface import SensorRecording
+from src.agent import Agent
+from src.tuning import parameter_grid, apply_parameters, run_metrics, evaluate, score, sweep, command_log_jitter
+
+def make_recording(num_frames=30):
+    # A yellow box swaying across the view, out of sight on every fifth frame
+    recording = SensorRecording()
+    angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+    for i in range(num_frames):
+        t = i * 0.05
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+        if i % 5 != 4:
+            x = int(65 + 50 * np.sin(i * 0.4))
+            image[45:75, x:x + 30] = (0, 220, 255)
+        recording.add("image", t, image)
+        recording.add("lidar", t + 0.01, (np.full(360, 2.0), angles))
+    return recording
+
+class TestTuning(unittest.TestCase):
+
+    def test_parameter_grid_and_apply(self):
+        candidates = parameter_grid({'tracking_pid.kp': [0.005, 0.01], 'lane_lookahead': [0.5, 0.8, 1.0]})
+        self.assertEqual(len(candidates), 6)
+        self.assertIn({'tracking_pid.kp': 0.01, 'lane_lookahead': 0.5}, candidates)
+
+        agent = Agent(160, 120, [[0] * 10 for _ in range(10)])
+        apply_parameters(agent, {'tracking_pid.kp': 0.02, 'steering_limiter.rate': 2.0})
+        self.assertEqual(agent.tracking_pid.kp, 0.02)
+        self.assertEqual(agent.steering_limiter.rate, 2.0)
+        with self.assertRaises(AttributeError):
+            apply_parameters(agent, {'tracking_pid.kq': 1.0})
+
+    def test_run_metrics(self):
+        metrics = run_metrics([0.0, 0.1, 0.1, -0.1], [2.0, None, -2.0, None])
+        self.assertAlmostEqual(metrics['jitter'], np.sqrt((0.01 + 0.0 + 0.04) / 3))
+        self.assertAlmostEqual(metrics['error'], 2.0)
+        self.assertAlmostEqual(metrics['loss'], 0.5)
+        self.assertEqual(score(metrics, metrics, weights=(1.0, 2.0, 0.5)), 3.5)
+        self.assertEqual(score(dict(metrics, error=float('nan')), metrics), float('inf'))
+
+    def test_replay_scores_the_tracking_run(self):
+        recording = make_recording()
+        gentle = evaluate([recording], "track", {'tracking_pid.kp': 0.002})
+        sharp = evaluate([recording], "track", {'tracking_pid.kp': 0.02, 'steering_limiter.rate': 100.0})
+        self.assertEqual(gentle['ticks'], 30)
+        # The box is lost on 6 of the 30 frames
+        self.assertAlmostEqual(gentle['loss'], 0.2)
+        self.assertAlmostEqual(gentle['error'], sharp['error'])
+        self.assertLess(gentle['jitter'], sharp['jitter'])
+
+    def test_sweep_in_a_pool_matches_in_process(self):
+        candidates = parameter_grid({'tracking_pid.kp': [0.002, 0.02], 'steering_filter.cutoff': [5.0, 50.0]})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.pkl")
+            make_recording().save(path)
+            baseline, ranked = sweep([path], "track", candidates, workers=0)
+            pool_baseline, pool_ranked = sweep([path], "track", candidates, workers=2)
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual(baseline, pool_baseline)
+        self.assertEqual(ranked, pool_ranked)
+        scores = [result[0] for result in ranked]
+        self.assertEqual(scores, sorted(scores))
+
+    def test_command_log_jitter(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.csv")
+            with open(path, "w") as f:
+                f.write("Time (s),Color,Throttle,Steering\n0.0,red,0.0,0.0\n0.1,red,0.1,0.2\n0.2,red,0.1,0.2\n")
+            self.assertAlmostEqual(command_log_jitter(path), np.sqrt(0.04 / 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+from onboard.src.obstacle_avoidance import VFH, DepthProfile, TimeToCollision
+
+class TestVFH(unittest.TestCase):
+
+    def setUp(self):
+        self.angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+
+    def test_open_space_steers_straight(self):
+        vfh = VFH()
+        distances = np.full(360, 5.0)
+        self.assertEqual(vfh.get_steering_direction(distances, self.angles), 0.0)
+
+    def test_steers_away_from_obstacle_ahead(self):
+        vfh = VFH()
+        distances = np.full(360, 5.0)
+        # Wall in front, slightly more of it on the positive side
+        distances[(self.angles < 0.6) | (self.angles > 2 * np.pi - 0.3)] = 0.8
+        self.assertLess(vfh.get_steering_direction(distances, self.angles), 0.0)
+
+    def test_batch_matches_single_scan_histogram(self):
+        vfh = VFH()
+        rng = np.random.default_rng(0)
+        scans = rng.uniform(0.1, 3.0, size=(8, 360))
+        histograms, directions = vfh.score_scans(scans, self.angles)
+        self.assertEqual(histograms.shape, (8, vfh.num_sectors))
+        self.assertEqual(directions.shape, (8,))
+        for scan, histogram in zip(scans, histograms):
+            np.testing.assert_allclose(vfh.histogram(scan, self.angles), histogram)
+
+    def test_invalid_returns_are_ignored(self):
+        vfh = VFH()
+        distances = np.zeros(360)
+        self.assertFalse(vfh.is_obstacle_present(distances, self.angles))
+        self.assertEqual(vfh.histogram(distances, self.angles).sum(), 0.0)
+
+class TestDepthProfile(unittest.TestCase):
+
+    def test_nearest_obstacle_per_column(self):
+        profile = DepthProfile(column_step=8)
+        depth = np.full((480, 640), 4.0, dtype=np.float32)
+        depth[::3, ::5] = np.nan
+        # Box 1 m away on the left half of the image
+        depth[180:260, 100:200] = 1.0
+        distances, angles = profile.scan(depth)
+        self.assertEqual(len(distances), 80)
+        near = distances < 2.0
+        self.assertTrue(near.any())
+        self.assertTrue(np.all(angles[near] > 0))
+        np.testing.assert_allclose(distances[near] * np.cos(angles[near]), 1.0, rtol=1e-5)
+
+    def test_columns_without_returns_are_invalid(self):
+        profile = DepthProfile()
+        distances, _ = profile.scan(np.zeros((480, 640), dtype=np.float32))
+        self.assertTrue(np.all(distances == 0))
+
+class TestTimeToCollision(unittest.TestCase):
+
+    def test_approaching_wall(self):
+        ttc = TimeToCollision()
+        angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+        distances = np.full(360, 4.0)
+        # Closing in on everything ahead at 1 m/s
+        for step in range(15):
+            distances[:20] = 3.0 - 0.1 * step
+            ttc.update(distances, angles, timestamp=0.1 * step)
+        self.assertAlmostEqual(ttc.closing_speed[0], 1.0, places=2)
+        self.assertAlmostEqual(ttc.min_ttc(), 1.6, places=1)
+        self.assertEqual(ttc.min_ttc(center=np.pi), np.inf)
+        self.assertGreater(ttc.throttle_scale(), 0.0)
+        self.assertLess(ttc.throttle_scale(), 1.0)
+
+    def test_static_scene_keeps_full_throttle(self):
+        ttc = TimeToCollision()
+        angles = np.linspace(0, 2 * np.pi, 360, endpoint=False)
+        for step in range(3):
+            ttc.update(np.full(360, 1.0), angles, timestamp=step)
+        self.assertEqual(ttc.throttle_scale(), 1.0)
+        self.assertFalse(ttc.update(np.full(360, 0.5), angles, timestamp=2))
+
+if __name__ == '__main__':
+    unittest.main()